@@ -0,0 +1,221 @@
+import io
+import os
+import math
+import time
+import threading
+import logging
+from collections import deque
+from PIL import Image
+from ocr_processor import pdf_info, is_pdf, page_range, PDF_DPI, PAGE_MAX_SIZE
+from regions import area_share, boxes_for_page
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Admission control settings
+ADMISSION = os.environ.get("OCR_ADMISSION", "1") == "1"  # Cost-based admission control in front of all OCR work
+ADMISSION_MAX_CONCURRENT = int(os.environ.get("OCR_ADMISSION_MAX_CONCURRENT", "2"))  # Requests OCRed at once
+ADMISSION_COST_BUDGET = float(os.environ.get("OCR_ADMISSION_COST_BUDGET", "8"))  # Megapixels in flight
+ADMISSION_QUEUE_SIZE = int(os.environ.get("OCR_ADMISSION_QUEUE_SIZE", "32"))  # Waiting requests before 503
+ADMISSION_DEADLINE_SECONDS = float(os.environ.get("OCR_ADMISSION_DEADLINE_SECONDS", "110"))  # Default and maximum
+ADMISSION_INTERACTIVE_COST = float(os.environ.get("OCR_ADMISSION_INTERACTIVE_COST", "2.5"))  # Interactive lane limit
+ADMISSION_BULK_SHARE = float(os.environ.get("OCR_ADMISSION_BULK_SHARE", "0.5"))  # Share of slots/budget bulk may use
+ADMISSION_SECONDS_PER_MEGAPIXEL = float(os.environ.get("OCR_ADMISSION_SECONDS_PER_MEGAPIXEL", "1.5"))  # Initial rate
+DEFAULT_PAGE_SIZE_PTS = (595.0, 842.0)  # A4, for PDFs whose page size pdfinfo does not report
+SERVICE_TIME_SMOOTHING = 0.2  # Weight of the latest request in the seconds-per-megapixel average
+LANES = ("interactive", "bulk")
+MODE_COST_SHARE = {"read": 1.0, "detect": 0.5, "recognize": 0.5}  # Detect or recognize is about half of a full read
+
+class AdmissionRejected(Exception):
+    """Raised when a request cannot be served within its deadline"""
+
+    def __init__(self, message, reason, retry_after):
+        super().__init__(message)
+        self.reason = reason
+        self.retry_after = retry_after
+
+def _fitted_megapixels(width, height, max_size=PAGE_MAX_SIZE):
+    """Pixel area in megapixels after the downscale to max_size that OCR applies"""
+    scale = min(1.0, max_size[0] / width, max_size[1] / height)
+    return width * height * scale * scale / 1e6
+
+def estimate_cost(data, filename=None, regions=None, first_page=None, last_page=None, mode="read", boxes=None):
+    """Estimated OCR cost of a document in megapixels, from its page count and page size
+
+    Only headers are read: ``pdfinfo`` for PDFs, the image header otherwise.
+    With ``regions``, only pages that have regions count, each by the share of
+    its area the regions cover. Detect and recognize modes cost MODE_COST_SHARE
+    of a full read; recognize only counts pages that have boxes. Returns
+    ``(cost, pages)``; unreadable files
+    cost one A4 page and fail later with the usual error.
+    """
+    width, height = DEFAULT_PAGE_SIZE_PTS
+    default = _fitted_megapixels(width * PDF_DPI / 72, height * PDF_DPI / 72)
+    try:
+        first_page, last_page = page_range(first_page, last_page)
+        if is_pdf(data, filename):
+            info = pdf_info(data)
+            width, height = info["page_size"] or DEFAULT_PAGE_SIZE_PTS
+            page_cost = _fitted_megapixels(width * PDF_DPI / 72, height * PDF_DPI / 72)
+            page_numbers = range(first_page, min(last_page, info["pages"]) + 1)
+            if regions:
+                shares = [area_share(regions, number, width, height) for number in page_numbers]
+                return page_cost * sum(shares), sum(1 for share in shares if share)
+            if mode == "recognize":
+                page_numbers = [number for number in page_numbers if boxes_for_page(boxes, number)]
+            return len(page_numbers) * page_cost * MODE_COST_SHARE.get(mode, 1.0), len(page_numbers)
+        with Image.open(io.BytesIO(data)) as image:
+            share = area_share(regions, 1, *image.size) if regions else MODE_COST_SHARE.get(mode, 1.0)
+            return _fitted_megapixels(*image.size) * share, 1
+    except Exception as e:
+        logger.warning(f"Could not estimate request cost: {e}")
+        return default, 1
+
+class Ticket:
+    """A request waiting for, or holding, an admission slot"""
+
+    def __init__(self, cost, lane, deadline):
+        self.cost = cost
+        self.lane = lane
+        self.deadline = deadline
+        self.arrived_at = time.time()
+        self.started_at = None
+
+    def to_dict(self):
+        return {
+            "lane": self.lane,
+            "cost_megapixels": round(self.cost, 2),
+            "queue_seconds": round((self.started_at or time.time()) - self.arrived_at, 3)
+        }
+
+class AdmissionController:
+    """Cost-aware admission with an interactive and a bulk lane
+
+    A request runs when a slot is free and its cost fits the megapixel budget
+    (a request alone in its lane always fits). Waiting interactive (small)
+    requests go first, and bulk requests may only use ``bulk_share`` of the
+    slots and the budget, so a slot stays free for interactive callers while
+    bulk PDFs run.
+    Requests that would miss their deadline are rejected up front, with a
+    Retry-After derived from the time the current queue takes to drain.
+    """
+
+    def __init__(self, max_concurrent=ADMISSION_MAX_CONCURRENT, budget=ADMISSION_COST_BUDGET,
+                 queue_size=ADMISSION_QUEUE_SIZE, interactive_cost=ADMISSION_INTERACTIVE_COST,
+                 bulk_share=ADMISSION_BULK_SHARE, seconds_per_cost=ADMISSION_SECONDS_PER_MEGAPIXEL):
+        self.max_concurrent = max(1, max_concurrent)
+        self.budget = budget
+        self.queue_size = queue_size
+        self.interactive_cost = interactive_cost
+        self.bulk_slots = max(1, int(self.max_concurrent * bulk_share))
+        self.bulk_budget = budget * bulk_share
+        self.seconds_per_cost = seconds_per_cost
+        self._waiting = {lane: deque() for lane in LANES}
+        self._running = {lane: 0 for lane in LANES}
+        self._running_cost = {lane: 0.0 for lane in LANES}
+        self._counts = {"admitted": 0, "rejected_queue_full": 0, "rejected_deadline": 0, "rejected_expired": 0}
+        self._cond = threading.Condition()
+
+    def lane_for(self, cost):
+        return "interactive" if cost <= self.interactive_cost else "bulk"
+
+    def _fits(self, ticket):
+        if sum(self._running.values()) >= self.max_concurrent:
+            return False
+        if ticket.lane == "bulk":
+            bulk_running = self._running["bulk"]
+            if bulk_running >= self.bulk_slots:
+                return False
+            return not bulk_running or self._running_cost["bulk"] + ticket.cost <= self.bulk_budget
+        running_cost = sum(self._running_cost.values())
+        return not self._running["interactive"] or running_cost + ticket.cost <= self.budget
+
+    def _may_start(self, ticket):
+        """Whether the ticket heads its lane and fits; a free slot goes to interactive requests first"""
+        if self._waiting[ticket.lane][0] is not ticket or not self._fits(ticket):
+            return False
+        if ticket.lane == "bulk" and self._waiting["interactive"]:
+            return not self._fits(self._waiting["interactive"][0])
+        return True
+
+    def _estimated_wait(self, lane):
+        """Rough seconds until a new request of the lane starts (running work counted half done)"""
+        slots = self.max_concurrent if lane == "interactive" else self.bulk_slots
+        running = sum(self._running.values()) if lane == "interactive" else self._running["bulk"]
+        running_cost = sum(self._running_cost.values()) if lane == "interactive" else self._running_cost["bulk"]
+        ahead = sum(ticket.cost for ticket in self._waiting[lane])
+        if running >= slots:
+            ahead += running_cost / 2
+        return ahead * self.seconds_per_cost / slots
+
+    def _drain_seconds(self):
+        """Seconds for all running and waiting work to finish at the current rate"""
+        work = sum(self._running_cost.values()) + sum(ticket.cost for queue in self._waiting.values()
+                                                      for ticket in queue)
+        return work * self.seconds_per_cost / self.max_concurrent
+
+    def _reject(self, reason, message):
+        self._counts[f"rejected_{reason}"] += 1
+        retry_after = max(1, math.ceil(self._drain_seconds()))
+        logger.warning(f"Admission rejected ({reason}): {message}; retry after {retry_after}s")
+        raise AdmissionRejected(message, reason, retry_after)
+
+    def acquire(self, cost, deadline_seconds=ADMISSION_DEADLINE_SECONDS, lane=None):
+        """Wait for a slot; raises AdmissionRejected when the deadline cannot be met
+
+        ``lane`` overrides the cost-based lane (batches and streams always run
+        in the bulk lane). With ``deadline_seconds=None`` the call waits as long
+        as it takes and is never rejected, for background jobs nobody waits on.
+        """
+        background = deadline_seconds is None
+        deadline_seconds = None if background else min(deadline_seconds, ADMISSION_DEADLINE_SECONDS)
+        ticket = Ticket(cost, lane or self.lane_for(cost), None if background else time.time() + deadline_seconds)
+        with self._cond:
+            if not background:
+                if sum(len(queue) for queue in self._waiting.values()) >= self.queue_size:
+                    self._reject("queue_full", f"{self.queue_size} requests already waiting")
+                wait = self._estimated_wait(ticket.lane)
+                if wait > 0 and wait + cost * self.seconds_per_cost > deadline_seconds:
+                    self._reject("deadline", f"estimated completion in {wait + cost * self.seconds_per_cost:.1f}s "
+                                             f"exceeds the {deadline_seconds:.0f}s deadline")
+
+            self._waiting[ticket.lane].append(ticket)
+            while not self._may_start(ticket):
+                remaining = None if background else ticket.deadline - time.time()
+                if remaining is not None and remaining <= 0:
+                    self._waiting[ticket.lane].remove(ticket)
+                    self._cond.notify_all()
+                    self._reject("expired", f"deadline passed after {deadline_seconds:.0f}s in the queue")
+                self._cond.wait(remaining)
+
+            self._waiting[ticket.lane].popleft()
+            self._running[ticket.lane] += 1
+            self._running_cost[ticket.lane] += cost
+            self._counts["admitted"] += 1
+            ticket.started_at = time.time()
+            # The next waiter may fit alongside this request
+            self._cond.notify_all()
+        return ticket
+
+    def release(self, ticket):
+        """Free the ticket's slot and fold its service time into the drain rate estimate"""
+        with self._cond:
+            self._running[ticket.lane] -= 1
+            self._running_cost[ticket.lane] -= ticket.cost
+            if ticket.cost > 0:
+                observed = (time.time() - ticket.started_at) / ticket.cost
+                self.seconds_per_cost += SERVICE_TIME_SMOOTHING * (observed - self.seconds_per_cost)
+            self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            stats = dict(self._counts)
+            for lane in LANES:
+                stats[f"{lane}_waiting"] = len(self._waiting[lane])
+                stats[f"{lane}_running"] = self._running[lane]
+            stats["running_cost_megapixels"] = round(sum(self._running_cost.values()), 2)
+            stats["seconds_per_megapixel"] = round(self.seconds_per_cost, 3)
+            stats["drain_seconds"] = round(self._drain_seconds(), 2)
+            return stats
+
+admission_controller = AdmissionController()
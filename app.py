@@ -1,9 +1,21 @@
 import os
+import io
+import json
+import zipfile
 import tempfile
 import time
-import gc
-from flask import Flask, request, jsonify
-from ocr_processor import process_document
+import functools
+from startup import startup_state, STARTED_AT  # Before the heavy imports, so their time is measured
+from flask import Flask, Response, g, request, jsonify, stream_with_context
+from ocr_processor import process_document, iter_document_pages, process_batch, page_range, result_cache_key
+from regions import parse_regions, parse_boxes, parse_mode, RegionError
+from page_cache import page_cache, template_cache
+from memory_governor import memory_governor
+from jobs import job_manager, QueueFullError
+from admission import admission_controller, estimate_cost, AdmissionRejected, ADMISSION, ADMISSION_DEADLINE_SECONDS
+from metrics import track_request, stage, observe_request, render_prometheus, render_stats
+from response_format import dumps, format_result, columnar_page, OUTPUT_FORMATS
+from ocr_to_pii_request import pii_request_from_pages, pii_page, file_type_for
 from werkzeug.utils import secure_filename
 import logging
 
@@ -13,6 +25,7 @@ logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
 logger = logging.getLogger(__name__)
+startup_state.record("import", time.time() - STARTED_AT)
 
 app = Flask(__name__)
 
@@ -20,6 +33,81 @@ app = Flask(__name__)
 app.config['MAX_CONTENT_LENGTH'] = 10 * 1024 * 1024  # 10MB max file size
 app.config['UPLOAD_FOLDER'] = tempfile.gettempdir()
 
+JOB_RETRY_AFTER_SECONDS = 10  # Retry-After sent when the job queue is full
+PROBE_ENDPOINTS = {"live", "ready", "health_check", "metrics_endpoint"}  # Not counted as the first request
+MAX_FILE_SIZE = 10 * 1024 * 1024  # Per-document limit, also for batch members
+BATCH_MAX_CONTENT_LENGTH = 100 * 1024 * 1024  # Request limit for /ocr/batch
+BATCH_MAX_FILES = 500  # Documents per batch request (files or zip members)
+
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.time()
+    # Warm-up normally starts from the gunicorn post_fork hook; this covers other servers
+    startup_state.start()
+
+@app.after_request
+def record_request_metrics(response):
+    if "request_start" in g:
+        observe_request(request.endpoint or "unknown", response.status_code, time.time() - g.request_start)
+    if request.endpoint not in PROBE_ENDPOINTS:
+        startup_state.request_served()
+    return response
+
+def with_timings(view):
+    """Collect per-stage timings for everything the view runs (available as g.timings)"""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        with track_request() as timings:
+            g.timings = timings
+            return view(*args, **kwargs)
+    return wrapper
+
+def debug_timing_requested():
+    return request.args.get("debug_timing") == "1"
+
+def requested_format():
+    """Output format from ?format= (blocks or columnar), or None when unknown"""
+    output_format = request.args.get("format", "blocks")
+    return output_format if output_format in OUTPUT_FORMATS else None
+
+def pii_document_id(file_bytes, languages, *options):
+    """Default PII document id: the content hash (result cache key), computed only for ?format=pii
+
+    Span ids derive from it, so different uploads sharing a filename stay apart.
+    Jobs choose their format when the result is fetched and use the key their
+    worker computes instead.
+    """
+    if requested_format() != "pii":
+        return None
+    return result_cache_key(file_bytes, languages, *options)
+
+def invalid_format_response():
+    return jsonify({
+        "error": f"Unsupported format: {request.args.get('format')}",
+        "details": f"Supported formats: {', '.join(OUTPUT_FORMATS)}"
+    }), 400
+
+def request_deadline_seconds():
+    """Caller's deadline from the X-Request-Deadline header (seconds), capped at the configured maximum"""
+    try:
+        return min(float(request.headers.get("X-Request-Deadline", ADMISSION_DEADLINE_SECONDS)),
+                   ADMISSION_DEADLINE_SECONDS)
+    except ValueError:
+        return ADMISSION_DEADLINE_SECONDS
+
+def overloaded_response(error):
+    response = jsonify({
+        "error": "Service overloaded",
+        "details": str(error),
+        "retry_after_seconds": error.retry_after
+    })
+    response.headers["Retry-After"] = str(error.retry_after)
+    return response, 503
+
+def json_response(payload, status=200):
+    """JSON response serialized with the fastest available encoder"""
+    return Response(dumps(payload), status=status, mimetype="application/json")
 
 def allowed_file(filename):
     allowed_extensions = {'.png', '.jpg', '.jpeg', '.pdf'}
@@ -30,21 +118,18 @@ def health_check():
     """Health check endpoint for Railway"""
     try:
         # Import here to avoid startup issues
-        from ocr_processor import get_or_create_reader
+        from ocr_processor import reader_pool
         
-        # Quick test to ensure EasyOCR is working
-        try:
-            reader = get_or_create_reader(['en'])
-            ocr_status = "ready"
-        except Exception as e:
-            logger.warning(f"OCR initialization check failed: {e}")
-            ocr_status = "initializing"
+        # Report startup state instead of loading a reader inside the probe
+        ocr_status = "ready" if startup_state.is_ready() else "initializing"
         
         return jsonify({
             "status": "healthy",
             "service": "OCR Service",
             "version": "1.0.0",
-            "ocr_status": ocr_status
+            "ocr_status": ocr_status,
+            "startup": startup_state.to_dict(),
+            "readers": reader_pool.stats()
         }), 200
     except Exception as e:
         logger.error(f"Health check failed: {e}")
@@ -55,6 +140,19 @@ def health_check():
             "error": str(e)
         }), 503
 
+@app.route("/live", methods=["GET"])
+def live():
+    """Liveness probe: the process is serving requests (never touches the models)"""
+    return jsonify({"status": "alive"}), 200
+
+@app.route("/ready", methods=["GET"])
+def ready():
+    """Readiness probe: 200 once the configured readers are loaded and warmed up, 503 before and while recycling"""
+    state = startup_state.to_dict()
+    if memory_governor.recycling:
+        state["status"] = "recycling"
+    return jsonify(state), 200 if startup_state.is_ready() and not memory_governor.recycling else 503
+
 @app.route("/", methods=["GET"])
 def root():
     """Root endpoint"""
@@ -63,86 +161,169 @@ def root():
         "version": "1.0.0",
         "endpoints": {
             "health": "/health",
-            "ocr": "/ocr (POST)"
+            "ocr": "/ocr (POST)",
+            "ocr_stream": "/ocr/stream (POST, NDJSON)",
+            "ocr_batch": "/ocr/batch (POST, many files or a zip)",
+            "jobs": "/jobs (POST), /jobs/<job_id> (GET)",
+            "metrics": "/metrics",
+            "live": "/live",
+            "ready": "/ready"
         }
     }), 200
 
+def parse_languages(languages):
+    """Parse a comma-separated language list, defaulting to English"""
+    if isinstance(languages, str):
+        languages = [lang.strip() for lang in languages.split(",") if lang.strip()]
+    if not languages:
+        languages = ["en"]
+    return languages
+
+# Upload fields passed on to process_document / iter_document_pages
+DOCUMENT_OPTIONS = ("regions", "first_page", "last_page", "mode", "boxes")
+
+def read_upload():
+    """Validate the multipart upload and read it into memory
+
+    Returns ``(upload, None)`` on success or ``(None, error_response)``.
+    """
+    # Check if file is present
+    if "file" not in request.files:
+        logger.warning("No file in request")
+        return None, (jsonify({"error": "No file uploaded"}), 400)
+
+    file = request.files["file"]
+    if file.filename == '':
+        logger.warning("Empty filename")
+        return None, (jsonify({"error": "No file selected"}), 400)
+        
+    filename = secure_filename(file.filename)
+    if not filename:
+        logger.warning("Invalid filename")
+        return None, (jsonify({"error": "Invalid filename"}), 400)
+        
+    file_extension = os.path.splitext(filename)[1].lower()
+    logger.info(f"Processing file: {filename} (extension: {file_extension})")
+
+    # Validate file type
+    if not allowed_file(filename):
+        logger.warning(f"Unsupported file type: {file_extension}")
+        return None, (jsonify({"error": f"Unsupported file type: {file_extension}. Only PNG, JPG, JPEG, PDF allowed."}), 400)
+
+    # Read the upload into memory (bounded by MAX_CONTENT_LENGTH)
+    file_bytes = file.read()
+    file_length = len(file_bytes)
+    
+    logger.info(f"File size: {file_length / (1024*1024):.2f} MB")
+    
+    if file_length > MAX_FILE_SIZE:
+        logger.warning(f"File too large: {file_length / (1024*1024):.2f} MB")
+        return None, (jsonify({"error": "File too large (max 10MB)"}), 400)
+
+    # Parse languages
+    languages = parse_languages(request.form.get("lang", "en"))
+        
+    logger.info(f"Using languages: {languages}")
+
+    # Optional regions of interest, PDF page range and detect/recognize mode
+    try:
+        regions = parse_regions(request.form.get("regions"))
+        first_page = int(request.form["first_page"]) if request.form.get("first_page") else None
+        last_page = int(request.form["last_page"]) if request.form.get("last_page") else None
+        page_range(first_page, last_page)
+        boxes = parse_boxes(request.form.get("boxes"))
+        mode = parse_mode(request.form.get("mode"), regions, boxes)
+        if mode == "detect" and requested_format() == "pii":
+            raise RegionError("mode=detect has no text to send as a PII request")
+    except (RegionError, ValueError) as e:
+        logger.warning(f"Invalid region request: {e}")
+        return None, (jsonify({"error": "Invalid regions, boxes, mode or page range", "details": str(e)}), 400)
+
+    return {
+        "filename": filename,
+        "file_bytes": file_bytes,
+        "file_length": file_length,
+        "languages": languages,
+        "document_id": request.form.get("document_id") or pii_document_id(file_bytes, languages, regions, first_page,
+                                                                          last_page, mode, boxes),
+        "regions": regions,
+        "first_page": first_page,
+        "last_page": last_page,
+        "mode": mode,
+        "boxes": boxes
+    }, None
+
 @app.route("/ocr", methods=["POST"])
+@with_timings
 def ocr_endpoint():
     start_time = time.time()
-    tmp_path = None
+    ticket = None
     
     try:
         logger.info("OCR request received")
+        output_format = requested_format()
+        if output_format is None:
+            return invalid_format_response()
         
-        # Check if file is present
-        if "file" not in request.files:
-            logger.warning("No file in request")
-            return jsonify({"error": "No file uploaded"}), 400
-
-        file = request.files["file"]
-        if file.filename == '':
-            logger.warning("Empty filename")
-            return jsonify({"error": "No file selected"}), 400
-            
-        filename = secure_filename(file.filename)
-        if not filename:
-            logger.warning("Invalid filename")
-            return jsonify({"error": "Invalid filename"}), 400
-            
-        file_extension = os.path.splitext(filename)[1].lower()
-        logger.info(f"Processing file: {filename} (extension: {file_extension})")
-
-        # Validate file type
-        if not allowed_file(filename):
-            logger.warning(f"Unsupported file type: {file_extension}")
-            return jsonify({"error": f"Unsupported file type: {file_extension}. Only PNG, JPG, JPEG, PDF allowed."}), 400
-
-        # Validate file size (limit to 10MB)
-        file.seek(0, os.SEEK_END)
-        file_length = file.tell()
-        file.seek(0)
-        
-        logger.info(f"File size: {file_length / (1024*1024):.2f} MB")
-        
-        if file_length > 10 * 1024 * 1024:
-            logger.warning(f"File too large: {file_length / (1024*1024):.2f} MB")
-            return jsonify({"error": "File too large (max 10MB)"}), 400
-
-        # Parse languages
-        languages = request.form.get("lang", "en")
-        if isinstance(languages, str):
-            languages = [lang.strip() for lang in languages.split(",") if lang.strip()]
-        if not languages:
-            languages = ["en"]
-            
-        logger.info(f"Using languages: {languages}")
+        with stage("upload"):
+            upload, error_response = read_upload()
+        if error_response:
+            return error_response
+        filename = upload["filename"]
+        file_bytes = upload["file_bytes"]
+        file_length = upload["file_length"]
+        languages = upload["languages"]
+        document_options = {key: upload[key] for key in DOCUMENT_OPTIONS}
 
-        # Save file to temporary location
-        with tempfile.NamedTemporaryFile(suffix=file_extension, delete=False) as tmp:
-            file.save(tmp.name)
-            tmp_path = tmp.name
-            logger.info(f"File saved to: {tmp_path}")
+        # Wait for a slot sized to the document, or reject early when the deadline cannot be met
+        if ADMISSION:
+            try:
+                with stage("admission"):
+                    ticket = admission_controller.acquire(estimate_cost(file_bytes, filename, **document_options)[0],
+                                                          request_deadline_seconds())
+            except AdmissionRejected as e:
+                return overloaded_response(e)
 
         # Process document
         try:
             logger.info("Starting OCR processing...")
             processing_start = time.time()
-            result = process_document(tmp_path, languages)
+            with memory_governor.track_request() as memory:
+                if output_format == "pii":
+                    # Convert page by page, the OCR response itself is never built
+                    result = pii_request_from_pages(iter_document_pages(file_bytes, languages, filename=filename,
+                                                                        **document_options),
+                                                    document_id=upload["document_id"],
+                                                    file_type=file_type_for(filename), languages=languages)
+                else:
+                    result = process_document(file_bytes, languages, filename=filename, **document_options)
             processing_time = time.time() - processing_start
             logger.info(f"OCR processing completed in {processing_time:.2f} seconds")
             
-            # Add processing metadata
-            result["processing_info"] = {
-                "processing_time_seconds": round(processing_time, 2),
-                "languages_used": languages,
-                "file_size_mb": round(file_length / (1024*1024), 2)
-            }
+            timings = g.timings.to_dict()
+            logger.info(f"Stage timings: {timings['stages']} counts: {timings['counts']}")
+            
+            # Add processing metadata (PII requests are sent on as they are)
+            if output_format != "pii":
+                result.setdefault("processing_info", {}).update({
+                    "processing_time_seconds": round(processing_time, 2),
+                    "languages_used": languages,
+                    "file_size_mb": round(file_length / (1024*1024), 2)
+                })
+                result["processing_info"]["memory"] = memory.to_dict()
+                if ticket:
+                    result["processing_info"]["admission"] = ticket.to_dict()
+                if debug_timing_requested():
+                    result["processing_info"]["timing"] = timings
+                result = format_result(result, output_format)
+            
+            with stage("json"):
+                response = json_response(result)
             
             total_time = time.time() - start_time
             logger.info(f"Total request time: {total_time:.2f} seconds")
             
-            return jsonify(result), 200
+            return response
             
         except MemoryError as e:
             logger.error(f"Memory error during OCR processing: {e}")
@@ -166,16 +347,262 @@ def ocr_endpoint():
         }), 500
         
     finally:
-        # Cleanup
-        if tmp_path and os.path.exists(tmp_path):
+        if ticket:
+            admission_controller.release(ticket)
+
+@app.route("/ocr/stream", methods=["POST"])
+def ocr_stream_endpoint():
+    """OCR endpoint that streams one NDJSON record per page as soon as it is ready"""
+    logger.info("Streaming OCR request received")
+    output_format = requested_format()
+    if output_format is None:
+        return invalid_format_response()
+    
+    with stage("upload"):
+        upload, error_response = read_upload()
+    if error_response:
+        return error_response
+    debug_timing = debug_timing_requested()
+    
+    # Streams hold their slot until the response is closed, in the bulk lane like batches
+    ticket = None
+    if ADMISSION:
+        try:
+            with stage("admission"):
+                cost = estimate_cost(upload["file_bytes"], upload["filename"],
+                                     **{key: upload[key] for key in DOCUMENT_OPTIONS})[0]
+                ticket = admission_controller.acquire(cost, request_deadline_seconds(), lane="bulk")
+        except AdmissionRejected as e:
+            return overloaded_response(e)
+    
+    def generate():
+        processing_start = time.time()
+        page_count = 0
+        with track_request() as timings, memory_governor.track_request() as memory:
             try:
-                os.remove(tmp_path)
-                logger.debug(f"Cleaned up temp file: {tmp_path}")
+                for page_data in iter_document_pages(upload["file_bytes"], upload["languages"], filename=upload["filename"],
+                                                     **{key: upload[key] for key in DOCUMENT_OPTIONS}):
+                    page_count += 1
+                    with stage("json"):
+                        if output_format == "columnar":
+                            page_data = columnar_page(page_data)
+                        elif output_format == "pii":
+                            page_data = pii_page(page_data, upload["document_id"], upload["languages"])
+                        record = dumps(page_data) + b"\n"
+                    yield record
+                
+                processing_time = time.time() - processing_start
+                logger.info(f"Streaming OCR completed in {processing_time:.2f} seconds ({page_count} pages)")
+                processing_info = {
+                    "processing_time_seconds": round(processing_time, 2),
+                    "languages_used": upload["languages"],
+                    "file_size_mb": round(upload["file_length"] / (1024*1024), 2),
+                    "pages_processed": page_count,
+                    "memory": memory.to_dict()
+                }
+                if debug_timing:
+                    processing_info["timing"] = timings.to_dict()
+                yield dumps({"processing_info": processing_info}) + b"\n"
             except Exception as e:
-                logger.warning(f"Failed to cleanup temp file {tmp_path}: {e}")
+                logger.error(f"Streaming OCR processing failed: {str(e)}", exc_info=True)
+                yield dumps({
+                    "error": "OCR processing failed",
+                    "details": str(e)
+                }) + b"\n"
+    
+    response = Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+    if ticket:
+        # Also runs when the client goes away before the stream starts
+        response.call_on_close(lambda: admission_controller.release(ticket))
+    return response
+
+def read_batch_documents(languages, lang_overrides):
+    """Collect batch documents from multiple uploads and/or zip archives
+
+    Returns a list of dicts for ``process_batch``; entries that cannot be
+    processed carry an ``error`` instead.
+    """
+    documents = []
+    
+    def add_document(filename, file_bytes):
+        filename = secure_filename(filename) or f"document-{len(documents) + 1}"
+        document = {"filename": filename}
+        if not allowed_file(filename):
+            document["error"] = f"Unsupported file type: {os.path.splitext(filename)[1].lower()}"
+        elif len(file_bytes) > MAX_FILE_SIZE:
+            document["error"] = "File too large (max 10MB)"
+        else:
+            document["source"] = file_bytes
+            document["languages"] = parse_languages(lang_overrides[filename]) if filename in lang_overrides else languages
+            document["cache_key"] = pii_document_id(file_bytes, document["languages"])
+        documents.append(document)
+    
+    for file in request.files.getlist("file") + request.files.getlist("files"):
+        if not file.filename:
+            continue
+        if file.filename.lower().endswith(".zip"):
+            with zipfile.ZipFile(io.BytesIO(file.read())) as archive:
+                for member in archive.infolist():
+                    if member.is_dir() or os.path.basename(member.filename).startswith("."):
+                        continue
+                    if len(documents) >= BATCH_MAX_FILES:
+                        break
+                    if member.file_size > MAX_FILE_SIZE:
+                        documents.append({"filename": member.filename, "error": "File too large (max 10MB)"})
+                        continue
+                    add_document(os.path.basename(member.filename), archive.read(member))
+        else:
+            add_document(file.filename, file.read())
+        if len(documents) >= BATCH_MAX_FILES:
+            logger.warning(f"Batch truncated to {BATCH_MAX_FILES} documents")
+            break
+    
+    return documents[:BATCH_MAX_FILES]
+
+@app.route("/ocr/batch", methods=["POST"])
+@with_timings
+def ocr_batch_endpoint():
+    """OCR many files (or one zip archive) in a single request with shared scheduling"""
+    start_time = time.time()
+    # Batches may exceed the single-document request limit
+    request.max_content_length = BATCH_MAX_CONTENT_LENGTH
+    ticket = None
+    logger.info("Batch OCR request received")
+    output_format = requested_format()
+    if output_format is None:
+        return invalid_format_response()
+    
+    try:
+        languages = parse_languages(request.form.get("lang", "en"))
+        lang_overrides = json.loads(request.form.get("lang_overrides", "{}"))
+        with stage("upload"):
+            documents = read_batch_documents(languages, lang_overrides)
+        if not documents:
+            return jsonify({"error": "No files uploaded"}), 400
         
-        # Force garbage collection to free memory
-        gc.collect()
+        processable = [document for document in documents if "error" not in document]
+        logger.info(f"Batch contains {len(documents)} documents ({len(processable)} processable)")
+        
+        # The whole batch takes one slot in the bulk lane
+        if ADMISSION and processable:
+            try:
+                with stage("admission"):
+                    cost = sum(estimate_cost(document["source"], document["filename"])[0] for document in processable)
+                    ticket = admission_controller.acquire(cost, request_deadline_seconds(), lane="bulk")
+            except AdmissionRejected as e:
+                return overloaded_response(e)
+        
+        processing_start = time.time()
+        try:
+            with memory_governor.track_request() as memory:
+                results = iter(process_batch(processable))
+        finally:
+            if ticket:
+                admission_controller.release(ticket)
+        processing_time = time.time() - processing_start
+        
+        response_documents = []
+        for document in documents:
+            if "error" in document:
+                response_documents.append({"filename": document["filename"], "pages": [], "error": document["error"]})
+            else:
+                response_documents.append({"filename": document["filename"],
+                                           **format_result(next(results), output_format,
+                                                           document_id=document.get("cache_key"),
+                                                           filename=document["filename"],
+                                                           languages=document["languages"])})
+        
+        failed = sum(1 for document in response_documents if "error" in document)
+        logger.info(f"Batch OCR completed in {processing_time:.2f} seconds "
+                    f"({len(documents)} documents, {failed} failed)")
+        processing_info = {
+            "processing_time_seconds": round(processing_time, 2),
+            "total_time_seconds": round(time.time() - start_time, 2),
+            "languages_used": languages,
+            "documents": len(documents),
+            "failed_documents": failed,
+            "memory": memory.to_dict()
+        }
+        if debug_timing_requested():
+            processing_info["timing"] = g.timings.to_dict()
+        with stage("json"):
+            response = json_response({
+                "documents": response_documents,
+                "processing_info": processing_info
+            })
+        return response
+    
+    except (zipfile.BadZipFile, json.JSONDecodeError) as e:
+        logger.warning(f"Invalid batch request: {e}")
+        return jsonify({"error": "Invalid batch request", "details": str(e)}), 400
+    except Exception as e:
+        logger.error(f"Batch OCR processing failed: {str(e)}", exc_info=True)
+        return jsonify({
+            "error": "Batch OCR processing failed",
+            "details": str(e)
+        }), 500
+
+@app.route("/jobs", methods=["POST"])
+def submit_job():
+    """Accept an upload for background OCR and return its job id right away"""
+    logger.info("Job submission received")
+    
+    upload, error_response = read_upload()
+    if error_response:
+        return error_response
+    
+    try:
+        job = job_manager.submit(upload["file_bytes"], upload["languages"], upload["filename"],
+                                 document_id=upload["document_id"],
+                                 options={key: upload[key] for key in DOCUMENT_OPTIONS})
+    except QueueFullError as e:
+        logger.warning(f"Rejecting job: {e}")
+        response = jsonify({
+            "error": "Too many queued jobs",
+            "details": str(e)
+        })
+        response.headers["Retry-After"] = str(JOB_RETRY_AFTER_SECONDS)
+        return response, 429
+    
+    return jsonify({
+        "job_id": job.id,
+        "status": job.status,
+        "status_url": f"/jobs/{job.id}"
+    }), 202
+
+@app.route("/jobs/<job_id>", methods=["GET"])
+def get_job(job_id):
+    """Return job status, per-page progress and, once finished, the result"""
+    output_format = requested_format()
+    if output_format is None:
+        return invalid_format_response()
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found", "details": "Unknown job id or result expired"}), 404
+    job_data = job.to_dict()
+    if "result" in job_data:
+        job_data["result"] = format_result(job_data["result"], output_format, document_id=job.document_id,
+                                           filename=job.filename, languages=job.languages)
+    return json_response(job_data)
+
+@app.route("/metrics", methods=["GET"])
+def metrics_endpoint():
+    """Prometheus metrics: request and per-stage latency histograms, item counters, pool stats"""
+    from ocr_processor import reader_pool
+    from result_cache import get_cache
+    
+    extra_lines = render_stats("ocr_reader_pool", reader_pool.stats(), "OCR reader pool statistic")
+    cache = get_cache()
+    if cache is not None:
+        extra_lines += render_stats("ocr_result_cache", cache.stats(), "OCR result cache statistic")
+    extra_lines += render_stats("ocr_jobs", job_manager.stats(), "OCR job queue statistic")
+    extra_lines += render_stats("ocr_admission", admission_controller.stats(), "OCR admission control statistic")
+    if page_cache is not None:
+        extra_lines += render_stats("ocr_page_dedupe", page_cache.stats(), "OCR page dedupe statistic")
+    if template_cache is not None:
+        extra_lines += render_stats("ocr_form_templates", template_cache.stats(), "OCR form template statistic")
+    extra_lines += render_stats("ocr_memory", memory_governor.stats(), "OCR memory governor statistic")
+    return Response(render_prometheus(extra_lines), mimetype="text/plain; version=0.0.4")
 
 @app.errorhandler(413)
 def too_large(e):
@@ -197,6 +624,8 @@ def internal_server_error(e):
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 5000))
     logger.info(f"Starting OCR service on port {port}")
+    # Load and warm up the readers in the background; /ready reports when done
+    startup_state.start()
     
     try:
         app.run(debug=False, host="0.0.0.0", port=port, threaded=True)
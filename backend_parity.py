@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Parity check of the torch and ONNX Runtime inference backends
+
+Runs the benchmark's synthetic corpus through process_document once with the
+torch reader and once with the ONNX reader (exporting the models if needed),
+then compares the recognized text and the box corners block by block.
+
+    python backend_parity.py                       # all scenarios
+    python backend_parity.py --scenario image_a4_dense --box-tolerance 3
+"""
+import argparse
+import logging
+import sys
+import time
+from benchmark import ModelsUnavailable, build_corpus, disable_reuse_caches, load_easyocr_reader
+from response_format import CORNERS
+
+BOX_TOLERANCE = 2.0  # Pixels a box corner may move between backends
+CONFIDENCE_TOLERANCE = 0.05
+MAX_TEXT_MISMATCH = 0.02  # Share of blocks whose text may differ (int8 torch weights vs float ONNX)
+
+def run_backend(backend, corpus):
+    """OCR every corpus document with a fresh reader on the given backend"""
+    from ocr_processor import process_document, reader_pool
+
+    reader_pool.clear()
+    # Otherwise the second backend is served the first one's cached pages
+    disable_reuse_caches()
+    start = time.perf_counter()
+    reader = load_easyocr_reader(backend)
+    if reader.backend != backend:
+        raise Exception(f"Reader fell back to {reader.backend}, see the log above")
+    reader_pool.add(['en'], reader)
+    print(f"   {backend}: loaded in {time.perf_counter() - start:.2f}s")
+
+    results = {}
+    for name, filename, data, _ in corpus:
+        start = time.perf_counter()
+        results[name] = process_document(data, ['en'], filename=filename, use_cache=False)
+        print(f"   {backend}: {name:<24} {time.perf_counter() - start:.2f}s")
+    return results
+
+def max_corner_distance(first, second):
+    return max(abs(a - b) for corner in CORNERS for a, b in zip(first["position"][corner], second["position"][corner]))
+
+def compare_results(expected, actual, box_tolerance=BOX_TOLERANCE, confidence_tolerance=CONFIDENCE_TOLERANCE):
+    """Block-level differences of two results: counts and example messages"""
+    report = {"blocks": 0, "text_mismatches": 0, "box_mismatches": 0, "confidence_mismatches": 0, "messages": []}
+    for expected_page, actual_page in zip(expected["pages"], actual["pages"]):
+        page_number = expected_page["page_number"]
+        expected_blocks, actual_blocks = expected_page["blocks"], actual_page["blocks"]
+        report["blocks"] += max(len(expected_blocks), len(actual_blocks))
+        if len(expected_blocks) != len(actual_blocks):
+            report["messages"].append(f"page {page_number}: {len(expected_blocks)} vs {len(actual_blocks)} blocks")
+            report["text_mismatches"] += abs(len(expected_blocks) - len(actual_blocks))
+        for index, (first, second) in enumerate(zip(expected_blocks, actual_blocks)):
+            if first["text"] != second["text"]:
+                report["text_mismatches"] += 1
+                report["messages"].append(f"page {page_number} block {index}: {first['text']!r} vs {second['text']!r}")
+            distance = max_corner_distance(first, second)
+            if distance > box_tolerance:
+                report["box_mismatches"] += 1
+                report["messages"].append(f"page {page_number} block {index}: box off by {distance:.1f}px")
+            if abs(first["confidence"] - second["confidence"]) > confidence_tolerance:
+                report["confidence_mismatches"] += 1
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare torch and ONNX Runtime OCR output on the synthetic corpus")
+    parser.add_argument("--scenario", action="append", help="check only this scenario (repeatable)")
+    parser.add_argument("--box-tolerance", type=float, default=BOX_TOLERANCE, help="allowed corner shift in pixels")
+    parser.add_argument("--max-text-mismatch", type=float, default=MAX_TEXT_MISMATCH,
+                        help="allowed share of blocks with different text or box (default 0.02)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    corpus = build_corpus(args.scenario)
+    print(f"🔍 Comparing backends on {len(corpus)} document(s)")
+    try:
+        torch_results = run_backend("torch", corpus)
+        onnx_results = run_backend("onnx", corpus)
+    except ModelsUnavailable as e:
+        print(f"❌ {e}")
+        sys.exit(2)
+
+    failed = False
+    for name, _, _, _ in corpus:
+        report = compare_results(torch_results[name], onnx_results[name], args.box_tolerance)
+        mismatches = report["text_mismatches"] + report["box_mismatches"]
+        share = mismatches / report["blocks"] if report["blocks"] else 0.0
+        status = "✅" if share <= args.max_text_mismatch else "❌"
+        failed |= status == "❌"
+        print(f"{status} {name:<24} {report['blocks']} blocks, {report['text_mismatches']} text, "
+              f"{report['box_mismatches']} box, {report['confidence_mismatches']} confidence mismatches")
+        for message in report["messages"][:5]:
+            print(f"   {message}")
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+"""
+Processing benchmark for the OCR pipeline
+
+Builds a synthetic corpus (images at several resolutions and text densities,
+multi-page PDFs), runs it through process_document and records pages/sec,
+p50/p95 latency, per-stage time and peak RSS to a JSON file. With --baseline
+the run is compared against a previous one and regressions are flagged.
+
+    python benchmark.py                                  # stub reader, our own overhead only
+    python benchmark.py --reader easyocr                 # real models (must be downloaded)
+    python benchmark.py --reader onnx                    # real models on ONNX Runtime
+    python benchmark.py --output new.json --baseline benchmark_baseline.json
+"""
+import argparse
+import io
+import json
+import logging
+import os
+import platform
+import resource
+import shutil
+import statistics
+import sys
+import time
+import zlib
+from PIL import Image, ImageDraw, ImageFont
+
+# Synthetic corpus: (name, kind, width, height, text lines, pages)
+SCENARIOS = [
+    ("image_small", "image", 400, 100, 1, 1),
+    ("image_a4_sparse", "image", 1240, 1754, 8, 1),
+    ("image_a4_dense", "image", 1240, 1754, 60, 1),
+    ("image_a4_300dpi_dense", "image", 2480, 3508, 120, 1),
+    ("pdf_3_pages", "pdf", 1240, 1754, 40, 3),
+    ("pdf_10_pages", "pdf", 1240, 1754, 40, 10),
+]
+SAMPLE_TEXT = "Invoice 12345 Hello World! OCR Test 123 Total amount due 678.90"
+REGRESSION_TOLERANCE = 0.15  # Relative change that counts as a regression
+
+class StubReader:
+    """Deterministic stand-in for easyocr.Reader that costs almost nothing
+
+    Text lines are found as runs of rows containing dark pixels and "recognized"
+    as a string derived from their position, so results are identical between
+    runs and the benchmark measures the pipeline around the models.
+    """
+    device = "cpu"
+    model_lang = "english"
+
+    def _lines(self, image):
+        grey = image.mean(axis=2) if image.ndim == 3 else image
+        dark_rows = (grey < 128).any(axis=1).nonzero()[0]
+        boxes = []
+        if len(dark_rows):
+            start = previous = dark_rows[0]
+            for row in list(dark_rows[1:]) + [None]:
+                if row is not None and row - previous <= 3:
+                    previous = row
+                    continue
+                columns = (grey[start:previous + 1] < 128).any(axis=0).nonzero()[0]
+                boxes.append([int(columns[0]), int(columns[-1]), int(start), int(previous)])
+                if row is not None:
+                    start = previous = row
+        return boxes
+
+    def detect(self, img, reformat=False, **kwargs):
+        images = img if img.ndim == 4 else [img]
+        return [self._lines(image) for image in images], [[] for _ in images]
+
+    def recognize(self, grey, horizontal_list, free_list, reformat=False, **kwargs):
+        results = []
+        for x_min, x_max, y_min, y_max in horizontal_list:
+            text = f"line {zlib.crc32(f'{x_min},{x_max},{y_min},{y_max}'.encode()) % 100000}"
+            box = [[x_min, y_min], [x_max, y_min], [x_max, y_max], [x_min, y_max]]
+            results.append((box, text, 0.9))
+        return results
+
+def load_font(size):
+    try:
+        return ImageFont.load_default(size=size)
+    except TypeError:
+        # Pillow < 10.1 has a single bitmap default font
+        return ImageFont.load_default()
+
+def create_test_image(text=SAMPLE_TEXT, size=(400, 100), lines=1, seed=0):
+    """Create a white page with the given number of black text lines"""
+    width, height = size
+    img = Image.new('RGB', size, color='white')
+    draw = ImageDraw.Draw(img)
+    margin = max(10, width // 20)
+    line_height = max(12, (height - 2 * margin) // max(lines, 1))
+    font = load_font(max(10, int(line_height * 0.6)))
+    for index in range(lines):
+        line = f"{seed}.{index} {text}"
+        draw.text((margin, margin + index * line_height), line, fill='black', font=font)
+    return img
+
+def create_test_pdf(pages, size, lines, dpi=150):
+    """Create a multi-page PDF of synthetic text pages"""
+    images = [create_test_image(size=size, lines=lines, seed=page) for page in range(pages)]
+    buffer = io.BytesIO()
+    images[0].save(buffer, "PDF", resolution=dpi, save_all=True, append_images=images[1:])
+    return buffer.getvalue()
+
+def build_corpus(names=None):
+    """Return [(name, filename, bytes, pages)] for the selected scenarios"""
+    corpus = []
+    for name, kind, width, height, lines, pages in SCENARIOS:
+        if names and name not in names:
+            continue
+        if kind == "pdf":
+            if not shutil.which("pdftoppm"):
+                print(f"⚠️  Skipping {name}: poppler (pdftoppm) is not installed")
+                continue
+            corpus.append((name, f"{name}.pdf", create_test_pdf(pages, (width, height), lines), pages))
+        else:
+            buffer = io.BytesIO()
+            create_test_image(size=(width, height), lines=lines).save(buffer, "PNG")
+            corpus.append((name, f"{name}.png", buffer.getvalue(), pages))
+    return corpus
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+class ModelsUnavailable(Exception):
+    """Raised when the EasyOCR models cannot be loaded from local files"""
+
+def load_easyocr_reader(backend):
+    """English EasyOCR reader built from local model files only
+
+    Downloads stay disabled: with them enabled EasyOCR deletes a model file
+    whose checksum it does not know and then fails offline re-downloading it.
+    """
+    import ocr_processor
+    try:
+        return ocr_processor.create_reader(['en'], backend=backend, download_enabled=False)
+    except Exception as e:
+        raise ModelsUnavailable(f"EasyOCR models are not available locally: {e}")
+
+def disable_reuse_caches():
+    """Switch off page dedupe and form templates, which would turn every repeat into a cache hit"""
+    import ocr_processor
+    ocr_processor.page_cache = None
+    ocr_processor.template_cache = None
+
+def run_scenario(process_document, track_request, filename, data, repeat, warmup, page_batch_size):
+    """Process one document repeatedly; returns latencies, page count and summed stage times"""
+    for _ in range(warmup):
+        process_document(data, ['en'], filename=filename, use_cache=False, page_batch_size=page_batch_size)
+
+    latencies = []
+    stages = {}
+    pages = blocks = 0
+    for _ in range(repeat):
+        with track_request() as timings:
+            start = time.perf_counter()
+            result = process_document(data, ['en'], filename=filename, use_cache=False,
+                                      page_batch_size=page_batch_size)
+            latencies.append(time.perf_counter() - start)
+        pages += len(result["pages"])
+        blocks += sum(len(page["blocks"]) for page in result["pages"])
+        for name, seconds in timings.to_dict()["stages"].items():
+            stages[name] = stages.get(name, 0.0) + seconds
+    return latencies, pages, blocks, stages
+
+def run_benchmark(reader="stub", repeat=5, warmup=1, scenarios=None):
+    """Run the selected scenarios and return the result document"""
+    import ocr_processor
+    from ocr_processor import process_document, reader_pool
+    from metrics import track_request
+
+    # use_cache=False only skips the result cache; repeats must really detect and recognize
+    disable_reuse_caches()
+    page_batch_size = None
+    if reader == "stub":
+        reader_pool.add(['en'], StubReader(), size=0)
+        # Batched pages go through the real recognizer network, keep the per-page path
+        page_batch_size = 1
+    else:
+        start = time.perf_counter()
+        reader_pool.add(['en'], load_easyocr_reader("onnx" if reader == "onnx" else ocr_processor.BACKEND))
+        print(f"   Loaded EasyOCR models in {time.perf_counter() - start:.2f}s")
+
+    results = {}
+    for name, filename, data, _ in build_corpus(scenarios):
+        latencies, pages, blocks, stages = run_scenario(process_document, track_request, filename, data,
+                                                repeat, warmup, page_batch_size)
+        total = sum(latencies)
+        results[name] = {
+            "runs": repeat,
+            "pages": pages,
+            "blocks_per_page": round(blocks / pages, 1) if pages else 0,
+            "pages_per_second": round(pages / total, 3) if total else None,
+            "latency_p50_seconds": round(statistics.median(latencies), 4),
+            "latency_p95_seconds": round(percentile(latencies, 0.95), 4),
+            "stage_seconds_per_page": {stage: round(seconds / pages, 4) for stage, seconds in sorted(stages.items())},
+            "peak_rss_mb": peak_rss_mb()
+        }
+        print(f"   {name:<24} {results[name]['pages_per_second']:>8} pages/s   "
+              f"p50 {results[name]['latency_p50_seconds']:.4f}s   p95 {results[name]['latency_p95_seconds']:.4f}s   "
+              f"RSS {results[name]['peak_rss_mb']} MB")
+
+    return {
+        "reader": reader,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "page_batch_size": page_batch_size or ocr_processor.PAGE_BATCH_SIZE,
+            "pool_size": ocr_processor.POOL_SIZE,
+            "jpeg_reencode": ocr_processor.JPEG_REENCODE
+        },
+        "scenarios": results,
+        "peak_rss_mb": peak_rss_mb()
+    }
+
+def compare(current, baseline, tolerance=REGRESSION_TOLERANCE):
+    """Return a list of regression messages of current against baseline"""
+    if baseline.get("reader") != current.get("reader"):
+        print(f"⚠️  Baseline used reader '{baseline.get('reader')}', this run '{current.get('reader')}'")
+    regressions = []
+    for name, result in current["scenarios"].items():
+        previous = baseline.get("scenarios", {}).get(name)
+        if not previous:
+            continue
+        # (metric, True when higher is better)
+        for metric, higher_is_better in (("pages_per_second", True), ("latency_p95_seconds", False),
+                                         ("peak_rss_mb", False)):
+            old, new = previous.get(metric), result.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            if (higher_is_better and change < -tolerance) or (not higher_is_better and change > tolerance):
+                regressions.append(f"{name}: {metric} {old} -> {new} ({change:+.0%})")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the OCR processing pipeline")
+    parser.add_argument("--reader", choices=["stub", "easyocr", "onnx"], default="stub",
+                        help="deterministic stub reader (default), the real EasyOCR models, or those on ONNX Runtime")
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs per scenario")
+    parser.add_argument("--warmup", type=int, default=1, help="untimed runs per scenario")
+    parser.add_argument("--scenario", action="append", help="run only this scenario (repeatable)")
+    parser.add_argument("--output", default="benchmark_results.json", help="where to write the results")
+    parser.add_argument("--baseline", help="previous results to compare against")
+    parser.add_argument("--tolerance", type=float, default=REGRESSION_TOLERANCE,
+                        help="relative change flagged as a regression (default 0.15)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    print(f"⏱️  Benchmarking with the {args.reader} reader ({args.repeat} runs, {args.warmup} warm-up)")
+    try:
+        results = run_benchmark(args.reader, args.repeat, args.warmup, args.scenario)
+    except ModelsUnavailable as e:
+        print(f"❌ {e}, run with --reader stub")
+        sys.exit(2)
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"   Results written to {args.output} (peak RSS {results['peak_rss_mb']} MB)")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"❌ {len(regressions)} regression(s) against {args.baseline}:")
+            for message in regressions:
+                print(f"   {message}")
+            sys.exit(1)
+        print(f"✅ No regressions against {args.baseline}")
+
+if __name__ == "__main__":
+    main()
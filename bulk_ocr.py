@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+Offline bulk OCR of document archives, resumable after interruption
+
+Documents come from directories (walked recursively), glob patterns or JSONL
+manifests, run through process_document across a process pool, and are written
+as they finish to sharded JSONL files in the output directory. The result
+cache key of every completed document (content hash plus languages, regions
+and processing settings) is appended to a checkpoint file, so a rerun with the
+same output directory skips everything already done.
+
+    python bulk_ocr.py scans/ --output out/ --workers 4
+    python bulk_ocr.py "archive/**/*.pdf" --output out/ --lang en,hi
+    python bulk_ocr.py manifest.jsonl --output out/ --pii
+
+Manifest lines are JSON objects with a ``path`` (relative to the manifest) and
+optional ``document_id``, ``lang``, ``regions``, ``first_page`` and ``last_page``.
+Results are written at least once: a document that finished right before an
+interruption may appear twice across shards.
+"""
+import argparse
+import glob
+import itertools
+import json
+import logging
+import os
+import sys
+import time
+
+DOCUMENT_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.pdf'}
+SHARD_SIZE = 1000  # Records per output shard
+WINDOW_PER_WORKER = 16  # Documents in flight per worker; bounds memory on huge inputs
+PROGRESS_INTERVAL = 10.0  # Seconds between progress lines
+CHECKPOINT_FILE = "checkpoint.txt"
+ERRORS_FILE = "errors.jsonl"
+
+# Keys of completed documents, loaded before the pool forks so workers inherit them
+_completed = set()
+
+def _manifest_documents(path):
+    base = os.path.dirname(os.path.abspath(path))
+    with open(path) as f:
+        for index, line in enumerate(f):
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            document_path = entry.get("path") or entry.get("file")
+            if not document_path:
+                logging.warning(f"{path}:{index + 1}: no path, skipping")
+                continue
+            yield {
+                "path": os.path.join(base, document_path),
+                "document_id": entry.get("document_id") or entry.get("id") or document_path,
+                "lang": entry.get("lang"),
+                "regions": entry.get("regions"),
+                "first_page": entry.get("first_page"),
+                "last_page": entry.get("last_page")
+            }
+
+def iter_documents(inputs):
+    """Yield a document dict per file of the given directories, glob patterns and JSONL manifests"""
+    for source in inputs:
+        if os.path.isdir(source):
+            for root, directories, files in os.walk(source):
+                directories.sort()
+                for name in sorted(files):
+                    if os.path.splitext(name)[1].lower() in DOCUMENT_EXTENSIONS:
+                        path = os.path.join(root, name)
+                        yield {"path": path, "document_id": os.path.relpath(path, source)}
+        elif source.endswith(".jsonl") and os.path.isfile(source):
+            yield from _manifest_documents(source)
+        else:
+            for path in sorted(glob.iglob(source, recursive=True)):
+                if os.path.splitext(path)[1].lower() in DOCUMENT_EXTENSIONS:
+                    yield {"path": path, "document_id": path}
+
+def load_checkpoint(output_dir):
+    path = os.path.join(output_dir, CHECKPOINT_FILE)
+    if not os.path.exists(path):
+        return set()
+    with open(path) as f:
+        return {line.strip() for line in f if line.strip()}
+
+def _process_task(task):
+    """Pool task: OCR one document. Returns ``(document, key, status, JSONL line or error, pages)``"""
+    from ocr_processor import process_document, result_cache_key, _read_source
+    from ocr_to_pii_request import ocr_to_pii_request, file_type_for
+    from regions import parse_regions
+    from response_format import dumps
+
+    document, default_languages, pii = task
+    key = None
+    try:
+        lang = document.get("lang") or default_languages
+        languages = [code.strip() for code in lang.split(",") if code.strip()] if isinstance(lang, str) else lang
+        regions = parse_regions(document.get("regions"))
+        options = {"regions": regions, "first_page": document.get("first_page"),
+                   "last_page": document.get("last_page")}
+        source, filename = _read_source(document["path"])
+        key = result_cache_key(source, languages, **options)
+        if key in _completed:
+            return document, key, "skipped", None, 0
+        result = process_document(source, languages, filename=filename, use_cache=False, **options)
+        if pii:
+            record = ocr_to_pii_request(result, document["document_id"], file_type_for(filename), languages)
+        else:
+            record = {"document_id": document["document_id"], "path": document["path"], "hash": key,
+                      "languages": languages, **result}
+        return document, key, "done", dumps(record).decode() + "\n", len(result["pages"])
+    except Exception as e:
+        return document, key, "failed", str(e), 0
+
+class ShardWriter:
+    """Appends JSONL lines to numbered shards, starting after the shards of earlier runs"""
+
+    def __init__(self, output_dir, prefix, shard_size=SHARD_SIZE):
+        self.output_dir = output_dir
+        self.prefix = prefix
+        self.shard_size = shard_size
+        existing = glob.glob(os.path.join(output_dir, f"{prefix}-*.jsonl"))
+        self.index = max((int(os.path.basename(path)[len(prefix) + 1:-6]) for path in existing), default=-1)
+        self._file = None
+        self._lines = 0
+
+    def write(self, line):
+        if self._file is None or self._lines >= self.shard_size:
+            self.close()
+            self.index += 1
+            self._file = open(os.path.join(self.output_dir, f"{self.prefix}-{self.index:05d}.jsonl"), "w")
+            self._lines = 0
+        self._file.write(line)
+        self._file.flush()
+        self._lines += 1
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+class Progress:
+    """Throughput and ETA of a run, printed to stderr every ``interval`` seconds"""
+
+    def __init__(self, total, interval=PROGRESS_INTERVAL):
+        self.total = total
+        self.interval = interval
+        self.counts = {"done": 0, "skipped": 0, "failed": 0}
+        self.pages = 0
+        self.started_at = time.time()
+        self._printed_at = self.started_at
+
+    def update(self, status, pages):
+        self.counts[status] += 1
+        self.pages += pages
+        if time.time() - self._printed_at >= self.interval:
+            self.print()
+
+    def print(self, final=False):
+        self._printed_at = time.time()
+        elapsed = max(self._printed_at - self.started_at, 1e-9)
+        processed = self.counts["done"] + self.counts["failed"]
+        finished = processed + self.counts["skipped"]
+        rate = processed / elapsed
+        remaining = self.total - finished if self.total is not None else None
+        eta = f"{remaining / rate:.0f}s" if rate and remaining is not None else "?"
+        label = "Finished" if final else "Progress"
+        total = self.total if self.total is not None else "?"
+        print(f"{label}: {finished}/{total} documents ({self.counts['done']} done, {self.counts['skipped']} skipped, "
+              f"{self.counts['failed']} failed), {rate:.2f} docs/s, {self.pages / elapsed:.2f} pages/s, "
+              f"ETA {'0s' if final else eta}", file=sys.stderr, flush=True)
+
+def run(inputs, output_dir, languages="en", workers=1, threads=1, shard_size=SHARD_SIZE, pii=False,
+        progress_interval=PROGRESS_INTERVAL):
+    """OCR every input document not yet in the output directory's checkpoint; returns the progress counts"""
+    global _completed
+    import ocr_processor
+    from ocr_pool import get_pool, shutdown_pool
+
+    os.makedirs(output_dir, exist_ok=True)
+    _completed = load_checkpoint(output_dir)
+    total = sum(1 for _ in iter_documents(inputs))
+    print(f"📚 {total} document(s), {len(_completed)} already in the checkpoint", file=sys.stderr)
+
+    # Documents are spread across processes here; no nested page pool inside them
+    ocr_processor.POOL_SIZE = 0
+    default_languages = [code.strip() for code in languages.split(",") if code.strip()]
+    pool = get_pool(workers, threads, preload_languages=[default_languages]) if workers > 1 else None
+
+    writer = ShardWriter(output_dir, "pii" if pii else "results", shard_size)
+    progress = Progress(total, progress_interval)
+    tasks = ((document, default_languages, pii) for document in iter_documents(inputs))
+    window = max(1, workers) * WINDOW_PER_WORKER
+    try:
+        with open(os.path.join(output_dir, CHECKPOINT_FILE), "a") as checkpoint, \
+                open(os.path.join(output_dir, ERRORS_FILE), "a") as errors:
+            while True:
+                batch = list(itertools.islice(tasks, window))
+                if not batch:
+                    break
+                results = pool.imap_unordered(_process_task, batch) if pool else map(_process_task, batch)
+                for document, key, status, output, pages in results:
+                    if status == "done":
+                        # Result first, checkpoint second: an interruption in between only duplicates
+                        writer.write(output)
+                        checkpoint.write(key + "\n")
+                        checkpoint.flush()
+                    elif status == "failed":
+                        logging.error(f"{document['path']}: {output}")
+                        errors.write(json.dumps({"path": document["path"], "document_id": document["document_id"],
+                                                 "error": output}) + "\n")
+                        errors.flush()
+                    progress.update(status, pages)
+    finally:
+        writer.close()
+        if pool:
+            shutdown_pool()
+    progress.print(final=True)
+    return progress.counts
+
+def main():
+    parser = argparse.ArgumentParser(description="OCR directories, globs or JSONL manifests into sharded JSONL")
+    parser.add_argument("inputs", nargs="+", help="directory, glob pattern or .jsonl manifest (repeatable)")
+    parser.add_argument("--output", required=True, help="output directory for shards, checkpoint and errors")
+    parser.add_argument("--lang", default="en", help="default languages, comma separated (default en)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="OCR processes")
+    parser.add_argument("--threads", type=int, default=1, help="inference threads per process")
+    parser.add_argument("--shard-size", type=int, default=SHARD_SIZE, help="records per output shard")
+    parser.add_argument("--pii", action="store_true", help="write PII service requests instead of OCR results")
+    parser.add_argument("--progress-interval", type=float, default=PROGRESS_INTERVAL,
+                        help="seconds between progress lines")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    counts = run(args.inputs, args.output, args.lang, args.workers, args.threads, args.shard_size, args.pii,
+                 args.progress_interval)
+    sys.exit(1 if counts["failed"] else 0)
+
+if __name__ == "__main__":
+    main()
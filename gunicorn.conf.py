@@ -0,0 +1,25 @@
+# Gunicorn settings shared by all deployments (command line flags take precedence)
+import os
+
+# Import the app in the master so workers are forked with the models already in memory
+preload_app = True
+
+# Threads accept requests into the worker so the admission controller can queue,
+# prioritize or reject them (OCR concurrency itself is OCR_ADMISSION_MAX_CONCURRENT)
+worker_class = "gthread"
+threads = int(os.environ.get("GUNICORN_THREADS", "8"))
+
+def on_starting(server):
+    """Load and warm up the configured OCR readers in the master, before any worker is forked"""
+    from startup import startup_state
+    startup_state.preload()
+
+def post_fork(server, worker):
+    """Warm up the inherited readers in each new worker; /ready returns 200 once done"""
+    from startup import startup_state
+    from memory_governor import memory_governor
+    from ocr_pool import start_worker_pool
+    memory_governor.attach_worker(worker)
+    # Before any other thread of the worker exists (request threads, warm-up)
+    start_worker_pool()
+    startup_state.start()
@@ -0,0 +1,173 @@
+import os
+import queue
+import threading
+import time
+import uuid
+import logging
+from ocr_processor import process_document, pdf_page_count, is_pdf, page_range, result_cache_key
+from admission import admission_controller, estimate_cost, ADMISSION
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Job subsystem settings
+JOB_QUEUE_SIZE = int(os.environ.get("OCR_JOB_QUEUE_SIZE", "16"))  # Queued jobs before POST /jobs returns 429
+JOB_WORKERS = int(os.environ.get("OCR_JOB_WORKERS", "1"))  # Background OCR threads
+JOB_RESULT_TTL_SECONDS = int(os.environ.get("OCR_JOB_RESULT_TTL_SECONDS", "3600"))  # Keep finished jobs this long
+
+class QueueFullError(Exception):
+    """Raised when the job queue has no room for another job"""
+
+class Job:
+    """A queued OCR request and its progress
+
+    ``options`` are passed on to ``process_document`` (regions, page range,
+    mode and boxes).
+    """
+
+    def __init__(self, file_bytes, languages, filename, document_id=None, options=None):
+        self.id = uuid.uuid4().hex
+        self.file_bytes = file_bytes
+        self.languages = languages
+        self.filename = filename
+        self.document_id = document_id
+        self.options = options or {}
+        self.status = "queued"
+        self.pages_done = 0
+        self.pages_total = None
+        self.result = None
+        self.error = None
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+    def to_dict(self):
+        job = {
+            "job_id": self.id,
+            "status": self.status,
+            "filename": self.filename,
+            "progress": {
+                "pages_done": self.pages_done,
+                "pages_total": self.pages_total
+            },
+            "submitted_at": self.submitted_at
+        }
+        if self.started_at:
+            job["queue_time_seconds"] = round(self.started_at - self.submitted_at, 2)
+        if self.finished_at:
+            job["processing_time_seconds"] = round(self.finished_at - self.started_at, 2)
+        if self.status == "completed":
+            job["result"] = self.result
+        elif self.status == "failed":
+            job["error"] = self.error
+        return job
+
+class JobManager:
+    """Bounded in-process job queue served by background OCR threads
+
+    Workers are started lazily in the serving process, since threads do not
+    survive gunicorn forking its workers from a preloaded master.
+    """
+
+    def __init__(self, queue_size=JOB_QUEUE_SIZE, workers=JOB_WORKERS, result_ttl=JOB_RESULT_TTL_SECONDS):
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.workers = workers
+        self.result_ttl = result_ttl
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._started_pid = None
+
+    def _ensure_workers(self):
+        with self._lock:
+            if self._started_pid == os.getpid():
+                return
+            for index in range(self.workers):
+                thread = threading.Thread(target=self._worker, name=f"ocr-job-worker-{index}", daemon=True)
+                thread.start()
+            self._started_pid = os.getpid()
+            logger.info(f"Started {self.workers} OCR job worker(s), queue size {self.queue.maxsize}")
+
+    def _purge_expired(self):
+        now = time.time()
+        with self._lock:
+            expired = [job_id for job_id, job in self._jobs.items()
+                       if job.finished_at and now - job.finished_at > self.result_ttl]
+            for job_id in expired:
+                del self._jobs[job_id]
+        if expired:
+            logger.debug(f"Purged {len(expired)} expired job(s)")
+
+    def submit(self, file_bytes, languages, filename, document_id=None, options=None):
+        """Queue a job and return it; raises QueueFullError when the queue is full"""
+        self._ensure_workers()
+        self._purge_expired()
+        job = Job(file_bytes, languages, filename, document_id, options)
+        with self._lock:
+            self._jobs[job.id] = job
+        try:
+            self.queue.put_nowait(job)
+        except queue.Full:
+            with self._lock:
+                del self._jobs[job.id]
+            raise QueueFullError(f"Job queue is full ({self.queue.maxsize} jobs)")
+        logger.info(f"Queued job {job.id} ({filename}), queue depth {self.queue.qsize()}")
+        return job
+
+    def get(self, job_id):
+        self._purge_expired()
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def stats(self):
+        with self._lock:
+            statuses = [job.status for job in self._jobs.values()]
+        return {
+            "queued": statuses.count("queued"),
+            "running": statuses.count("running"),
+            "completed": statuses.count("completed"),
+            "failed": statuses.count("failed"),
+            "queue_capacity": self.queue.maxsize
+        }
+
+    def _on_page(self, job, page_data):
+        job.pages_done += 1
+
+    def _worker(self):
+        while True:
+            job = self.queue.get()
+            ticket = None
+            try:
+                if ADMISSION:
+                    # A bulk slot like batches and streams; never rejected, since no request waits on a job
+                    cost = estimate_cost(job.file_bytes, job.filename, **job.options)[0]
+                    ticket = admission_controller.acquire(cost, None, lane="bulk")
+                job.status = "running"
+                job.started_at = time.time()
+                logger.info(f"Running job {job.id}")
+                if is_pdf(job.file_bytes, job.filename):
+                    first_page, last_page = page_range(job.options.get("first_page"), job.options.get("last_page"))
+                    job.pages_total = max(0, min(pdf_page_count(job.file_bytes), last_page) - first_page + 1)
+                else:
+                    job.pages_total = 1
+                # Hashed once: the result cache key doubles as the default PII document id
+                key = result_cache_key(job.file_bytes, job.languages, **job.options)
+                job.document_id = job.document_id or key
+                job.result = process_document(job.file_bytes, job.languages, filename=job.filename,
+                                              on_page=lambda page_data: self._on_page(job, page_data),
+                                              result_key=key, **job.options)
+                job.pages_done = len(job.result["pages"])
+                job.status = "completed"
+            except Exception as e:
+                logger.error(f"Job {job.id} failed: {e}", exc_info=True)
+                job.error = str(e)
+                job.status = "failed"
+            finally:
+                if ticket:
+                    admission_controller.release(ticket)
+                job.file_bytes = None
+                job.started_at = job.started_at or time.time()
+                job.finished_at = time.time()
+                self.queue.task_done()
+            logger.info(f"Job {job.id} {job.status} in {job.finished_at - job.started_at:.2f} seconds")
+
+job_manager = JobManager()
@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+"""
+Open-loop HTTP load generator for the OCR service
+
+Drives /ocr (with a mix of the benchmark's synthetic images and PDFs) and
+/health at a fixed arrival rate (open loop: requests are sent on schedule
+whether or not earlier ones finished, and latency counts from the scheduled
+send time) or at a fixed concurrency (closed loop). Reports p50/p90/p99
+latency, throughput, error, rejection (503) and timeout rates, and the
+server's RSS over time.
+
+With --local (or --config), the service is started under gunicorn with the
+benchmark's stub reader, so no models or network are needed; each --config
+runs the same load against another worker/thread setup for a side by side
+comparison.
+
+    python load_test.py --local --rate 4 --duration 30
+    python load_test.py --config workers=1,threads=8 --config workers=2,threads=4 --concurrency 8
+    python load_test.py --url http://localhost:5000 --rate 1 --duration 60 --output load.json
+"""
+import argparse
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from benchmark import StubReader, build_corpus, percentile
+
+DEFAULT_SCENARIOS = ["image_small", "image_a4_sparse", "pdf_3_pages"]
+DEFAULT_DURATION = 30.0  # Seconds of load per run
+REQUEST_TIMEOUT = 120.0  # Client-side timeout per request
+HEALTH_SHARE = 0.1  # Share of requests sent to /health
+RSS_INTERVAL = 1.0  # Seconds between server RSS samples
+READY_TIMEOUT = 120.0  # Seconds to wait for a local server's /ready
+MAX_IN_FLIGHT = 256  # Client threads for open-loop runs
+# Simulated model time of the local stub reader; sleeping releases the GIL like torch does
+STUB_SECONDS_PER_MEGAPIXEL = float(os.environ.get("LOAD_TEST_STUB_SECONDS_PER_MEGAPIXEL", "0.2"))
+# Local servers run with the caches off, so repeated uploads are really processed
+LOCAL_SERVER_ENV = {"OCR_PRELOAD": "0", "OCR_CACHE_ENABLED": "0", "OCR_PAGE_DEDUPE": "0", "OCR_FORM_TEMPLATES": "0"}
+
+class TimedStubReader(StubReader):
+    """Stub reader that spends STUB_SECONDS_PER_MEGAPIXEL per detected page"""
+
+    def detect(self, img, reformat=False, **kwargs):
+        pixels = img.shape[1] * img.shape[2] * len(img) if img.ndim == 4 else img.shape[0] * img.shape[1]
+        time.sleep(STUB_SECONDS_PER_MEGAPIXEL * pixels / 1e6)
+        return super().detect(img, reformat=reformat, **kwargs)
+
+def stub_app():
+    """Gunicorn app factory (``load_test:stub_app()``): the service with the stub reader preinstalled"""
+    from app import app
+    from ocr_processor import reader_pool
+    reader_pool.add(['en'], TimedStubReader(), size=0)
+    return app
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def _process_rss(pid):
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
+
+def _children(pid):
+    children = []
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # The parent pid follows the parenthesized command name
+                if int(f.read().rsplit(")", 1)[1].split()[1]) == pid:
+                    children.append(int(entry))
+        except (OSError, ValueError, IndexError):
+            continue
+    return children
+
+class LocalServer:
+    """The service under gunicorn with the stub reader, on a free local port"""
+
+    def __init__(self, workers=1, threads=8):
+        self.workers = workers
+        self.threads = threads
+        self.port = _free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        self.process = None
+        self.log = None
+
+    def start(self):
+        command = ["gunicorn", "--config", "gunicorn.conf.py", "--bind", f"127.0.0.1:{self.port}",
+                   "--workers", str(self.workers), "--threads", str(self.threads), "--timeout", "300",
+                   "--log-level", "warning", "load_test:stub_app()"]
+        env = {**os.environ, **LOCAL_SERVER_ENV}
+        # Request logs would drown the report; they go to a file kept for inspection
+        self.log = tempfile.NamedTemporaryFile(prefix="load_test_server_", suffix=".log", delete=False)
+        self.process = subprocess.Popen(command, cwd=os.path.dirname(os.path.abspath(__file__)), env=env,
+                                        stdout=self.log, stderr=subprocess.STDOUT)
+        deadline = time.time() + READY_TIMEOUT
+        while time.time() < deadline:
+            if self.process.poll() is not None:
+                raise Exception(f"gunicorn exited with code {self.process.returncode}, see {self.log.name}")
+            try:
+                if requests.get(f"{self.url}/ready", timeout=2).status_code == 200:
+                    return self
+            except requests.RequestException:
+                pass
+            time.sleep(0.2)
+        self.stop()
+        raise Exception(f"Server not ready after {READY_TIMEOUT:.0f}s, see {self.log.name}")
+
+    def rss_mb(self):
+        """Summed RSS of the gunicorn master and its workers"""
+        pids = [self.process.pid] + _children(self.process.pid)
+        return round(sum(_process_rss(pid) for pid in pids) / (1024 * 1024), 1)
+
+    def stop(self):
+        if self.process and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+        if self.log:
+            self.log.close()
+
+def remote_rss_mb(url):
+    """RSS of whichever worker answers /metrics (ocr_memory_rss_mb), or None"""
+    try:
+        for line in requests.get(f"{url}/metrics", timeout=5).text.splitlines():
+            if line.startswith("ocr_memory_rss_mb "):
+                return float(line.split()[1])
+    except (requests.RequestException, ValueError):
+        pass
+    return None
+
+class LoadRun:
+    """One load run: request records plus the RSS timeline"""
+
+    def __init__(self, url, corpus, health_share=HEALTH_SHARE, timeout=REQUEST_TIMEOUT, rss=None):
+        self.url = url
+        self.corpus = corpus
+        self.health_share = health_share
+        self.timeout = timeout
+        self.rss = rss or (lambda: remote_rss_mb(url))
+        self.records = []  # (endpoint, scenario, outcome, latency seconds, pages)
+        self.rss_timeline = []
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._random = random.Random(0)
+
+    def _session(self):
+        if not hasattr(self._local, "session"):
+            self._local.session = requests.Session()
+        return self._local.session
+
+    def _pick(self):
+        with self._lock:
+            if self._random.random() < self.health_share:
+                return None
+            return self._random.choice(self.corpus)
+
+    def send(self, scheduled_at=None):
+        """Send one request; latency counts from ``scheduled_at`` (open loop) or the send time"""
+        document = self._pick()
+        start = scheduled_at or time.perf_counter()
+        pages = 0
+        try:
+            if document is None:
+                endpoint, scenario = "health", "health"
+                response = self._session().get(f"{self.url}/health", timeout=self.timeout)
+            else:
+                endpoint, (scenario, filename, data, pages) = "ocr", document
+                response = self._session().post(f"{self.url}/ocr", files={"file": (filename, data)},
+                                                data={"lang": "en"}, timeout=self.timeout)
+            if response.status_code == 200:
+                outcome = "ok"
+            elif response.status_code == 503:
+                outcome = "rejected"
+            else:
+                outcome = "error"
+        except requests.Timeout:
+            outcome = "timeout"
+        except requests.RequestException:
+            outcome = "error"
+        latency = time.perf_counter() - start
+        with self._lock:
+            self.records.append((endpoint, scenario, outcome, latency, pages if outcome == "ok" else 0))
+
+    def _sample_rss(self, stop, interval):
+        started_at = time.perf_counter()
+        while not stop.wait(interval):
+            rss = self.rss()
+            if rss is not None:
+                self.rss_timeline.append((round(time.perf_counter() - started_at, 1), rss))
+
+    def run(self, duration, rate=None, concurrency=None, rss_interval=RSS_INTERVAL, poisson=True):
+        stop = threading.Event()
+        sampler = threading.Thread(target=self._sample_rss, args=(stop, rss_interval), daemon=True)
+        sampler.start()
+        started_at = time.perf_counter()
+        end_at = started_at + duration
+        if rate:
+            # Open loop: arrivals follow the schedule, however long earlier requests take
+            with ThreadPoolExecutor(MAX_IN_FLIGHT) as executor:
+                next_at = started_at
+                while next_at < end_at:
+                    delay = next_at - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                    executor.submit(self.send, next_at)
+                    next_at += self._random.expovariate(rate) if poisson else 1.0 / rate
+        else:
+            def loop():
+                while time.perf_counter() < end_at:
+                    self.send()
+            threads = [threading.Thread(target=loop) for _ in range(concurrency)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.elapsed = time.perf_counter() - started_at
+        stop.set()
+        sampler.join()
+        return self
+
+    def _summary(self, records):
+        latencies = [latency for _, _, outcome, latency, _ in records if outcome == "ok"]
+        outcomes = [outcome for _, _, outcome, _, _ in records]
+        summary = {
+            "requests": len(records),
+            "ok": outcomes.count("ok"),
+            "throughput_rps": round(outcomes.count("ok") / self.elapsed, 3),
+            "error_rate": round(outcomes.count("error") / len(records), 4) if records else 0.0,
+            "rejected_rate": round(outcomes.count("rejected") / len(records), 4) if records else 0.0,
+            "timeout_rate": round(outcomes.count("timeout") / len(records), 4) if records else 0.0
+        }
+        if latencies:
+            summary.update({f"latency_p{int(fraction * 100)}_seconds": round(percentile(latencies, fraction), 4)
+                            for fraction in (0.5, 0.9, 0.99)})
+        return summary
+
+    def report(self):
+        ocr = [record for record in self.records if record[0] == "ocr"]
+        rss_values = [rss for _, rss in self.rss_timeline]
+        return {
+            "duration_seconds": round(self.elapsed, 2),
+            "pages_per_second": round(sum(record[4] for record in ocr) / self.elapsed, 3),
+            "ocr": self._summary(ocr),
+            "health": self._summary([record for record in self.records if record[0] == "health"]),
+            "scenarios": {name: self._summary([record for record in ocr if record[1] == name])
+                          for name in sorted({record[1] for record in ocr})},
+            "rss_mb": {
+                "max": max(rss_values) if rss_values else None,
+                "final": rss_values[-1] if rss_values else None,
+                "timeline": self.rss_timeline
+            }
+        }
+
+def parse_config(text):
+    """``workers=2,threads=4`` -> {"workers": 2, "threads": 4}"""
+    config = {"workers": 1, "threads": 8}
+    for item in text.split(","):
+        key, _, value = item.partition("=")
+        if key.strip() not in config:
+            raise argparse.ArgumentTypeError(f"unknown setting {key!r} (use workers and threads)")
+        config[key.strip()] = int(value)
+    return config
+
+def print_report(label, report):
+    ocr = report["ocr"]
+    print(f"   {label:<22} {ocr['throughput_rps']:>7} req/s {report['pages_per_second']:>7} pages/s   "
+          f"p50 {ocr.get('latency_p50_seconds', '-')}s  p90 {ocr.get('latency_p90_seconds', '-')}s  "
+          f"p99 {ocr.get('latency_p99_seconds', '-')}s   errors {ocr['error_rate']:.1%}  "
+          f"503 {ocr['rejected_rate']:.1%}  timeouts {ocr['timeout_rate']:.1%}   "
+          f"RSS max {report['rss_mb']['max']} MB")
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test /ocr and /health and report latency percentiles")
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("--url", help="service to load (default: a local stub server, see --local)")
+    target.add_argument("--local", action="store_true", help="start the service locally with the stub reader")
+    parser.add_argument("--config", action="append", type=parse_config,
+                        help="local gunicorn setup, e.g. workers=2,threads=4 (repeatable, implies --local)")
+    load = parser.add_mutually_exclusive_group()
+    load.add_argument("--rate", type=float, help="open-loop arrival rate in requests/s (default 2)")
+    load.add_argument("--concurrency", type=int, help="closed-loop: requests kept in flight")
+    parser.add_argument("--uniform", action="store_true", help="evenly spaced arrivals instead of Poisson")
+    parser.add_argument("--duration", type=float, default=DEFAULT_DURATION, help="seconds of load per run")
+    parser.add_argument("--scenario", action="append", help="benchmark scenario in the /ocr mix (repeatable)")
+    parser.add_argument("--health-share", type=float, default=HEALTH_SHARE, help="share of /health requests")
+    parser.add_argument("--timeout", type=float, default=REQUEST_TIMEOUT, help="client timeout per request")
+    parser.add_argument("--rss-interval", type=float, default=RSS_INTERVAL, help="seconds between RSS samples")
+    parser.add_argument("--output", help="write the full report (with RSS timelines) as JSON")
+    args = parser.parse_args()
+
+    rate = args.rate or (None if args.concurrency else 2.0)
+    corpus = build_corpus(args.scenario or DEFAULT_SCENARIOS)
+    mode = f"{rate} req/s open loop" if rate else f"concurrency {args.concurrency}"
+    print(f"🚦 Load test: {mode}, {args.duration:.0f}s per run, {len(corpus)} document type(s), "
+          f"{args.health_share:.0%} /health")
+
+    runs = []
+    if args.url:
+        report = LoadRun(args.url, corpus, args.health_share, args.timeout).run(
+            args.duration, rate, args.concurrency, args.rss_interval, not args.uniform).report()
+        runs.append({"target": args.url, **report})
+        print_report(args.url, report)
+    else:
+        for config in args.config or [parse_config("workers=1")]:
+            label = f"workers={config['workers']},threads={config['threads']}"
+            server = LocalServer(**config).start()
+            try:
+                report = LoadRun(server.url, corpus, args.health_share, args.timeout, server.rss_mb).run(
+                    args.duration, rate, args.concurrency, args.rss_interval, not args.uniform).report()
+            finally:
+                server.stop()
+            runs.append({"target": "local", "server": config, **report})
+            print_report(label, report)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"rate": rate, "concurrency": args.concurrency, "duration_seconds": args.duration,
+                       "scenarios": [name for name, _, _, _ in corpus], "runs": runs}, f, indent=2)
+        print(f"   Report written to {args.output}")
+    failed = any(run["ocr"]["requests"] and run["ocr"]["ok"] == 0 for run in runs)
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+import os
+import gc
+import time
+import ctypes
+import threading
+import tracemalloc
+import contextvars
+import logging
+from contextlib import contextmanager
+from metrics import stage
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Memory governor settings
+MEMORY_GOVERNOR = os.environ.get("OCR_MEMORY_GOVERNOR", "1") == "1"  # Off: a full collection after every request
+GC_GROWTH_MB = float(os.environ.get("OCR_GC_GROWTH_MB", "64"))  # RSS growth since the last collection that triggers one
+GC_SOFT_LIMIT_MB = float(os.environ.get("OCR_GC_SOFT_LIMIT_MB", "1024"))  # Above this RSS every request collects
+GC_FREEZE = os.environ.get("OCR_GC_FREEZE", "1") == "1"  # Move objects alive after warm-up out of gc's reach
+RECYCLE_RSS_MB = float(os.environ.get("OCR_RECYCLE_RSS_MB", "1536"))  # Sustained RSS that recycles the worker (0 = never)
+RECYCLE_AFTER = int(os.environ.get("OCR_RECYCLE_AFTER", "3"))  # Consecutive requests above it before recycling
+TRACEMALLOC = os.environ.get("OCR_TRACEMALLOC", "0") == "1"  # Report Python allocation peaks (slows Python code)
+MB = 1024 * 1024
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+def current_rss():
+    """Resident set size of this process in bytes (0 where /proc is unavailable)"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return 0
+
+def peak_rss():
+    """Peak resident set size (VmHWM) in bytes since the last ``reset_peak_rss``"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return 0
+
+def reset_peak_rss():
+    """Restart the kernel's peak RSS tracking; False where unsupported"""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+def _load_malloc_trim():
+    """glibc's malloc_trim, which hands freed heap pages (page arrays, decoded images) back to the OS"""
+    try:
+        return ctypes.CDLL("libc.so.6").malloc_trim
+    except (OSError, AttributeError):
+        return None
+
+_malloc_trim = _load_malloc_trim()
+
+class MemoryReport:
+    """Memory use of one request
+
+    RSS and Python allocation peaks are process-wide, so they include any
+    request running at the same time.
+    """
+
+    def __init__(self, rss):
+        self.rss_start = rss
+        self.rss_end = rss
+        self.peak_rss = rss
+        self.python_peak = None
+        self.collections = 0
+        self.gc_seconds = 0.0
+
+    def to_dict(self):
+        report = {
+            "rss_start_mb": round(self.rss_start / MB, 1),
+            "rss_end_mb": round(self.rss_end / MB, 1),
+            "peak_rss_mb": round(self.peak_rss / MB, 1),
+            "collections": self.collections,
+            "gc_seconds": round(self.gc_seconds, 4)
+        }
+        if self.python_peak is not None:
+            report["python_peak_mb"] = round(self.python_peak / MB, 1)
+        return report
+
+_current = contextvars.ContextVar("ocr_memory_report", default=None)
+
+class MemoryGovernor:
+    """Decides when to run a full garbage collection and when to recycle the worker
+
+    Instead of ``gc.collect()`` after every request, a collection (followed by
+    ``malloc_trim``) runs only when RSS grew by ``growth`` since the last one
+    or exceeds ``soft_limit``. When RSS stays above ``recycle_rss`` for
+    ``recycle_after`` consecutive requests, the gunicorn worker is told to
+    exit after its in-flight requests and the master forks a fresh one.
+    """
+
+    def __init__(self, enabled=MEMORY_GOVERNOR, growth_mb=GC_GROWTH_MB, soft_limit_mb=GC_SOFT_LIMIT_MB,
+                 recycle_rss_mb=RECYCLE_RSS_MB, recycle_after=RECYCLE_AFTER):
+        self.enabled = enabled
+        self.growth = growth_mb * MB
+        self.soft_limit = soft_limit_mb * MB
+        self.recycle_rss = recycle_rss_mb * MB
+        self.recycle_after = max(1, recycle_after)
+        self.baseline = current_rss()  # RSS right after the last collection
+        self.recycling = False
+        self._over_limit = 0
+        self._active = 0
+        self._worker = None
+        self._lock = threading.Lock()
+        self._stats = {"requests": 0, "collections": 0, "skipped_collections": 0, "gc_seconds": 0.0, "recycles": 0}
+
+    def attach_worker(self, worker):
+        """Gunicorn worker to recycle on sustained growth (set from the post_fork hook)"""
+        self._worker = worker
+
+    def freeze(self):
+        """Collect once, then move every surviving object (models, imports) to the permanent generation
+
+        Later collections no longer traverse them, and in forked workers gc
+        stops touching their pages, which stay shared copy-on-write.
+        """
+        start = time.perf_counter()
+        gc.collect()
+        if GC_FREEZE:
+            gc.freeze()
+        if TRACEMALLOC and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        with self._lock:
+            self.baseline = current_rss()
+        logger.info(f"Froze {gc.get_freeze_count()} objects in {time.perf_counter() - start:.2f}s, "
+                    f"RSS {self.baseline / MB:.0f} MB")
+
+    def _should_collect(self, rss):
+        if not self.enabled or not rss:
+            return True
+        return rss > self.baseline + self.growth or (self.soft_limit and rss > self.soft_limit)
+
+    def maybe_collect(self):
+        """Run a full collection if RSS crossed a threshold; returns whether one ran"""
+        rss = current_rss()
+        if not self._should_collect(rss):
+            with self._lock:
+                self._stats["skipped_collections"] += 1
+            self._check_growth(rss)
+            return False
+
+        start = time.perf_counter()
+        with stage("gc"):
+            collected = gc.collect()
+            if _malloc_trim is not None:
+                _malloc_trim(0)
+        elapsed = time.perf_counter() - start
+        rss_after = current_rss()
+        with self._lock:
+            self.baseline = rss_after
+            self._stats["collections"] += 1
+            self._stats["gc_seconds"] += elapsed
+        report = _current.get()
+        if report is not None:
+            report.collections += 1
+            report.gc_seconds += elapsed
+        logger.info(f"Collected {collected} objects in {elapsed * 1000:.1f}ms, "
+                    f"RSS {rss / MB:.0f} -> {rss_after / MB:.0f} MB")
+        self._check_growth(rss_after)
+        return True
+
+    def _check_growth(self, rss):
+        if not self.recycle_rss or not rss:
+            return
+        with self._lock:
+            self._over_limit = self._over_limit + 1 if rss > self.recycle_rss else 0
+            if self._over_limit < self.recycle_after or self.recycling:
+                return
+            self.recycling = True
+            self._stats["recycles"] += 1
+        logger.warning(f"RSS {rss / MB:.0f} MB above {self.recycle_rss / MB:.0f} MB for "
+                       f"{self._over_limit} requests, recycling the worker")
+        if self._worker is not None:
+            # Gunicorn finishes the in-flight requests, then replaces the worker
+            self._worker.alive = False
+        else:
+            logger.warning("Not running under gunicorn; restart the process to release memory")
+
+    @contextmanager
+    def track_request(self):
+        """Measure a request's memory into a MemoryReport and collect at the end if needed"""
+        report = MemoryReport(current_rss())
+        with self._lock:
+            self._active += 1
+            first = self._active == 1
+            self._stats["requests"] += 1
+        if first:
+            # Peaks are process-wide; only restart them when no other request is running
+            reset_peak_rss()
+            if tracemalloc.is_tracing():
+                tracemalloc.reset_peak()
+        token = _current.set(report)
+        try:
+            yield report
+        finally:
+            report.peak_rss = max(peak_rss(), report.rss_start)
+            if tracemalloc.is_tracing():
+                report.python_peak = tracemalloc.get_traced_memory()[1]
+            with self._lock:
+                self._active -= 1
+            try:
+                self.maybe_collect()
+            finally:
+                _current.reset(token)
+            report.rss_end = current_rss()
+            logger.info(f"Request memory: peak RSS {report.peak_rss / MB:.0f} MB, "
+                        f"RSS {report.rss_start / MB:.0f} -> {report.rss_end / MB:.0f} MB, "
+                        f"{report.collections} collection(s) in {report.gc_seconds * 1000:.1f}ms")
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["baseline_rss_mb"] = round(self.baseline / MB, 1)
+            stats["recycling"] = self.recycling
+        stats["gc_seconds"] = round(stats["gc_seconds"], 4)
+        stats["rss_mb"] = round(current_rss() / MB, 1)
+        stats["frozen_objects"] = gc.get_freeze_count()
+        return stats
+
+memory_governor = MemoryGovernor()
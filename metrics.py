@@ -0,0 +1,160 @@
+import contextvars
+import threading
+import time
+import logging
+from contextlib import contextmanager
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Histogram buckets in seconds, from fast stages (JSON building) to whole PDFs
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in labels) + "}"
+
+class Histogram:
+    """Minimal Prometheus histogram with label support"""
+
+    def __init__(self, name, documentation, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = buckets
+        self._series = {}  # sorted label items -> [bucket counts, sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._series.setdefault(key, [[0] * len(self.buckets), 0.0, 0])
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (bucket_counts, total, count) in sorted(self._series.items()):
+                for bound, bucket_count in zip(self.buckets, bucket_counts):
+                    lines.append(f"{self.name}_bucket{_format_labels(key + (('le', bound),))} {bucket_count}")
+                lines.append(f"{self.name}_bucket{_format_labels(key + (('le', '+Inf'),))} {count}")
+                lines.append(f"{self.name}_sum{_format_labels(key)} {total}")
+                lines.append(f"{self.name}_count{_format_labels(key)} {count}")
+        return lines
+
+class Counter:
+    """Minimal Prometheus counter with label support"""
+
+    def __init__(self, name, documentation):
+        self.name = name
+        self.documentation = documentation
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, value=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(key)} {value}")
+        return lines
+
+STAGE_SECONDS = Histogram("ocr_stage_duration_seconds", "Time spent per processing stage")
+REQUEST_SECONDS = Histogram("ocr_request_duration_seconds", "End-to-end request latency")
+ITEMS = Counter("ocr_items_total", "Processed pages, blocks and pixels")
+REQUESTS = Counter("ocr_requests_total", "Requests by endpoint and status code")
+
+class RequestTimings:
+    """Per-request stage breakdown, collected alongside the global histograms"""
+
+    def __init__(self):
+        self.stages = {}
+        self.counts = {}
+        self._lock = threading.Lock()
+
+    def add(self, stage_name, seconds):
+        with self._lock:
+            self.stages[stage_name] = self.stages.get(stage_name, 0.0) + seconds
+
+    def count(self, name, value):
+        with self._lock:
+            self.counts[name] = self.counts.get(name, 0) + value
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                "stages": {name: round(seconds, 4) for name, seconds in self.stages.items()},
+                "counts": dict(self.counts)
+            }
+
+_current = contextvars.ContextVar("ocr_request_timings", default=None)
+
+@contextmanager
+def track_request():
+    """Collect stage timings of everything run in this context into a RequestTimings"""
+    timings = RequestTimings()
+    token = _current.set(timings)
+    try:
+        yield timings
+    finally:
+        _current.reset(token)
+
+@contextmanager
+def stage(name):
+    """Time a processing stage into the histogram and the current request breakdown"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.observe(elapsed, stage=name)
+        timings = _current.get()
+        if timings is not None:
+            timings.add(name, elapsed)
+
+def count(name, value=1):
+    """Count pages, blocks, pixels, ... globally and for the current request"""
+    ITEMS.inc(value, item=name)
+    timings = _current.get()
+    if timings is not None:
+        timings.count(name, value)
+
+def merge(breakdown):
+    """Fold a breakdown recorded in another process (e.g. a pool worker) into this one"""
+    for name, seconds in breakdown.get("stages", {}).items():
+        STAGE_SECONDS.observe(seconds, stage=name)
+        timings = _current.get()
+        if timings is not None:
+            timings.add(name, seconds)
+    for name, value in breakdown.get("counts", {}).items():
+        count(name, value)
+
+def observe_request(endpoint, status, seconds):
+    REQUEST_SECONDS.observe(seconds, endpoint=endpoint)
+    REQUESTS.inc(endpoint=endpoint, status=status)
+
+def render_stats(prefix, stats, documentation):
+    """Render a flat dict of numeric statistics as Prometheus gauges"""
+    lines = []
+    for key, value in sorted(stats.items()):
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            continue
+        name = f"{prefix}_{key}"
+        lines.extend([f"# HELP {name} {documentation} ({key})", f"# TYPE {name} gauge", f"{name} {value}"])
+    return lines
+
+def render_prometheus(extra_lines=None):
+    """Prometheus text exposition of all metrics"""
+    lines = []
+    for metric in (REQUEST_SECONDS, REQUESTS, STAGE_SECONDS, ITEMS):
+        lines.extend(metric.render())
+    lines.extend(extra_lines or [])
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,361 @@
+import numpy as np
+import logging
+import easyocr.easyocr as easyocr_module
+from easyocr.recognition import get_text
+from easyocr.utils import get_image_list, reformat_input
+from bidi import get_display
+from metrics import stage, count
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+RECOGNIZER_BATCH_SIZE = 32  # Text line crops per recognizer forward pass
+DETECT_BATCH_SIZE = 8  # Pages per detector forward pass
+TILE_OVERLAP = 160  # Pixels shared by neighbouring tiles; should exceed the tallest text line
+CONTRAST_THS = 0.1  # EasyOCR's default: lines below this confidence are re-read with enhanced contrast
+REREAD_BEAM_WIDTH = 5  # Beam search width of the accuracy re-read
+REREAD_ADJUST_CONTRAST = 0.5  # Target contrast of the re-read's enhanced crops
+
+def _model_height():
+    """Recognizer input height used by EasyOCR"""
+    return getattr(easyocr_module, 'imgH', 64)
+
+def _ignore_char(reader):
+    """Characters the recognizer must not emit for this reader's languages"""
+    return ''.join(set(reader.character) - set(reader.lang_char))
+
+# easyocr.Reader attributes recognize_pages drives directly
+RECOGNIZER_INTERNALS = ("character", "lang_char", "model_lang", "recognizer", "converter")
+
+def has_recognizer_internals(reader):
+    """Whether ``recognize_pages`` can batch crops through this reader's recognizer"""
+    return all(hasattr(reader, name) for name in RECOGNIZER_INTERNALS)
+
+def _pad_to_bucket(img, grey, bucket):
+    """Pad a page on the right/bottom with white so its size is a multiple of bucket
+
+    Padding keeps box coordinates in the original page space while letting
+    pages of slightly different sizes share one detector batch.
+    """
+    height, width = grey.shape[:2]
+    padded_height = -(-height // bucket) * bucket
+    padded_width = -(-width // bucket) * bucket
+    if (padded_height, padded_width) == (height, width):
+        return img, grey
+    padding = ((0, padded_height - height), (0, padded_width - width))
+    img = np.pad(img, padding + ((0, 0),) * (img.ndim - 2), constant_values=255)
+    grey = np.pad(grey, padding, constant_values=255)
+    return img, grey
+
+def detect_pages(reader, images, bucket=None, detect_batch_size=DETECT_BATCH_SIZE):
+    """Run text detection over several pages, stacking same-sized pages into one batch
+
+    With ``bucket`` set, pages are padded up to a multiple of that many pixels
+    so near-identical sizes share a batch. Returns the greyscale pages and a
+    ``(horizontal_list, free_list)`` pair per page, both in input order.
+    """
+    formatted = [reformat_input(image) for image in images]
+    if bucket:
+        formatted = [_pad_to_bucket(img, grey, bucket) for img, grey in formatted]
+    detections = [None] * len(formatted)
+
+    # The detector only accepts batches of identically shaped images
+    groups = {}
+    for index, (img, _) in enumerate(formatted):
+        groups.setdefault(img.shape, []).append(index)
+
+    for shape, indices in groups.items():
+        for start in range(0, len(indices), detect_batch_size):
+            chunk = indices[start:start + detect_batch_size]
+            batch = np.stack([formatted[i][0] for i in chunk])
+            with stage("detection"):
+                horizontal_agg, free_agg = reader.detect(batch, reformat=False)
+            for index, horizontal_list, free_list in zip(chunk, horizontal_agg, free_agg):
+                detections[index] = (horizontal_list, free_list)
+        logger.debug(f"Detected text on {len(indices)} page(s) of shape {shape}")
+
+    return [grey for _, grey in formatted], detections
+
+def recognize_pages(reader, grey_images, detections, batch_size=RECOGNIZER_BATCH_SIZE, decoder='greedy',
+                    contrast_ths=CONTRAST_THS):
+    """Recognize the text lines of several pages in pooled recognizer batches
+
+    Crops from all pages are sorted by width and batched together so padding
+    stays small. Results are returned per page in the same order as
+    ``reader.readtext`` produces them on CPU (horizontal boxes, then free boxes).
+    """
+    model_height = _model_height()
+    ignore_char = _ignore_char(reader)
+    if reader.model_lang in ['chinese_tra', 'chinese_sim']:
+        decoder = 'greedy'
+
+    # (page index, position on page, box, crop, padded width)
+    crops = []
+    for page_index, (grey, (horizontal_list, free_list)) in enumerate(zip(grey_images, detections)):
+        boxes = [([box], []) for box in horizontal_list] + [([], [box]) for box in free_list]
+        for h_list, f_list in boxes:
+            image_list, max_width = get_image_list(h_list, f_list, grey, model_height=model_height)
+            for box, crop in image_list:
+                crops.append((page_index, len(crops), box, crop, int(max_width)))
+
+    recognized = {}
+    crops.sort(key=lambda item: item[4])
+    for start in range(0, len(crops), batch_size):
+        chunk = crops[start:start + batch_size]
+        width = max(item[4] for item in chunk)
+        with stage("recognition"):
+            results = get_text(reader.character, model_height, width, reader.recognizer, reader.converter,
+                               [(item[2], item[3]) for item in chunk], ignore_char, decoder,
+                               5, batch_size, contrast_ths, 0.5, 0.003, 0, reader.device)
+        for item, result in zip(chunk, results):
+            recognized[item[1]] = (item[0], result)
+    logger.debug(f"Recognized {len(crops)} text lines from {len(grey_images)} page(s)")
+
+    page_results = [[] for _ in grey_images]
+    for order in sorted(recognized):
+        page_index, (box, text, confidence) = recognized[order]
+        if reader.model_lang == 'arabic':
+            text = get_display(text)
+        page_results[page_index].append((box, text, confidence))
+    return page_results
+
+def refine_low_confidence(reader, grey, results, threshold, rotate=True, batch_size=RECOGNIZER_BATCH_SIZE):
+    """Accuracy re-read: read the results below ``threshold`` confidence again
+
+    Those boxes are recognized with beam search, also from a contrast-enhanced
+    crop and (with ``rotate``) from the crop turned upside down. The most
+    confident reading replaces the first one when it beats it. This is extra
+    work on top of the greedy pass, never a saving. Counts how many lines were
+    accepted as read, re-read and improved.
+    """
+    low = [index for index, (_, _, confidence) in enumerate(results) if confidence < threshold]
+    count("recognition_accepted", len(results) - len(low))
+    if not low:
+        return results
+    count("recognition_reread", len(low))
+
+    boxes = [results[index][0] for index in low]
+    with stage("recognition_reread"):
+        retried = reader.recognize(grey, horizontal_list=[], free_list=boxes, decoder='beamsearch',
+                                   beamWidth=REREAD_BEAM_WIDTH, batch_size=batch_size,
+                                   rotation_info=[180] if rotate else None, contrast_ths=threshold,
+                                   adjust_contrast=REREAD_ADJUST_CONTRAST, reformat=False)
+
+    # EasyOCR may reorder the boxes; it hands back the same box objects
+    positions = {id(box): index for box, index in zip(boxes, low)}
+    results = list(results)
+    improved = 0
+    for box, text, confidence in retried:
+        index = positions.get(id(box))
+        if index is not None and confidence > results[index][2]:
+            results[index] = (results[index][0], text, confidence)
+            improved += 1
+    count("recognition_reread_improved", improved)
+    return results
+
+def tile_origins(length, tile_size, overlap=TILE_OVERLAP):
+    """Start offsets of tiles covering length pixels, neighbours sharing overlap pixels"""
+    if length <= tile_size:
+        return [0]
+    step = tile_size - overlap
+    return list(range(0, length - tile_size, step)) + [length - tile_size]
+
+def _box_rect(box, free):
+    """(x_min, x_max, y_min, y_max) of a horizontal or free-form box"""
+    if not free:
+        return tuple(box)
+    xs = [point[0] for point in box]
+    ys = [point[1] for point in box]
+    return min(xs), max(xs), min(ys), max(ys)
+
+def _same_text(rect_a, rect_b):
+    """Whether two boxes intersect and share most of their height (one line seen twice)"""
+    overlap_x = min(rect_a[1], rect_b[1]) - max(rect_a[0], rect_b[0])
+    overlap_y = min(rect_a[3], rect_b[3]) - max(rect_a[2], rect_b[2])
+    min_height = min(rect_a[3] - rect_a[2], rect_b[3] - rect_b[2])
+    return overlap_x > 0 and min_height > 0 and overlap_y > 0.5 * min_height
+
+def merge_tile_boxes(tile_boxes):
+    """Merge boxes that neighbouring tiles both detected in their overlap
+
+    ``tile_boxes`` holds ``(tile index, free, box, shared)`` in page
+    coordinates, ``shared`` telling whether the box reaches into an overlap.
+    Horizontal fragments of one text line cut by a tile edge are joined into
+    their union; of duplicate free-form boxes the larger one is kept. Boxes of
+    the same tile are never merged, the detector already grouped them.
+    """
+    merged = []  # [set of tile indices, free, box, rect]
+    candidates = []  # Entries reaching into an overlap, the only ones that can have duplicates
+    for tile, free, box, shared in tile_boxes:
+        rect = _box_rect(box, free)
+        if not shared:
+            merged.append([{tile}, free, box, rect])
+            continue
+        for entry in candidates:
+            if tile in entry[0] or not _same_text(entry[3], rect):
+                continue
+            entry[0].add(tile)
+            if not free and not entry[1]:
+                entry[3] = (min(entry[3][0], rect[0]), max(entry[3][1], rect[1]),
+                            min(entry[3][2], rect[2]), max(entry[3][3], rect[3]))
+                entry[2] = list(entry[3])
+            elif (rect[1] - rect[0]) * (rect[3] - rect[2]) > (entry[3][1] - entry[3][0]) * (entry[3][3] - entry[3][2]):
+                entry[1:] = [free, box, rect]
+            break
+        else:
+            candidates.append([{tile}, free, box, rect])
+    merged.extend(candidates)
+    # Reading order: top to bottom, then left to right
+    horizontal_list = sorted((box for _, free, box, _ in merged if not free), key=lambda box: (box[2], box[0]))
+    free_list = [box for _, free, box, _ in merged if free]
+    return horizontal_list, free_list
+
+def detect_tiled(reader, image, tile_size, overlap=TILE_OVERLAP):
+    """Detect text on a large page tile by tile, returning page-space ``(horizontal_list, free_list)``
+
+    Tiles are padded to tile_size and detected in batches, so detector memory is
+    bounded by the tile size rather than the page size.
+    """
+    height, width = image.shape[:2]
+    origins = [(x, y) for y in tile_origins(height, tile_size, overlap) for x in tile_origins(width, tile_size, overlap)]
+    tiles = [image[y:y + tile_size, x:x + tile_size] for x, y in origins]
+    _, detections = detect_pages(reader, tiles, bucket=tile_size)
+    
+    tile_boxes = []
+    for tile, ((x, y), (horizontal_list, free_list)) in enumerate(zip(origins, detections)):
+        # Interior of the tile that no neighbour sees
+        core = (x + overlap if x > 0 else 0, x + tile_size - overlap if x + tile_size < width else width,
+                y + overlap if y > 0 else 0, y + tile_size - overlap if y + tile_size < height else height)
+        boxes = [(False, [x_min + x, x_max + x, y_min + y, y_max + y]) for x_min, x_max, y_min, y_max in horizontal_list]
+        boxes += [(True, [[point[0] + x, point[1] + y] for point in box]) for box in free_list]
+        for free, box in boxes:
+            rect = _box_rect(box, free)
+            shared = rect[0] < core[0] or rect[1] > core[1] or rect[2] < core[2] or rect[3] > core[3]
+            tile_boxes.append((tile, free, box, shared))
+    horizontal_list, free_list = merge_tile_boxes(tile_boxes)
+    logger.debug(f"Detected {len(horizontal_list) + len(free_list)} boxes on {len(tiles)} tiles "
+                 f"({len(tile_boxes)} before merging)")
+    return horizontal_list, free_list
+
+def detect_page(reader, image, tile_size=None):
+    """Run only the detector over a page: ``(grey, horizontal_list, free_list)``
+
+    Pages larger than ``tile_size`` (when set) are detected tile by tile.
+    """
+    img, grey = reformat_input(image)
+    if tile_size and max(grey.shape) > tile_size:
+        horizontal_list, free_list = detect_tiled(reader, image, tile_size)
+    else:
+        with stage("detection"):
+            horizontal_lists, free_lists = reader.detect(img, reformat=False)
+        horizontal_list, free_list = horizontal_lists[0], free_lists[0]
+    return grey, horizontal_list, free_list
+
+def box_corners(box, free):
+    """Four corners (top left, top right, bottom right, bottom left) of a horizontal or free-form box"""
+    if free:
+        return [[point[0], point[1]] for point in box]
+    x_min, x_max, y_min, y_max = box
+    return [[x_min, y_min], [x_max, y_min], [x_max, y_max], [x_min, y_max]]
+
+def _recognize_one_by_one(reader, grey, horizontal_list, free_list, contrast_ths):
+    """Fallback for readers without EasyOCR's recognizer internals: one ``recognize`` call per box"""
+    results = []
+    for free, box in [(False, box) for box in horizontal_list] + [(True, box) for box in free_list]:
+        recognized = reader.recognize(grey, [] if free else [box], [box] if free else [], reformat=False,
+                                      contrast_ths=contrast_ths)
+        results.append(recognized[0] if recognized else (box_corners(box, free), "", 0.0))
+    return results
+
+def recognize_boxes(reader, image, boxes, batch_size=RECOGNIZER_BATCH_SIZE, reread_threshold=None,
+                    reread_rotate=True):
+    """Recognize caller-supplied text boxes of a page without running the detector
+
+    ``boxes`` are four-corner boxes in page pixels. Axis-aligned ones are
+    cropped like EasyOCR's horizontal boxes, others are perspective-corrected
+    like its free-form ones; all go through the recognizer in pooled batches
+    (see ``recognize_pages``). Returns one ``(corners, text, confidence)`` per
+    box in input order; boxes outside the page come back empty with confidence 0.
+    """
+    _, grey = reformat_input(image)
+    height, width = grey.shape[:2]
+    horizontal_list, free_list, slots = [], [], []
+    for corners in boxes:
+        xs = [point[0] for point in corners]
+        ys = [point[1] for point in corners]
+        x_min, x_max = max(0, int(min(xs))), min(width, int(np.ceil(max(xs))))
+        y_min, y_max = max(0, int(min(ys))), min(height, int(np.ceil(max(ys))))
+        if x_max - x_min < 1 or y_max - y_min < 1:
+            slots.append(None)
+        elif xs[0] == xs[3] and xs[1] == xs[2] and ys[0] == ys[1] and ys[2] == ys[3]:
+            slots.append((False, len(horizontal_list)))
+            horizontal_list.append([x_min, x_max, y_min, y_max])
+        else:
+            slots.append((True, len(free_list)))
+            free_list.append(corners)
+    count("recognition_given_boxes", len(horizontal_list) + len(free_list))
+
+    contrast_ths = 0 if reread_threshold else CONTRAST_THS
+    if has_recognizer_internals(reader):
+        recognized = recognize_pages(reader, [grey], [(horizontal_list, free_list)], batch_size=batch_size,
+                                     contrast_ths=contrast_ths)[0]
+    else:
+        with stage("recognition"):
+            recognized = _recognize_one_by_one(reader, grey, horizontal_list, free_list, contrast_ths)
+    if reread_threshold:
+        recognized = refine_low_confidence(reader, grey, recognized, reread_threshold, reread_rotate, batch_size)
+
+    # recognize_pages returns horizontal boxes first, then free-form ones
+    results = []
+    for corners, slot in zip(boxes, slots):
+        if slot is None:
+            results.append((corners, "", 0.0))
+        else:
+            _, text, confidence = recognized[slot[1] + (len(horizontal_list) if slot[0] else 0)]
+            results.append((corners, text, confidence))
+    return results
+
+def readtext_page(reader, image, tile_size=None, reread_threshold=None, reread_rotate=True, templates=None):
+    """Equivalent of ``reader.readtext(image, detail=1)`` with detection and recognition timed separately
+
+    With ``tile_size`` set, pages larger than a tile are detected tile by tile
+    (see ``detect_tiled``) and recognized on the full-resolution page. With
+    ``reread_threshold`` set, less confident lines are read again for accuracy
+    (see ``refine_low_confidence``), which replaces EasyOCR's contrast retry.
+    With a ``templates`` cache (``page_cache.TemplateCache``), regions unchanged
+    from a known form layout are not recognized again.
+    """
+    grey, horizontal_list, free_list = detect_page(reader, image, tile_size)
+    plan = templates.plan(reader, grey, horizontal_list, free_list) if templates else None
+    if plan:
+        horizontal_list, free_list = plan.horizontal_list, plan.free_list
+    with stage("recognition"):
+        results = reader.recognize(grey, horizontal_list, free_list, reformat=False,
+                                   contrast_ths=0 if reread_threshold else CONTRAST_THS)
+    if reread_threshold:
+        results = refine_low_confidence(reader, grey, results, reread_threshold, reread_rotate)
+    return plan.merge(results) if plan else results
+
+def readtext_pages(reader, images, batch_size=RECOGNIZER_BATCH_SIZE, bucket=None, tile_size=None,
+                   reread_threshold=None, reread_rotate=True, templates=None):
+    """Batched equivalent of calling ``reader.readtext(image, detail=1)`` per page
+
+    Pages larger than ``tile_size`` (when set) are read tile by tile on their own.
+    """
+    large = {index for index, image in enumerate(images) if tile_size and max(image.shape[:2]) > tile_size}
+    batched = [image for index, image in enumerate(images) if index not in large]
+    grey_images, detections = detect_pages(reader, batched, bucket=bucket)
+    plans = [templates.plan(reader, grey, horizontal_list, free_list)
+             for grey, (horizontal_list, free_list) in zip(grey_images, detections)] if templates else None
+    if plans:
+        detections = [(plan.horizontal_list, plan.free_list) for plan in plans]
+    batched_results = recognize_pages(reader, grey_images, detections, batch_size=batch_size,
+                                      contrast_ths=0 if reread_threshold else CONTRAST_THS)
+    if reread_threshold:
+        batched_results = [refine_low_confidence(reader, grey, results, reread_threshold, reread_rotate, batch_size)
+                           for grey, results in zip(grey_images, batched_results)]
+    if plans:
+        batched_results = [plan.merge(results) for plan, results in zip(plans, batched_results)]
+    batched_results = iter(batched_results)
+    return [readtext_page(reader, image, tile_size, reread_threshold, reread_rotate, templates) if index in large
+            else next(batched_results) for index, image in enumerate(images)]
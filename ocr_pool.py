@@ -0,0 +1,162 @@
+import multiprocessing
+import os
+import threading
+import logging
+from ocr_processor import (get_or_create_reader, optimize_image, prepare_pdf_page,
+                           pdf_page_count, is_pdf, _read_source, _ocr_pages, _with_prepass,
+                           result_cache_key, cache_info, MAX_PDF_PAGES, POOL_SIZE, WORKER_THREADS)
+from result_cache import get_cache
+from reader_pool import PINNED_LANGUAGES
+from metrics import track_request, merge
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+def _init_worker(threads):
+    """Limit torch and ONNX Runtime intra-op threads so workers don't oversubscribe the cores"""
+    import torch
+    from onnx_backend import set_intra_op_threads
+    torch.set_num_threads(threads)
+    set_intra_op_threads(threads)
+    logger.info(f"OCR worker {os.getpid()} started with {threads} inference thread(s)")
+
+def get_pool(pool_size=None, threads=None, preload_languages=None):
+    """Return the process pool, forking it after the configured readers are loaded
+
+    Workers inherit the already loaded EasyOCR models, so the weights are shared
+    copy-on-write instead of being loaded once per worker. The pool is created
+    lazily in the serving process because pools do not survive a fork (e.g. the
+    gunicorn master forking its workers with --preload).
+    """
+    global _pool, _pool_pid
+    with _pool_lock:
+        if _pool is not None and _pool_pid == os.getpid():
+            return _pool
+
+        pool_size = pool_size or POOL_SIZE
+        threads = threads or WORKER_THREADS
+        for languages in preload_languages or PINNED_LANGUAGES:
+            get_or_create_reader(languages)
+
+        if threading.active_count() > 1:
+            # Children inherit locks other threads may hold; under gunicorn see start_worker_pool
+            logger.warning(f"Forking the OCR process pool with {threading.active_count()} threads running")
+        logger.info(f"Starting OCR process pool: {pool_size} workers x {threads} thread(s)")
+        context = multiprocessing.get_context("fork")
+        _pool = context.Pool(pool_size, initializer=_init_worker, initargs=(threads,))
+        _pool_pid = os.getpid()
+        return _pool
+
+def start_worker_pool():
+    """Fork the pool from gunicorn's post_fork hook, while the worker still has a single thread
+
+    gthread workers serve requests from a thread pool and warm up readers in a
+    background thread. Forking later, from a request thread, would copy locks
+    those threads hold (logging, allocator, OpenMP) into the pool's children.
+    """
+    if POOL_SIZE > 1:
+        get_pool()
+
+def shutdown_pool():
+    """Terminate the worker processes"""
+    global _pool, _pool_pid
+    with _pool_lock:
+        if _pool is not None and _pool_pid == os.getpid():
+            _pool.terminate()
+            _pool.join()
+        _pool = None
+        _pool_pid = None
+
+def _ocr_page_task(task):
+    """Worker entry point: rasterize (for PDFs) and recognize a single page"""
+    doc_index, page_number, data, pdf, languages = task
+    with track_request() as timings:
+        try:
+            reader = get_or_create_reader(languages)
+            if pdf:
+                page_array, report = prepare_pdf_page(data, page_number)
+            else:
+                page_array, report = optimize_image(data), None
+            if page_array is None:
+                # Answered from the text layer or skipped as blank
+                pages = [report]
+            else:
+                pages = list(_with_prepass(_ocr_pages(reader, [(page_number, page_array)]), {page_number: report}))
+            error = None
+        except Exception as e:
+            logger.error(f"Worker failed on page {page_number}: {e}")
+            pages, error = [], str(e)
+    # Stage timings are recorded in the worker; the parent folds them into its metrics
+    return doc_index, page_number, pages, error, timings.to_dict()
+
+def _page_tasks(doc_index, source, languages, filename=None, first_page=1, last_page=MAX_PDF_PAGES):
+    """Split one document into per-page worker tasks"""
+    source, filename = _read_source(source, filename)
+    if is_pdf(source, filename):
+        last_page = min(pdf_page_count(source), last_page)
+        return [(doc_index, page_number, source, True, languages) for page_number in range(first_page, last_page + 1)]
+    return [(doc_index, 1, source, False, languages)]
+
+def iter_document_pages_parallel(source, languages=None, filename=None, first_page=1, last_page=MAX_PDF_PAGES):
+    """Yield a document's page results in page order while pages run across the pool"""
+    if not languages:
+        languages = ['en']
+    tasks = _page_tasks(0, source, languages, filename, first_page, last_page)
+    logger.info(f"Dispatching {len(tasks)} page(s) to the OCR process pool")
+
+    for _, page_number, pages, error, breakdown in get_pool().imap(_ocr_page_task, tasks):
+        merge(breakdown)
+        if error:
+            raise Exception(f"Page {page_number} failed: {error}")
+        yield from pages
+
+def process_documents(documents, languages=None, use_cache=True):
+    """OCR several documents with their pages spread over the pool
+
+    ``documents`` is a list of ``(source, filename)`` pairs. Returns one
+    ``{"pages": [...]}`` result per document, in input order; documents that
+    fail carry an ``"error"`` entry instead of failing the whole call.
+    Documents found in the result cache are not dispatched at all.
+    """
+    if not languages:
+        languages = ['en']
+    cache = get_cache() if use_cache else None
+    results = [{"pages": []} for _ in documents]
+    keys = [None] * len(documents)
+    tasks = []
+    for doc_index, (source, filename) in enumerate(documents):
+        try:
+            source, filename = _read_source(source, filename)
+            keys[doc_index] = result_cache_key(source, languages) if cache else None
+            if keys[doc_index]:
+                cached, tier = cache.get(keys[doc_index])
+                if cached is not None:
+                    cached["processing_info"] = {"cache": cache_info(cache, tier)}
+                    results[doc_index] = cached
+                    keys[doc_index] = None
+                    continue
+            tasks.extend(_page_tasks(doc_index, source, languages, filename))
+        except Exception as e:
+            logger.error(f"Failed to prepare document {filename or doc_index}: {e}")
+            results[doc_index]["error"] = str(e)
+            keys[doc_index] = None
+
+    logger.info(f"Dispatching {len(tasks)} page(s) from {len(documents)} document(s) to the OCR process pool")
+    if tasks:
+        for doc_index, page_number, pages, error, breakdown in get_pool().imap_unordered(_ocr_page_task, tasks):
+            merge(breakdown)
+            if error:
+                results[doc_index]["error"] = f"Page {page_number} failed: {error}"
+            results[doc_index]["pages"].extend(pages)
+
+    # Reassemble in page order and cache complete results
+    for key, result in zip(keys, results):
+        result["pages"].sort(key=lambda page: page["page_number"])
+        if key and "error" not in result:
+            cache.put(key, result)
+            result["processing_info"] = {"cache": cache_info(cache, None)}
+    return results
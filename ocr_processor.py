@@ -1,12 +1,20 @@
 import easyocr
 import numpy as np
-from pdf2image import convert_from_path
 from PIL import Image
+import io
 import os
-import tempfile
-import gc
+import subprocess
 import logging
-from functools import lru_cache
+from ocr_engine import readtext_pages, readtext_page, detect_page, recognize_boxes, box_corners
+from metrics import stage, count
+from result_cache import cache_key, get_cache
+from reader_pool import ReaderPool, PINNED_LANGUAGES
+from page_analysis import PAGE_PREPASS, THUMBNAIL_DPI, analyze_thumbnail, max_render_dpi, page_size_at
+from pdf_text_layer import TEXT_LAYER, parse_bbox_layout, parse_image_list
+from onnx_backend import BACKEND, apply_backend, backend_id
+from page_cache import page_cache, template_cache
+from memory_governor import memory_governor
+from regions import PageFrame, regions_for_page, contains_block, boxes_for_page
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -15,53 +23,84 @@ logger = logging.getLogger(__name__)
 MAX_IMAGE_SIZE = (1536, 1536)  # Reduced image size for better memory usage
 MAX_PDF_PAGES = 20  # Limit PDF pages to process
 JPEG_QUALITY = 85  # Quality for image compression
+PDF_DPI = 200  # Rasterization resolution for PDF pages
+MIN_CONFIDENCE = float(os.environ.get("OCR_MIN_CONFIDENCE", "0.1"))  # Blocks at or below this confidence are dropped
+POPPLER_TIMEOUT = 120  # Seconds allowed for a single pdfinfo/pdftoppm call
+# Lossy JPEG round trip before OCR (off by default, it costs latency and accuracy)
+JPEG_REENCODE = os.environ.get("OCR_JPEG_REENCODE", "0") == "1"
 
-# Initialize EasyOCR reader cache (limit to prevent memory issues)
-readers = {}
-MAX_READERS = 3  # Limit number of cached readers
+# Batched execution settings (a page batch of 1 keeps plain per-page readtext)
+PAGE_BATCH_SIZE = int(os.environ.get("OCR_PAGE_BATCH_SIZE", "1"))  # PDF pages detected/recognized together
+RECOGNIZER_BATCH_SIZE = int(os.environ.get("OCR_RECOGNIZER_BATCH_SIZE", "32"))  # Text lines per recognizer pass
+BATCH_PAGE_LIMIT = int(os.environ.get("OCR_BATCH_PAGE_LIMIT", "32"))  # Pages held in memory per multi-document flush
+BATCH_SIZE_BUCKET = 256  # Multi-document pages are padded to multiples of this size to share detector batches
+
+# Tiling settings: large pages keep their resolution and are detected in overlapping tiles
+TILING = os.environ.get("OCR_TILING", "0") == "1"
+TILE_SIZE = int(os.environ.get("OCR_TILE_SIZE", "1536")) if TILING else None  # Tile edge length in pixels
+TILING_MAX_SIZE = int(os.environ.get("OCR_TILING_MAX_SIZE", "6144"))  # Pages are still downscaled beyond this
+PAGE_MAX_SIZE = (TILING_MAX_SIZE, TILING_MAX_SIZE) if TILING else MAX_IMAGE_SIZE
+
+# Opt-in accuracy mode: low-confidence lines are re-read with beam search, enhanced contrast and rotation.
+# It only adds recognition work (several passes per re-read line), trading time for accuracy on poor lines.
+REREAD_THRESHOLD = float(os.environ.get("OCR_REREAD_THRESHOLD", "0")) or None  # 0 disables the re-read; try 0.1
+REREAD_ROTATE = os.environ.get("OCR_REREAD_ROTATE", "0") == "1"  # Re-read also tries the crop upside down
+
+# Process pool settings (a pool size of 0 or 1 keeps OCR in the serving process)
+POOL_SIZE = int(os.environ.get("OCR_POOL_SIZE", "0"))  # Worker processes for page-level parallel OCR
+WORKER_THREADS = int(os.environ.get("OCR_WORKER_THREADS", "1"))  # torch threads per worker
+
+def create_reader(languages, backend=BACKEND, download_enabled=True):
+    """Create an EasyOCR reader with memory optimization, running on the configured inference backend"""
+    # Use minimal memory settings for EasyOCR
+    reader = easyocr.Reader(
+        languages, 
+        gpu=False,
+        download_enabled=download_enabled,
+        detector=True,
+        recognizer=True,
+        verbose=False,
+        quantize=False,  # Float weights for ONNX export; apply_backend quantizes torch models like quantize=True
+        model_storage_directory=None  # Use default model storage
+    )
+    return apply_backend(reader, backend)
+
+# Initialize EasyOCR reader pool (LRU by model memory, configured languages pinned)
+reader_pool = ReaderPool(create_reader, pinned=PINNED_LANGUAGES)
 
 def get_or_create_reader(languages):
-    """Get cached reader or create new one with memory optimization"""
-    global readers
-    
-    lang_key = tuple(sorted(languages))
-    
-    # If we have too many readers, clear the cache
-    if len(readers) >= MAX_READERS:
-        logger.info(f"Clearing reader cache (had {len(readers)} readers)")
-        readers.clear()
-        gc.collect()
-    
-    if lang_key not in readers:
-        logger.info(f"Creating new EasyOCR reader for languages: {languages}")
-        try:
-            # Use minimal memory settings for EasyOCR
-            reader = easyocr.Reader(
-                languages, 
-                gpu=False,
-                download_enabled=True,
-                detector=True,
-                recognizer=True,
-                verbose=False,
-                quantize=True,  # Use quantized models to save memory
-                model_storage_directory=None  # Use default model storage
-            )
-            readers[lang_key] = reader
-            logger.info(f"Successfully created reader for {languages}")
-        except Exception as e:
-            logger.error(f"Failed to create EasyOCR reader: {e}")
-            # Fallback to English only
-            if languages != ['en']:
-                logger.info("Falling back to English-only reader")
-                return get_or_create_reader(['en'])
-            raise
-    
-    return readers[lang_key]
+    """Get pooled reader or create new one, falling back to English on failure"""
+    try:
+        return reader_pool.get(languages)
+    except Exception as e:
+        logger.error(f"Failed to create EasyOCR reader: {e}")
+        # Fallback to English only
+        if list(languages) != ['en']:
+            logger.info("Falling back to English-only reader")
+            return get_or_create_reader(['en'])
+        raise
+
+def load_image(source):
+    """Open a path, raw bytes, PIL image or NumPy array as a PIL image"""
+    if isinstance(source, Image.Image):
+        return source
+    if isinstance(source, np.ndarray):
+        return Image.fromarray(source)
+    if isinstance(source, (bytes, bytearray)):
+        return Image.open(io.BytesIO(source))
+    return Image.open(source)
 
-def optimize_image(image_path, max_size=MAX_IMAGE_SIZE, quality=JPEG_QUALITY):
-    """Optimize image for OCR processing"""
+def is_pdf(data, filename=None):
+    """Check whether the given bytes (or filename) look like a PDF document"""
+    if filename and filename.lower().endswith('.pdf'):
+        return True
+    return isinstance(data, (bytes, bytearray)) and bytes(data[:5]) == b'%PDF-'
+
+def optimize_image(image, max_size=PAGE_MAX_SIZE, quality=JPEG_QUALITY, reencode=JPEG_REENCODE):
+    """Optimize image for OCR processing and return it as a NumPy array"""
     try:
-        with Image.open(image_path) as img:
+        with stage("resize"):
+            img = load_image(image)
             # Convert to RGB if needed
             if img.mode not in ('RGB', 'L'):
                 img = img.convert('RGB')
@@ -73,23 +112,415 @@ def optimize_image(image_path, max_size=MAX_IMAGE_SIZE, quality=JPEG_QUALITY):
             if img.size[0] > max_size[0] or img.size[1] > max_size[1]:
                 img.thumbnail(max_size, Image.Resampling.LANCZOS)
                 logger.info(f"Resized image from {original_size} to {img.size}")
-            
-            # Save optimized version
-            optimized_path = f"{image_path}_optimized.jpg"
-            img.save(optimized_path, 'JPEG', quality=quality, optimize=True)
-            logger.debug(f"Saved optimized image to: {optimized_path}")
-            
-            return optimized_path
+        
+        # Optional lossy round trip, kept in memory
+        if reencode:
+            with stage("jpeg_encode"):
+                buffer = io.BytesIO()
+                img.save(buffer, 'JPEG', quality=quality, optimize=True)
+                buffer.seek(0)
+                img = Image.open(buffer)
+                img.load()
+            logger.debug(f"Re-encoded image as JPEG ({buffer.getbuffer().nbytes} bytes)")
+        
+        count("pixels", img.size[0] * img.size[1])
+        return np.asarray(img)
     except Exception as e:
         logger.error(f"Image optimization failed: {e}")
-        return image_path  # Return original if optimization fails
+        # Return original if optimization fails (EasyOCR accepts paths, bytes and arrays)
+        if isinstance(image, Image.Image):
+            return np.asarray(image)
+        return image
+
+def _run_poppler(command, data, timeout=POPPLER_TIMEOUT, output=()):
+    """Run a poppler tool with the PDF piped through stdin and return its stdout
+
+    ``output`` is appended after the input argument (e.g. ``['-']`` for tools
+    that need an explicit output file to write to stdout).
+    """
+    proc = subprocess.run(command + ['-'] + list(output), input=data, stdout=subprocess.PIPE,
+                          stderr=subprocess.PIPE, timeout=timeout)
+    if proc.returncode != 0:
+        raise Exception(f"{command[0]} failed: {proc.stderr.decode('utf8', 'ignore').strip()}")
+    return proc.stdout
+
+def _parse_page_size(value):
+    """(width, height) in points from pdfinfo's "612 x 792 pts (letter)", or None"""
+    parts = value.split()
+    try:
+        return float(parts[0]), float(parts[2])
+    except (IndexError, ValueError):
+        return None
+
+def pdf_info(data, first_page=None, last_page=None):
+    """Page count and first page size in points (``(width, height)`` or None) of a PDF given as bytes
 
-def process_document(file_path, languages=None):
-    """Process document with improved error handling and memory management"""
+    With a page range, ``page_sizes`` maps each page in it to its own size.
+    """
+    command = ['pdfinfo']
+    if first_page:
+        command += ['-f', str(first_page), '-l', str(last_page or first_page)]
+    with stage("pdf_info"):
+        output = _run_poppler(command, data)
+    info = {"pages": None, "page_size": None, "page_sizes": {}}
+    for line in output.decode('utf8', 'ignore').splitlines():
+        key, _, value = line.partition(':')
+        key = key.strip()
+        if key == 'Pages':
+            info["pages"] = int(value.strip())
+        elif key == 'Page size':
+            # e.g. "612 x 792 pts (letter)"
+            info["page_size"] = _parse_page_size(value)
+        elif key.startswith('Page ') and key.endswith(' size'):
+            # With -f/-l: "Page    3 size: 612 x 792 pts (letter)"
+            try:
+                info["page_sizes"][int(key.split()[1])] = _parse_page_size(value)
+            except ValueError:
+                pass
+    if info["pages"] is None:
+        raise Exception("Unable to get PDF page count")
+    return info
+
+def pdf_page_count(data):
+    """Return the number of pages in a PDF given as bytes"""
+    return pdf_info(data)["pages"]
+
+def rasterize_pdf_page(data, page_number, dpi=PDF_DPI, crop=None):
+    """Rasterize a single PDF page (or only the ``(left, top, right, bottom)`` pixel box ``crop``) via pdftoppm"""
+    command = ['pdftoppm', '-r', str(dpi), '-f', str(page_number), '-l', str(page_number)]
+    if crop:
+        left, top, right, bottom = crop
+        command += ['-x', str(left), '-y', str(top), '-W', str(right - left), '-H', str(bottom - top)]
+    with stage("rasterize"):
+        output = _run_poppler(command, data)
+        image = Image.open(io.BytesIO(output))
+        image.load()
+    count("pages_rasterized")
+    return image
+
+def extract_text_layer(data, first_page, last_page):
+    """Page results for pages in the range whose embedded text layer is usable
+
+    Pages that draw images are left to OCR, since text inside a scanned stamp
+    or pasted image is not part of the text layer. Falls back to OCR (an empty
+    result) when pdftotext or pdfimages fails.
+    """
+    try:
+        with stage("text_layer"):
+            page_range = ['-f', str(first_page), '-l', str(last_page)]
+            output = _run_poppler(['pdftotext', '-bbox-layout', '-enc', 'UTF-8'] + page_range, data, output=['-'])
+            pages = parse_bbox_layout(output, first_page, PDF_DPI, PAGE_MAX_SIZE)
+            if not pages:
+                return pages
+            image_pages = parse_image_list(_run_poppler(['pdfimages', '-list'] + page_range, data))
+            return {number: page for number, page in pages.items() if number not in image_pages}
+    except Exception as e:
+        logger.warning(f"PDF text layer extraction failed, using OCR: {e}")
+        return {}
+
+def render_pdf_thumbnail(data, page_number, dpi=THUMBNAIL_DPI):
+    """Render a low-resolution greyscale thumbnail of one PDF page for the pre-pass"""
+    with stage("thumbnail"):
+        output = _run_poppler(['pdftoppm', '-gray', '-r', str(dpi), '-f', str(page_number), '-l', str(page_number)], data)
+        image = Image.open(io.BytesIO(output))
+        image.load()
+    return image
+
+def prepare_pdf_page(data, page_number, prepass=PAGE_PREPASS, text_pages=None):
+    """Prepare one PDF page for OCR
+
+    Returns ``(page array, pre-pass report)`` for pages that need OCR, or
+    ``(None, page result)`` for pages answered without it. Pages with a usable
+    text layer (``text_pages``, extracted here when not given) are taken from
+    it directly. With the pre-pass enabled a low-DPI thumbnail is analyzed
+    next: blank pages are not rasterized at all and other pages are rendered at
+    the lowest DPI that keeps the estimated text height legible.
+    """
+    if TEXT_LAYER:
+        if text_pages is None:
+            text_pages = extract_text_layer(data, page_number, page_number)
+        if page_number in text_pages:
+            count("pages_text_layer")
+            return None, text_pages[page_number]
+    
+    if not prepass:
+        return optimize_image(rasterize_pdf_page(data, page_number)), None
+    
+    thumbnail = render_pdf_thumbnail(data, page_number)
+    with stage("prepass"):
+        report = analyze_thumbnail(thumbnail, THUMBNAIL_DPI, PDF_DPI, PAGE_MAX_SIZE)
+    if report["blank"]:
+        logger.debug(f"Skipping blank page {page_number} (ink ratio {report['ink_ratio']})")
+        count("pages_blank")
+        page_size = page_size_at(thumbnail, THUMBNAIL_DPI,
+                                 max_render_dpi(thumbnail, THUMBNAIL_DPI, PDF_DPI, PAGE_MAX_SIZE))
+        return None, _blank_page(page_number, page_size, report)
+    
+    logger.debug(f"Page {page_number}: rasterizing at {report['dpi']} DPI "
+                 f"(estimated text height {report['text_height_px']} px)")
+    return optimize_image(rasterize_pdf_page(data, page_number, dpi=report["dpi"])), report
+
+def iter_prepared_pdf_pages(data, first_page=1, last_page=MAX_PDF_PAGES):
+    """Yield ``(page_number, *prepare_pdf_page(...))`` per page, extracting the text layer once"""
+    last_page = min(last_page, pdf_page_count(data))
+    text_pages = extract_text_layer(data, first_page, last_page) if TEXT_LAYER else None
+    for page_number in range(first_page, last_page + 1):
+        yield (page_number, *prepare_pdf_page(data, page_number, text_pages=text_pages))
+
+def _blank_page(page_number, page_size, report):
+    """Result of a page the pre-pass found blank"""
+    return {"page_number": page_number, "page_size": page_size, "path": "blank", "blocks": [], "prepass": report}
+
+def _with_prepass(pages, reports):
+    """Attach pre-pass reports (by page number) to OCR page results"""
+    for page in pages:
+        report = reports.pop(page["page_number"], None)
+        if report:
+            page["prepass"] = report
+        yield page
+
+def _position(corners):
+    return {
+        "top_left": corners[0],
+        "top_right": corners[1],
+        "bottom_right": corners[2],
+        "bottom_left": corners[3]
+    }
+
+def _build_blocks(results, keep_all=False):
+    """Convert EasyOCR detail=1 results into response blocks
+
+    Confidence filtering (skipped with ``keep_all``) and rounding run as one
+    NumPy pass over all boxes.
+    """
+    with stage("build_blocks"):
+        blocks = []
+        if results:
+            confidences = np.array([confidence for _, _, confidence in results], dtype=np.float64)
+            # Filter out low confidence results
+            keep = np.arange(len(results)) if keep_all else np.flatnonzero(confidences > MIN_CONFIDENCE)
+            coords = np.array([results[i][0] for i in keep], dtype=np.float64).reshape(len(keep), 4, 2)
+            coords = np.round(coords, 2).tolist()
+            confidences = np.round(confidences[keep], 3).tolist()
+            for i, corners, confidence in zip(keep.tolist(), coords, confidences):
+                blocks.append({
+                    "text": results[i][1].strip(),
+                    "confidence": confidence,
+                    "position": _position(corners)
+                })
+    count("pages")
+    count("blocks", len(blocks))
+    return blocks
+
+def _page_result(page_number, page_array, results):
+    """Page entry of a response; page_size is the pixel size block coordinates refer to"""
+    height, width = page_array.shape[:2]
+    return {
+        "page_number": page_number,
+        "page_size": {"width": int(width), "height": int(height)},
+        "path": "ocr",
+        "blocks": _build_blocks(results)
+    }
+
+def _read_source(source, filename=None):
+    """Load path sources into memory, keeping the path as filename hint"""
+    if isinstance(source, (str, os.PathLike)):
+        filename = filename or os.fspath(source)
+        with open(source, 'rb') as f:
+            source = f.read()
+    return source, filename
+
+def _lookup_pages(reader, page_arrays):
+    """Page dedupe lookup: (fingerprints, results), results being None for pages still to OCR"""
+    if page_cache is None:
+        return [None] * len(page_arrays), [None] * len(page_arrays)
+    with stage("page_dedupe"):
+        fingerprints = [page_cache.fingerprint(reader, page_array) for page_array in page_arrays]
+        cached = [page_cache.get(fingerprint) for fingerprint in fingerprints]
+    count("pages_deduplicated", sum(results is not None for results in cached))
+    return fingerprints, cached
+
+def _remember_page(fingerprint, results):
+    if fingerprint is not None:
+        page_cache.put(fingerprint, results)
+
+def _recognize_pages(reader, pages):
+    """EasyOCR results of a list of (page_number, page_array) by page number; failed pages are left out"""
+    if len(pages) > 1:
+        try:
+            batch_results = readtext_pages(reader, [page_array for _, page_array in pages],
+                                           batch_size=RECOGNIZER_BATCH_SIZE, tile_size=TILE_SIZE,
+                                           reread_threshold=REREAD_THRESHOLD, reread_rotate=REREAD_ROTATE,
+                                           templates=template_cache)
+            return {page_number: results for (page_number, _), results in zip(pages, batch_results)}
+        except Exception as e:
+            logger.warning(f"Batched recognition failed, falling back to page-by-page: {e}")
+    
+    recognized = {}
+    for page_number, page_array in pages:
+        try:
+            recognized[page_number] = readtext_page(reader, page_array, tile_size=TILE_SIZE,
+                                                    reread_threshold=REREAD_THRESHOLD,
+                                                    reread_rotate=REREAD_ROTATE, templates=template_cache)
+        except Exception as e:
+            logger.error(f"Error processing PDF page {page_number}: {e}")
+            # Continue with next page instead of failing completely
+    return recognized
+
+def _ocr_pages(reader, pages):
+    """Run OCR over a list of (page_number, page_array) and return page results in order
+
+    Pages already seen (see ``page_cache``) reuse the stored results.
+    """
+    fingerprints, cached = _lookup_pages(reader, [page_array for _, page_array in pages])
+    recognized = _recognize_pages(reader, [page for page, results in zip(pages, cached) if results is None])
+    
+    page_results = []
+    for (page_number, page_array), fingerprint, results in zip(pages, fingerprints, cached):
+        if results is None:
+            results = recognized.get(page_number)
+            if results is None:
+                continue
+            _remember_page(fingerprint, results)
+        page_results.append(_page_result(page_number, page_array, results))
+        logger.debug(f"Page {page_number} processed: {len(page_results[-1]['blocks'])} blocks found")
+    return page_results
+
+def _region_page(reader, page_number, frame, crops):
+    """Page result of the OCRed region crops ``[(pixel box, crop array)]`` with blocks in page space"""
+    count("regions", len(crops))
+    fingerprints, cached = _lookup_pages(reader, [crop for _, crop in crops])
+    recognized = _recognize_pages(reader, [(index, crop) for index, ((_, crop), results)
+                                           in enumerate(zip(crops, cached)) if results is None])
+    page_results = []
+    for index, ((box, crop), fingerprint, results) in enumerate(zip(crops, fingerprints, cached)):
+        if results is None:
+            results = recognized.get(index, [])
+            _remember_page(fingerprint, results)
+        page_results.extend(frame.map_results(results, box, crop))
+    return {
+        "page_number": page_number,
+        "page_size": {"width": frame.page_width, "height": frame.page_height},
+        "path": "regions",
+        "regions": [frame.page_rect(box) for box, _ in crops],
+        "blocks": _build_blocks(page_results)
+    }
+
+def _text_layer_regions(page, frame, boxes):
+    """A text layer page result cut down to the blocks inside the regions"""
+    rects = [frame.page_rect(box) for box in boxes]
+    blocks = [block for block in page["blocks"] if any(contains_block(rect, block) for rect in rects)]
+    return {**page, "regions": rects, "blocks": blocks}
+
+def iter_region_pages(reader, source, regions, pdf, first_page=1, last_page=MAX_PDF_PAGES):
+    """Yield results of only the requested regions, for the pages that have any
+
+    Only the region crops are rasterized (``pdftoppm -x/-y/-W/-H``) or cut from
+    the image, then OCRed at full resolution; block coordinates are mapped back
+    into the page's ``page_size`` space. For images that is the space of
+    full-page OCR; PDF pages use the page at ``PDF_DPI`` fitted to
+    ``PAGE_MAX_SIZE`` (as text layer and detect/recognize pages do), not the
+    per-page DPI the pre-pass picks for full-page OCR. PDF pages with a usable
+    text layer are answered from it.
+    """
+    if not pdf:
+        image = load_image(source)
+        frame = PageFrame(image.size[0], image.size[1], 1.0, PAGE_MAX_SIZE)
+        boxes = [frame.render_box(rect) for rect in map(frame.native_rect, regions_for_page(regions, 1)) if rect]
+        if not boxes:
+            return
+        crops = [(box, optimize_image(image.crop(box))) for box in boxes]
+        yield _region_page(reader, 1, frame, crops)
+        return
+    
+    info = pdf_info(source, first_page, last_page)
+    last_page = min(last_page, info["pages"])
+    page_numbers = [number for number in range(first_page, last_page + 1) if regions_for_page(regions, number)]
+    if not page_numbers:
+        return
+    text_pages = extract_text_layer(source, page_numbers[0], page_numbers[-1]) if TEXT_LAYER else {}
+    for page_number in page_numbers:
+        page_size = info["page_sizes"].get(page_number) or info["page_size"]
+        if not page_size:
+            raise Exception(f"Unable to get the size of page {page_number}")
+        frame = PageFrame(page_size[0], page_size[1], PDF_DPI / 72, PAGE_MAX_SIZE)
+        boxes = [frame.render_box(rect) for rect in map(frame.native_rect, regions_for_page(regions, page_number))
+                 if rect]
+        if page_number in text_pages:
+            count("pages_text_layer")
+            yield _text_layer_regions(text_pages[page_number], frame, boxes)
+            continue
+        crops = [(box, optimize_image(rasterize_pdf_page(source, page_number, crop=box))) for box in boxes]
+        yield _region_page(reader, page_number, frame, crops)
+
+def _mode_page(reader, page_number, page_array, mode, boxes):
+    """Page result of ``mode=detect`` (blocks with a position only) or ``mode=recognize``"""
+    height, width = page_array.shape[:2]
+    page = {"page_number": page_number, "page_size": {"width": int(width), "height": int(height)}, "path": mode}
+    if mode == "detect":
+        _, horizontal_list, free_list = detect_page(reader, page_array, tile_size=TILE_SIZE)
+        corners = [box_corners(box, False) for box in horizontal_list] + [box_corners(box, True) for box in free_list]
+        with stage("build_blocks"):
+            page["blocks"] = [{"position": _position(np.round(np.array(box, dtype=np.float64), 2).tolist())}
+                              for box in corners]
+        count("pages")
+        count("blocks", len(page["blocks"]))
+        return page
+    results = recognize_boxes(reader, page_array, boxes_for_page(boxes, page_number), batch_size=RECOGNIZER_BATCH_SIZE,
+                              reread_threshold=REREAD_THRESHOLD, reread_rotate=REREAD_ROTATE)
+    # One block per supplied box, in order, whatever its confidence
+    page["blocks"] = _build_blocks(results, keep_all=True)
+    return page
+
+def iter_mode_pages(reader, source, mode, boxes, pdf, first_page=1, last_page=MAX_PDF_PAGES):
+    """Yield ``mode=detect`` or ``mode=recognize`` results page by page
+
+    PDF pages are always rendered at PDF_DPI (no pre-pass or text layer), so
+    the boxes of a detect response, or of a full OCR response that used the
+    same DPI, can be sent back for recognition unchanged. In recognize mode
+    only pages that have boxes are rasterized.
+    """
+    if not pdf:
+        yield _mode_page(reader, 1, optimize_image(source), mode, boxes)
+        return
+    
+    last_page = min(last_page, pdf_page_count(source))
+    for page_number in range(first_page, last_page + 1):
+        if mode == "recognize" and not boxes_for_page(boxes, page_number):
+            continue
+        page_array = optimize_image(rasterize_pdf_page(source, page_number))
+        yield _mode_page(reader, page_number, page_array, mode, boxes)
+        del page_array
+
+def page_range(first_page=None, last_page=None):
+    """Validated ``(first_page, last_page)``, covering at most MAX_PDF_PAGES pages"""
+    first_page = first_page or 1
+    last_page = min(last_page or first_page + MAX_PDF_PAGES - 1, first_page + MAX_PDF_PAGES - 1)
+    if first_page < 1 or last_page < first_page:
+        raise ValueError(f"Invalid page range {first_page}-{last_page}")
+    return first_page, last_page
+
+def iter_document_pages(source, languages=None, filename=None, page_batch_size=None, regions=None,
+                        first_page=None, last_page=None, mode="read", boxes=None):
+    """Yield OCR results page by page, holding at most one page batch in memory
+
+    ``source`` may be a file path, raw file bytes, a PIL image or a NumPy
+    array. ``filename`` is only used as a hint for PDF detection. With
+    ``page_batch_size`` > 1, PDF pages are detected and recognized in groups
+    of that size (see ``ocr_engine.readtext_pages``). ``first_page`` and
+    ``last_page`` limit which PDF pages are rasterized; with ``regions`` (see
+    ``regions.parse_regions``) only those areas are OCRed. ``mode="detect"``
+    returns text boxes without recognizing them and ``mode="recognize"`` reads
+    the given ``boxes`` (see ``regions.parse_boxes``) without detecting.
+    """
     if not languages:
         languages = ['en']
+    if not page_batch_size:
+        page_batch_size = PAGE_BATCH_SIZE
+    first_page, last_page = page_range(first_page, last_page)
     
-    logger.info(f"Processing document: {file_path} with languages: {languages}")
+    source, filename = _read_source(source, filename)
+    logger.info(f"Processing document: {filename or type(source).__name__} with languages: {languages}")
     
     try:
         reader = get_or_create_reader(languages)
@@ -97,105 +528,265 @@ def process_document(file_path, languages=None):
         logger.error(f"Failed to get OCR reader: {e}")
         raise Exception(f"OCR reader initialization failed: {str(e)}")
     
-    all_results = {"pages": []}
-    temp_files = []  # Track temp files for cleanup
-    try:
-        # Check if the file is a PDF
-        if file_path.lower().endswith('.pdf'):
-            logger.info("Processing PDF document")
-            try:
-                # Convert PDF pages to a list of PIL Image objects
-                images = convert_from_path(file_path, dpi=200, first_page=1, last_page=MAX_PDF_PAGES)
-                logger.info(f"PDF converted to {len(images)} images")
-                
-                for i, pil_image in enumerate(images):
-                    logger.debug(f"Processing PDF page {i+1}")
-                    
-                    # Create a temporary file for each image page
-                    with tempfile.NamedTemporaryFile(suffix='.jpg', delete=False) as tmp_img:
-                        # Optimize the image before saving
-                        if pil_image.size[0] > MAX_IMAGE_SIZE[0] or pil_image.size[1] > MAX_IMAGE_SIZE[1]:
-                            pil_image.thumbnail(MAX_IMAGE_SIZE, Image.Resampling.LANCZOS)
-                            
-                        pil_image.save(tmp_img.name, 'JPEG', quality=JPEG_QUALITY)
-                        temp_img_path = tmp_img.name
-                        temp_files.append(temp_img_path)
-                    
-                    try:
-                        # Process the temporary image file with EasyOCR
-                        results = reader.readtext(temp_img_path, detail=1)
-                        page_data = {"page_number": i + 1, "blocks": []}
-
-                        for bbox, text, confidence in results:
-                            if confidence > 0.1:  # Filter out low confidence results
-                                block = {
-                                    "text": text.strip(),
-                                    "confidence": round(float(confidence), 3),
-                                    "position": {
-                                        "top_left": [round(float(c), 2) for c in bbox[0]],
-                                        "top_right": [round(float(c), 2) for c in bbox[1]],
-                                        "bottom_right": [round(float(c), 2) for c in bbox[2]],
-                                        "bottom_left": [round(float(c), 2) for c in bbox[3]]
-                                    }
-                                }
-                                page_data["blocks"].append(block)
-                        
-                        all_results["pages"].append(page_data)
-                        logger.debug(f"Page {i+1} processed: {len(page_data['blocks'])} blocks found")
-                        
-                    except Exception as e:
-                        logger.error(f"Error processing PDF page {i+1}: {e}")
-                        # Continue with next page instead of failing completely
-                        
-            except Exception as e:
-                logger.error(f"PDF processing failed: {e}")
-                raise Exception(f"PDF processing failed: {str(e)}")
-        else:
-            # If it's not a PDF, process it as a regular image
-            logger.info("Processing regular image")
+    if mode != "read":
+        logger.info(f"Processing in {mode} mode")
+        try:
+            yield from iter_mode_pages(reader, source, mode, boxes, is_pdf(source, filename), first_page, last_page)
+        except Exception as e:
+            logger.error(f"{mode.capitalize()} processing failed: {e}")
+            raise Exception(f"{mode.capitalize()} processing failed: {str(e)}")
+        return
+    
+    if regions:
+        logger.info(f"Processing {len(regions)} region(s)")
+        try:
+            yield from iter_region_pages(reader, source, regions, is_pdf(source, filename), first_page, last_page)
+        except Exception as e:
+            logger.error(f"Region processing failed: {e}")
+            raise Exception(f"Region processing failed: {str(e)}")
+        return
+    
+    # Check if the file is a PDF
+    if is_pdf(source, filename):
+        logger.info("Processing PDF document")
+        try:
+            if POOL_SIZE > 1:
+                # Import here to avoid a circular import (ocr_pool builds on this module)
+                from ocr_pool import iter_document_pages_parallel
+                yield from iter_document_pages_parallel(source, languages, filename=filename,
+                                                        first_page=first_page, last_page=last_page)
+                return
             
-            try:
-                # Optimize the image first
-                optimized_path = optimize_image(file_path)
-                temp_files.append(optimized_path)
-                
-                # Process with EasyOCR
-                results = reader.readtext(optimized_path, detail=1)
-                page_data = {"page_number": 1, "blocks": []}
-
-                for bbox, text, confidence in results:
-                    if confidence > 0.1:  # Filter out low confidence results
-                        block = {
-                            "text": text.strip(),
-                            "confidence": round(float(confidence), 3),
-                            "position": {
-                                "top_left": [round(float(c), 2) for c in bbox[0]],
-                                "top_right": [round(float(c), 2) for c in bbox[1]],
-                                "bottom_right": [round(float(c), 2) for c in bbox[2]],
-                                "bottom_left": [round(float(c), 2) for c in bbox[3]]
-                            }
-                        }
-                        page_data["blocks"].append(block)
+            batch = []
+            reports = {}
+            for page_number, page_array, report in iter_prepared_pdf_pages(source, first_page, last_page):
+                logger.debug(f"Processing PDF page {page_number}")
+                if page_array is None:
+                    # Text layer or blank page: flush the pages before it to keep page order
+                    if batch:
+                        yield from _with_prepass(_ocr_pages(reader, batch), reports)
+                        batch = []
+                    yield report
+                    continue
                 
-                all_results["pages"].append(page_data)
-                logger.info(f"Image processed: {len(page_data['blocks'])} blocks found")
+                # Hand the page to EasyOCR as an in-memory array
+                batch.append((page_number, page_array))
+                reports[page_number] = report
+                del page_array
                 
-            except Exception as e:
-                logger.error(f"Image processing failed: {e}")
-                raise Exception(f"Image processing failed: {str(e)}")
+                if len(batch) >= page_batch_size:
+                    yield from _with_prepass(_ocr_pages(reader, batch), reports)
+                    batch = []
+            
+            if batch:
+                yield from _with_prepass(_ocr_pages(reader, batch), reports)
                 
+        except Exception as e:
+            logger.error(f"PDF processing failed: {e}")
+            raise Exception(f"PDF processing failed: {str(e)}")
+    else:
+        # If it's not a PDF, process it as a regular image
+        logger.info("Processing regular image")
+        
+        try:
+            # Optimize the image first
+            image_array = optimize_image(source)
+            
+            # Process with EasyOCR, unless the same image was read before
+            fingerprints, cached = _lookup_pages(reader, [image_array])
+            results = cached[0]
+            if results is None:
+                results = readtext_page(reader, image_array, tile_size=TILE_SIZE,
+                                        reread_threshold=REREAD_THRESHOLD, reread_rotate=REREAD_ROTATE,
+                                        templates=template_cache)
+                _remember_page(fingerprints[0], results)
+            page_data = _page_result(1, image_array, results)
+            logger.info(f"Image processed: {len(page_data['blocks'])} blocks found")
+            
+        except Exception as e:
+            logger.error(f"Image processing failed: {e}")
+            raise Exception(f"Image processing failed: {str(e)}")
+        
+        yield page_data
+
+def result_cache_key(source, languages, regions=None, first_page=None, last_page=None, mode="read", boxes=None):
+    """Cache key for a document under the current processing settings
+
+    The backend is part of it: the SQLite tier outlives restarts, and torch and
+    ONNX (float or int8) results differ slightly.
+    """
+    return cache_key(source, languages, backend=backend_id(BACKEND), dpi=PDF_DPI, max_image_size=PAGE_MAX_SIZE,
+                     max_pdf_pages=MAX_PDF_PAGES, min_confidence=MIN_CONFIDENCE,
+                     jpeg_reencode=JPEG_REENCODE, prepass=PAGE_PREPASS, tile_size=TILE_SIZE,
+                     text_layer=TEXT_LAYER, reread_threshold=REREAD_THRESHOLD, reread_rotate=REREAD_ROTATE,
+                     regions=regions, page_range=page_range(first_page, last_page), mode=mode, boxes=boxes)
+
+def cache_info(cache, tier):
+    """Per-request cache status plus the running hit/miss counters"""
+    stats = cache.stats()
+    return {
+        "status": "hit" if tier else "miss",
+        "tier": tier,
+        "hits": stats["hits"],
+        "misses": stats["misses"]
+    }
+
+def process_document(source, languages=None, filename=None, page_batch_size=None, use_cache=True,
+                     on_page=None, regions=None, first_page=None, last_page=None, mode="read", boxes=None,
+                     result_key=None):
+    """Process document with improved error handling and memory management
+
+    Results are served from the content-addressed result cache when the same
+    bytes were processed before with the same languages and settings.
+    ``on_page`` is called with each page result as soon as it is ready.
+    ``regions``, the page range, ``mode`` and ``boxes`` are passed on to
+    ``iter_document_pages``. ``result_key`` saves hashing the document again
+    when the caller already computed its ``result_cache_key``.
+    """
+    if not languages:
+        languages = ['en']
+    
+    source, filename = _read_source(source, filename)
+    cache = get_cache() if use_cache else None
+    key = (result_key or result_cache_key(source, languages, regions, first_page, last_page, mode, boxes)
+           if cache else None)
+    if key:
+        cached, tier = cache.get(key)
+        if cached is not None:
+            logger.info(f"Result cache hit ({tier}): {len(cached['pages'])} pages")
+            cached["processing_info"] = {"cache": cache_info(cache, tier)}
+            return cached
+    
+    all_results = {"pages": []}
+    try:
+        for page_data in iter_document_pages(source, languages, filename=filename,
+                                             page_batch_size=page_batch_size, regions=regions,
+                                             first_page=first_page, last_page=last_page, mode=mode, boxes=boxes):
+            all_results["pages"].append(page_data)
+            if on_page:
+                on_page(page_data)
     finally:
-        # Cleanup temporary files
-        for temp_file in temp_files:
+        # Collect only when memory grew (see memory_governor)
+        memory_governor.maybe_collect()
+
+    logger.info(f"Document processing completed: {len(all_results['pages'])} pages processed")
+    if key:
+        cache.put(key, all_results)
+        all_results["processing_info"] = {"cache": cache_info(cache, None)}
+    return all_results
+
+def _ocr_batch_pages(pending, results):
+    """Recognize queued batch pages grouped by language set and add them to their documents"""
+    groups = {}
+    for entry in pending:
+        groups.setdefault(entry[2], []).append(entry)
+    
+    for lang_key, entries in groups.items():
+        reader = get_or_create_reader(list(lang_key))
+        try:
+            batch_results = readtext_pages(reader, [entry[3] for entry in entries], batch_size=RECOGNIZER_BATCH_SIZE,
+                                           bucket=BATCH_SIZE_BUCKET, tile_size=TILE_SIZE,
+                                           reread_threshold=REREAD_THRESHOLD, reread_rotate=REREAD_ROTATE,
+                                           templates=template_cache)
+        except Exception as e:
+            logger.warning(f"Batched recognition failed, falling back to page-by-page: {e}")
+            batch_results = []
+            for doc_index, page_number, _, page_array in entries:
+                try:
+                    batch_results.append(readtext_page(reader, page_array, tile_size=TILE_SIZE,
+                                                       reread_threshold=REREAD_THRESHOLD, reread_rotate=REREAD_ROTATE,
+                                                       templates=template_cache))
+                except Exception as page_error:
+                    logger.error(f"Error processing page {page_number} of document {doc_index}: {page_error}")
+                    results[doc_index]["error"] = f"Page {page_number} failed: {page_error}"
+                    batch_results.append(None)
+        
+        for (doc_index, page_number, _, page_array), page_results in zip(entries, batch_results):
+            if page_results is not None:
+                results[doc_index]["pages"].append(_page_result(page_number, page_array, page_results))
+    logger.debug(f"Recognized {len(pending)} batch page(s) in {len(groups)} language group(s)")
+
+def process_batch(documents, use_cache=True):
+    """OCR many documents through one shared recognition pipeline
+
+    ``documents`` is a list of dicts with ``source``, ``filename``,
+    ``languages`` and optionally their ``cache_key``. Pages from all documents are grouped by language set and
+    (bucketed) image size so they share detector and recognizer batches.
+    Returns one result per document in input order; a document that fails
+    carries an ``"error"`` entry without failing the rest of the batch.
+    """
+    cache = get_cache() if use_cache else None
+    
+    if POOL_SIZE > 1:
+        # Import here to avoid a circular import (ocr_pool builds on this module)
+        from ocr_pool import process_documents
+        results = [None] * len(documents)
+        by_languages = {}
+        for doc_index, document in enumerate(documents):
+            lang_key = tuple(document.get("languages") or ['en'])
+            by_languages.setdefault(lang_key, []).append(doc_index)
+        for lang_key, indices in by_languages.items():
+            group_results = process_documents([(documents[i]["source"], documents[i].get("filename")) for i in indices],
+                                              list(lang_key), use_cache=use_cache)
+            for doc_index, result in zip(indices, group_results):
+                results[doc_index] = result
+        return results
+    
+    results = [None] * len(documents)
+    keys = [None] * len(documents)
+    pending = []  # (doc_index, page_number, language key, page array)
+    reports = {}  # (doc_index, page_number) -> pre-pass report
+    try:
+        for doc_index, document in enumerate(documents):
+            languages = document.get("languages") or ['en']
             try:
-                if os.path.exists(temp_file):
-                    os.remove(temp_file)
-                    logger.debug(f"Cleaned up temp file: {temp_file}")
+                source, filename = _read_source(document["source"], document.get("filename"))
+                keys[doc_index] = (document.get("cache_key") or result_cache_key(source, languages)) if cache else None
+                if keys[doc_index]:
+                    cached, tier = cache.get(keys[doc_index])
+                    if cached is not None:
+                        cached["processing_info"] = {"cache": cache_info(cache, tier)}
+                        results[doc_index] = cached
+                        keys[doc_index] = None
+                        continue
+                
+                results[doc_index] = {"pages": []}
+                if is_pdf(source, filename):
+                    for page_number, page_array, report in iter_prepared_pdf_pages(source):
+                        if page_array is None:
+                            results[doc_index]["pages"].append(report)
+                            continue
+                        pending.append((doc_index, page_number, tuple(languages), page_array))
+                        reports[(doc_index, page_number)] = report
+                else:
+                    image_array = optimize_image(source)
+                    if not isinstance(image_array, np.ndarray):
+                        raise Exception("Image could not be decoded")
+                    pending.append((doc_index, 1, tuple(languages), image_array))
             except Exception as e:
-                logger.warning(f"Failed to cleanup temp file {temp_file}: {e}")
+                logger.error(f"Failed to prepare document {document.get('filename') or doc_index}: {e}")
+                results[doc_index] = {"pages": [], "error": str(e)}
+                keys[doc_index] = None
+            
+            if len(pending) >= BATCH_PAGE_LIMIT:
+                _ocr_batch_pages(pending, results)
+                pending = []
         
-        # Force garbage collection
-        gc.collect()
-
-    logger.info(f"Document processing completed: {len(all_results['pages'])} pages processed")
-    return all_results
\ No newline at end of file
+        if pending:
+            _ocr_batch_pages(pending, results)
+    finally:
+        # At most one collection for the whole batch instead of one per document
+        memory_governor.maybe_collect()
+    
+    for doc_index, (key, result) in enumerate(zip(keys, results)):
+        for page in result["pages"]:
+            report = reports.get((doc_index, page["page_number"]))
+            if report:
+                page["prepass"] = report
+        result["pages"].sort(key=lambda page: page["page_number"])
+        if key and "error" not in result:
+            cache.put(key, result)
+            result["processing_info"] = {"cache": cache_info(cache, None)}
+    
+    logger.info(f"Batch processing completed: {len(documents)} documents")
+    return results
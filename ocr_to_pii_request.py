@@ -1,51 +1,191 @@
+import argparse
+import itertools
 import json
+import logging
+import os
+import sys
+import unicodedata
 import uuid
+from multiprocessing import Pool
 
-def ocr_to_pii_request(ocr_json, document_id="test-doc", file_type="image"):
-    pages = []
-    for page in ocr_json.get("pages", []):
-        spans = []
-        for block in page.get("blocks", []):
-            # Convert bounding box to BBox format
-            bbox = block["position"]
-            x1, y1 = bbox["top_left"]
-            x2, y2 = bbox["bottom_right"]
-            span = {
-                "span_id": str(uuid.uuid4()),
-                "text": block["text"],
-                "bbox": {
-                    "x1": x1,
-                    "y1": y1,
-                    "x2": x2,
-                    "y2": y2
-                },
-                "page_no": page.get("page_number", 1),
-                "language": "en",
-                "ocr_confidence": block.get("confidence", 1.0)
-            }
-            spans.append(span)
-        pages.append({
-            "page_no": page.get("page_number", 1),
-            "page_size": {},
-            "spans": spans
+# Configure logging
+logger = logging.getLogger(__name__)
+
+ENTITIES_TO_DETECT = [
+    "AADHAAR", "PAN", "PHONE", "EMAIL", "NAME", "ADDRESS", "AGE", "SEX", "GENDER", "DATE",
+    "MEDICAL_RECORD_NUMBER", "PATIENT_ID", "INSURANCE_NUMBER", "ACCOUNT_NUMBER", "MEDICAL_CONDITION",
+    "MEDICATION", "TREATMENT_INFO"
+]
+# Namespace of the name-based span ids, so reruns produce the same ids
+SPAN_NAMESPACE = uuid.UUID("5b6f1f36-52c4-4c4e-9a0e-0c3c1d2e8a61")
+# Unicode scripts of the non-Latin EasyOCR languages; every other language is Latin
+LANGUAGE_SCRIPTS = {
+    **dict.fromkeys(["hi", "mr", "ne", "bh", "mai", "ang", "bho", "mah", "sck", "new", "gom", "sa"], {"DEVANAGARI"}),
+    **dict.fromkeys(["bn", "as", "mni"], {"BENGALI"}),
+    **dict.fromkeys(["ar", "fa", "ur", "ug"], {"ARABIC"}),
+    **dict.fromkeys(["ru", "rs_cyrillic", "be", "bg", "uk", "mn", "abq", "ady", "kbd", "ava", "dar", "inh",
+                     "che", "lbe", "lez", "tab", "tjk"], {"CYRILLIC"}),
+    "ch_sim": {"CJK"},
+    "ch_tra": {"CJK"},
+    "ja": {"CJK", "HIRAGANA", "KATAKANA"},
+    "ko": {"HANGUL"},
+    "th": {"THAI"},
+    "ta": {"TAMIL"},
+    "te": {"TELUGU"},
+    "kn": {"KANNADA"}
+}
+CONVERT_CHUNK_SIZE = 64  # JSONL records per worker task
+CONVERT_WINDOW_CHUNKS = 4  # Chunks in flight per worker; bounds memory on large files
+
+def span_id(document_id, page_no, index):
+    """Deterministic span id derived from document, page and block index"""
+    return str(uuid.uuid5(SPAN_NAMESPACE, f"{document_id}/{page_no}/{index}"))
+
+def span_language(text, languages):
+    """Requested language whose script most of the text is written in
+
+    Languages sharing a script (e.g. ``en`` and ``fr``) cannot be told apart,
+    the first requested one is reported; so is text without letters.
+    """
+    if len(languages) == 1:
+        return languages[0]
+    scripts = [unicodedata.name(char, "").split(" ", 1)[0] for char in text if char.isalpha()]
+    best, best_count = languages[0], 0
+    for language in languages:
+        language_scripts = LANGUAGE_SCRIPTS.get(language, {"LATIN"})
+        matched = sum(1 for script in scripts if script in language_scripts)
+        if matched > best_count:
+            best, best_count = language, matched
+    return best
+
+def file_type_for(filename):
+    return "pdf" if filename and filename.lower().endswith(".pdf") else "image"
+
+def pii_options(languages):
+    return {
+        "entities_to_detect": ENTITIES_TO_DETECT,
+        "use_llm_validation": False,
+        "languages": languages
+    }
+
+def pii_page(page, document_id, languages):
+    """Convert one OCR page (list of blocks) into a PII request page"""
+    page_no = page.get("page_number", 1)
+    spans = []
+    for index, block in enumerate(page.get("blocks", [])):
+        # Convert bounding box to BBox format
+        bbox = block["position"]
+        x1, y1 = bbox["top_left"]
+        x2, y2 = bbox["bottom_right"]
+        spans.append({
+            "span_id": span_id(document_id, page_no, index),
+            "text": block["text"],
+            "bbox": {
+                "x1": x1,
+                "y1": y1,
+                "x2": x2,
+                "y2": y2
+            },
+            "page_no": page_no,
+            "language": span_language(block["text"], languages),
+            "ocr_confidence": block.get("confidence", 1.0)
         })
-    request = {
+    return {
+        "page_no": page_no,
+        "page_size": page.get("page_size", {}),
+        "spans": spans
+    }
+
+def pii_request_from_pages(pages, document_id="test-doc", file_type="image", languages=None):
+    """Build a PII request from an iterable of OCR pages
+
+    ``pages`` may be a live generator such as ``ocr_processor.iter_document_pages``;
+    each page is converted as it arrives, so the OCR result is never held in full.
+    """
+    languages = languages or ["en"]
+    return {
         "document_id": document_id,
         "file_type": file_type,
-        "pages": pages,
-        "options": {
-            "entities_to_detect": [
-                "AADHAAR", "PAN", "PHONE", "EMAIL", "NAME", "ADDRESS", "AGE", "SEX", "GENDER", "DATE",
-                "MEDICAL_RECORD_NUMBER", "PATIENT_ID", "INSURANCE_NUMBER", "ACCOUNT_NUMBER", "MEDICAL_CONDITION",
-                "MEDICATION", "TREATMENT_INFO"
-            ],
-            "use_llm_validation": False,
-            "languages": ["en"]
-        }
+        "pages": [pii_page(page, document_id, languages) for page in pages],
+        "options": pii_options(languages)
     }
-    return request
+
+def ocr_to_pii_request(ocr_json, document_id="test-doc", file_type="image", languages=None):
+    """Convert a complete OCR response into a PII request"""
+    if languages is None:
+        languages = ocr_json.get("processing_info", {}).get("languages_used")
+    return pii_request_from_pages(ocr_json.get("pages", []), document_id, file_type, languages)
+
+def record_to_pii_request(record, index=0):
+    """Convert one JSONL OCR record; ids come from document_id, the content hash or filename when present"""
+    filename = record.get("filename")
+    document_id = record.get("document_id") or record.get("hash") or filename or f"document-{index}"
+    file_type = record.get("file_type") or file_type_for(filename)
+    return ocr_to_pii_request(record, document_id, file_type, record.get("languages"))
+
+def iter_pii_requests(lines):
+    """Yield a PII request per OCR record of a JSONL stream, one record in memory at a time"""
+    for index, line in enumerate(lines):
+        if line.strip():
+            yield record_to_pii_request(json.loads(line), index)
+
+def _convert_line(item):
+    """Pool task: JSONL line in, JSONL line out (None for blank or invalid lines)"""
+    index, line = item
+    if not line.strip():
+        return None
+    try:
+        return json.dumps(record_to_pii_request(json.loads(line), index)) + "\n"
+    except (ValueError, KeyError, TypeError) as e:
+        logger.warning(f"Skipping record {index}: {e}")
+        return None
+
+def convert_jsonl(input_path, output_path, workers=1, chunk_size=CONVERT_CHUNK_SIZE):
+    """Convert a JSONL file of OCR results into a JSONL file of PII requests
+
+    Records are parsed and converted in ``workers`` processes. Input is read in
+    windows of a few chunks per worker and output keeps input order, so memory
+    stays bounded regardless of file size. Returns the number of records written.
+    """
+    written = 0
+    window = max(1, workers) * chunk_size * CONVERT_WINDOW_CHUNKS
+    with open(input_path) as source, open(output_path, "w") as target:
+        lines = enumerate(source)
+        pool = Pool(workers) if workers > 1 else None
+        try:
+            while True:
+                batch = list(itertools.islice(lines, window))
+                if not batch:
+                    break
+                converted = pool.imap(_convert_line, batch, chunk_size) if pool else map(_convert_line, batch)
+                for output_line in converted:
+                    if output_line is not None:
+                        target.write(output_line)
+                        written += 1
+        finally:
+            if pool:
+                pool.close()
+                pool.join()
+    return written
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert OCR results (JSONL) into PII service requests (JSONL)")
+    parser.add_argument("input", help="JSONL file with one OCR result per line")
+    parser.add_argument("output", help="JSONL file to write PII requests to")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="conversion processes")
+    parser.add_argument("--chunk-size", type=int, default=CONVERT_CHUNK_SIZE, help="records per worker task")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    written = convert_jsonl(args.input, args.output, workers=args.workers, chunk_size=args.chunk_size)
+    print(f"Wrote {written} PII requests to {args.output}", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
 
 # Example usage:
 # ocr_json = ... # your OCR output
 # pii_request = ocr_to_pii_request(ocr_json)
 # print(json.dumps(pii_request, indent=2))
+#
+# Bulk: python ocr_to_pii_request.py ocr_results.jsonl pii_requests.jsonl --workers 8
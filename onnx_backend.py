@@ -0,0 +1,175 @@
+import os
+import zlib
+import logging
+import numpy as np
+import torch
+
+try:
+    import onnxruntime  # Optional, only needed for OCR_BACKEND=onnx
+except ImportError:
+    onnxruntime = None
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Inference backend settings
+BACKEND = os.environ.get("OCR_BACKEND", "torch")  # torch (EasyOCR eager) or onnx (ONNX Runtime, torch fallback)
+ONNX_MODEL_DIR = os.environ.get("OCR_ONNX_DIR", os.path.expanduser("~/.EasyOCR/onnx"))  # Exported models
+ONNX_QUANTIZE = os.environ.get("OCR_ONNX_QUANTIZE", "0") == "1"  # int8 weights for the recognizer's LSTM/linear layers
+ONNX_INTRA_OP_THREADS = int(os.environ.get("OCR_ONNX_THREADS", "0"))  # Threads per model run (0 = all cores)
+ONNX_INTER_OP_THREADS = int(os.environ.get("OCR_ONNX_INTER_OP_THREADS", "1"))  # Parallel graph branches
+ONNX_GRAPH_OPTIMIZATION = os.environ.get("OCR_ONNX_OPTIMIZATION", "all")  # disable, basic, extended or all
+ONNX_OPSET = 17
+# Convolutions are left in float: ONNX Runtime's dynamically quantized ConvInteger is several times slower on CPU
+QUANTIZED_OP_TYPES = ["MatMul", "Gemm", "LSTM"]
+GRAPH_OPTIMIZATION_LEVELS = {
+    "disable": "ORT_DISABLE_ALL",
+    "basic": "ORT_ENABLE_BASIC",
+    "extended": "ORT_ENABLE_EXTENDED",
+    "all": "ORT_ENABLE_ALL"
+}
+
+_intra_op_threads = ONNX_INTRA_OP_THREADS
+
+def set_intra_op_threads(threads):
+    """Thread count for sessions created from now on in this process (process pool workers)"""
+    global _intra_op_threads
+    _intra_op_threads = threads
+
+class _MeanOverWidth(torch.nn.Module):
+    """Export-friendly stand-in for the recognizers' AdaptiveAvgPool2d((None, 1))
+
+    ONNX has no adaptive pooling over a dynamic dimension; pooling the last
+    axis to 1 is a plain mean.
+    """
+
+    def forward(self, x):
+        return x.mean(dim=3, keepdim=True)
+
+class OnnxModel:
+    """ONNX Runtime session that stands in for an EasyOCR torch module
+
+    Called like the module with torch tensors and returns torch tensors, so
+    EasyOCR's pre- and post-processing run unchanged. The session is created
+    lazily in each process: ONNX Runtime thread pools do not survive a fork,
+    and readers are loaded in the gunicorn master before workers are forked.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.model_bytes = os.path.getsize(path)
+        self._session = None
+        self._pid = None
+
+    def _get_session(self):
+        if self._pid != os.getpid():
+            options = onnxruntime.SessionOptions()
+            options.intra_op_num_threads = _intra_op_threads
+            options.inter_op_num_threads = ONNX_INTER_OP_THREADS
+            options.graph_optimization_level = getattr(
+                onnxruntime.GraphOptimizationLevel,
+                GRAPH_OPTIMIZATION_LEVELS.get(ONNX_GRAPH_OPTIMIZATION, "ORT_ENABLE_ALL"))
+            self._session = onnxruntime.InferenceSession(self.path, options, providers=["CPUExecutionProvider"])
+            self._input_names = [model_input.name for model_input in self._session.get_inputs()]
+            self._pid = os.getpid()
+        return self._session
+
+    def eval(self):
+        return self
+
+    def __call__(self, *inputs):
+        session = self._get_session()
+        # Unused inputs (the recognizers' text argument) are pruned from the exported graph
+        feed = {name: np.ascontiguousarray(value.cpu().numpy()) for name, value in zip(self._input_names, inputs)}
+        outputs = [torch.from_numpy(output) for output in session.run(None, feed)]
+        return outputs[0] if len(outputs) == 1 else tuple(outputs)
+
+def _export(model, args, path, input_names, output_names, dynamic_axes):
+    """Export to a temporary file and rename, so concurrent workers never read a partial model"""
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with torch.no_grad():
+        torch.onnx.export(model, args, temporary, input_names=input_names, output_names=output_names,
+                          dynamic_axes=dynamic_axes, opset_version=ONNX_OPSET, dynamo=False)
+    os.replace(temporary, path)
+
+def export_detector(detector, path):
+    _export(detector, (torch.zeros(1, 3, 320, 320),), path, ["image"], ["y", "feature"], {
+        "image": {0: "batch", 2: "height", 3: "width"},
+        "y": {0: "batch", 1: "map_height", 2: "map_width"},
+        "feature": {0: "batch", 2: "feature_height", 3: "feature_width"}
+    })
+
+def export_recognizer(recognizer, path, quantize=ONNX_QUANTIZE):
+    pooling = recognizer.AdaptiveAvgPool
+    recognizer.AdaptiveAvgPool = _MeanOverWidth()
+    try:
+        _export(recognizer, (torch.zeros(2, 1, 64, 256), torch.zeros(2, 26, dtype=torch.long)), path,
+                ["image", "text"], ["preds"], {
+                    "image": {0: "batch", 3: "width"},
+                    "text": {0: "batch"},
+                    "preds": {0: "batch", 1: "steps"}
+                })
+    finally:
+        recognizer.AdaptiveAvgPool = pooling
+    if quantize:
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+        temporary = f"{path}.{os.getpid()}.int8.tmp"
+        quantize_dynamic(path, temporary, op_types_to_quantize=QUANTIZED_OP_TYPES, weight_type=QuantType.QInt8)
+        os.replace(temporary, path)
+
+def model_paths(reader):
+    """Exported model files of a reader: detector per network, recognizer per model and character set"""
+    characters = zlib.crc32(reader.character.encode("utf8"))
+    suffix = "_int8" if ONNX_QUANTIZE else ""
+    return (os.path.join(ONNX_MODEL_DIR, f"detector_{reader.detect_network}.onnx"),
+            os.path.join(ONNX_MODEL_DIR, f"recognizer_{reader.model_lang}_{characters:08x}{suffix}.onnx"))
+
+def use_onnx(reader):
+    """Swap a float (quantize=False) EasyOCR reader's networks for ONNX Runtime sessions
+
+    Models are exported on first use and reused from OCR_ONNX_DIR afterwards.
+    Raises when onnxruntime is missing or export fails; the reader is then
+    left untouched.
+    """
+    if onnxruntime is None:
+        raise Exception("onnxruntime is not installed")
+    os.makedirs(ONNX_MODEL_DIR, exist_ok=True)
+    detector_path, recognizer_path = model_paths(reader)
+    if not os.path.exists(detector_path):
+        logger.info(f"Exporting detector to {detector_path}")
+        export_detector(reader.detector, detector_path)
+    if not os.path.exists(recognizer_path):
+        logger.info(f"Exporting recognizer to {recognizer_path}")
+        export_recognizer(reader.recognizer, recognizer_path)
+    detector, recognizer = OnnxModel(detector_path), OnnxModel(recognizer_path)
+    # Load both sessions now, so a broken model falls back to torch instead of failing a request
+    detector._get_session()
+    recognizer._get_session()
+    reader.detector, reader.recognizer = detector, recognizer
+    reader.backend = "onnx"
+    return reader
+
+def use_torch(reader):
+    """Quantize a float reader's networks in place, as EasyOCR does with quantize=True"""
+    for name in ("detector", "recognizer"):
+        try:
+            torch.quantization.quantize_dynamic(getattr(reader, name), dtype=torch.qint8, inplace=True)
+        except Exception as e:
+            logger.warning(f"Could not quantize the {name}: {e}")
+    reader.backend = "torch"
+    return reader
+
+def backend_id(backend=BACKEND):
+    """Backend and weight precision a reader created for ``backend`` runs with (torch weights are always int8)"""
+    if backend == "onnx":
+        return "onnx-int8" if ONNX_QUANTIZE else "onnx-float"
+    return "torch-int8"
+
+def apply_backend(reader, backend=BACKEND):
+    """Run a float reader on the configured backend, falling back to torch when ONNX is unavailable"""
+    if backend == "onnx":
+        try:
+            return use_onnx(reader)
+        except Exception as e:
+            logger.warning(f"ONNX backend unavailable, falling back to torch: {e}")
+    return use_torch(reader)
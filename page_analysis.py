@@ -0,0 +1,85 @@
+import os
+import math
+import logging
+
+import numpy as np
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Page pre-pass settings
+PAGE_PREPASS = os.environ.get("OCR_PAGE_PREPASS", "1") == "1"  # Thumbnail pre-pass for PDF pages
+THUMBNAIL_DPI = int(os.environ.get("OCR_THUMBNAIL_DPI", "50"))  # Resolution of the pre-pass thumbnail
+BLANK_INK_RATIO = float(os.environ.get("OCR_BLANK_INK_RATIO", "0.0001"))  # Ink share below which a page may be blank
+TARGET_TEXT_HEIGHT = int(os.environ.get("OCR_TARGET_TEXT_HEIGHT", "24"))  # Text line height (px) to rasterize for
+MIN_DPI = int(os.environ.get("OCR_MIN_DPI", "72"))  # Lowest rasterization resolution
+DPI_STEP = 25  # Chosen resolutions are rounded up to multiples of this
+MARGIN_RATIO = 0.05  # Page border ignored when measuring ink (scanner edges, punch holes)
+MIN_LINE_HEIGHT = 2  # Thumbnail rows an ink band needs to count as a text line (not a dust speck)
+
+def ink_mask(grey):
+    """Dark pixels relative to the page background, with the page border cropped off"""
+    height, width = grey.shape[:2]
+    top, left = int(height * MARGIN_RATIO), int(width * MARGIN_RATIO)
+    grey = grey[top:height - top or None, left:width - left or None]
+    threshold = float(np.median(grey)) * 0.75
+    return grey < threshold
+
+def text_lines(mask):
+    """``(top, bottom)`` rows of the horizontal ink bands at least MIN_LINE_HEIGHT rows high"""
+    row_ink = mask.mean(axis=1)
+    if not row_ink.any():
+        return []
+    rows = np.concatenate(([False], row_ink > row_ink.max() * 0.1, [False]))
+    edges = np.flatnonzero(np.diff(rows.astype(np.int8)))
+    return [(top, bottom) for top, bottom in zip(edges[::2], edges[1::2]) if bottom - top >= MIN_LINE_HEIGHT]
+
+def text_line_height(mask):
+    """Median height in pixels of the horizontal ink bands (text lines), or None"""
+    heights = [bottom - top for top, bottom in text_lines(mask)]
+    return float(np.median(heights)) if heights else None
+
+def choose_dpi(line_height_inches, max_dpi):
+    """Lowest resolution (in DPI_STEP steps) that renders text lines at TARGET_TEXT_HEIGHT pixels"""
+    if not line_height_inches:
+        return max_dpi
+    dpi = math.ceil(TARGET_TEXT_HEIGHT / line_height_inches / DPI_STEP) * DPI_STEP
+    return int(min(max(dpi, MIN_DPI), max_dpi))
+
+def max_render_dpi(thumbnail, thumbnail_dpi, max_dpi, max_size):
+    """Highest useful resolution: max_dpi, or less if the page would not fit in max_size"""
+    width, height = thumbnail.size
+    fit_dpi = min(max_size[0] * thumbnail_dpi / width, max_size[1] * thumbnail_dpi / height)
+    return max(MIN_DPI, min(max_dpi, int(fit_dpi)))
+
+def analyze_thumbnail(thumbnail, thumbnail_dpi, max_dpi, max_size):
+    """Decide from a low-resolution render whether and at which DPI a page is OCRed
+
+    Returns the pre-pass report: ``blank``, ``ink_ratio``, the chosen ``dpi``
+    (never above ``max_dpi``, nor above the resolution at which the page still
+    fits in ``max_size``) and the estimated ``text_height_px`` at that DPI.
+    """
+    grey = np.asarray(thumbnail.convert('L'))
+    max_dpi = max_render_dpi(thumbnail, thumbnail_dpi, max_dpi, max_size)
+
+    mask = ink_mask(grey)
+    ink_ratio = float(mask.mean()) if mask.size else 0.0
+    line_height = text_line_height(mask)
+    # Skipping a page loses its text for good: require almost no ink and no text line at all
+    report = {"blank": ink_ratio < BLANK_INK_RATIO and line_height is None, "ink_ratio": round(ink_ratio, 6)}
+    if report["blank"]:
+        report.update({"dpi": None, "text_height_px": None})
+        return report
+
+    line_height_inches = line_height / thumbnail_dpi if line_height else None
+    dpi = choose_dpi(line_height_inches, max_dpi)
+    report.update({
+        "dpi": dpi,
+        "text_height_px": round(line_height_inches * dpi, 1) if line_height_inches else None
+    })
+    return report
+
+def page_size_at(thumbnail, thumbnail_dpi, dpi):
+    """Pixel size of a page at dpi, from its thumbnail"""
+    width, height = thumbnail.size
+    return {"width": round(width * dpi / thumbnail_dpi), "height": round(height * dpi / thumbnail_dpi)}
@@ -0,0 +1,254 @@
+import os
+import zlib
+import hashlib
+import threading
+import logging
+from collections import OrderedDict
+
+import numpy as np
+from PIL import Image
+from metrics import count
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Page dedupe settings
+PAGE_DEDUPE = os.environ.get("OCR_PAGE_DEDUPE", "1") == "1"  # Reuse results of identical pages
+PAGE_DEDUPE_ENTRIES = int(os.environ.get("OCR_PAGE_DEDUPE_ENTRIES", "256"))  # Pages remembered (LRU)
+PAGE_DEDUPE_MAX_DISTANCE = int(os.environ.get("OCR_PAGE_DEDUPE_MAX_DISTANCE", "0"))  # Differing hash bits allowed (0 = exact pixels)
+PAGE_HASH_WIDTH = 256  # Grid width of the perceptual page hash used for near-identical matches
+
+# Form template settings
+FORM_TEMPLATES = os.environ.get("OCR_FORM_TEMPLATES", "0") == "1"  # Reuse pixel-identical regions of known layouts
+FORM_TEMPLATE_ENTRIES = int(os.environ.get("OCR_FORM_TEMPLATE_ENTRIES", "64"))  # Layouts remembered (LRU)
+TEMPLATE_MAX_DISTANCE = float(os.environ.get("OCR_TEMPLATE_MAX_DISTANCE", "0.1"))  # Share of differing layout bits
+TEMPLATE_HASH_WIDTH = 32  # Grid width of the layout hash; coarse, so filled-in fields barely change it
+REGION_DIGEST_MARGIN = 2  # Pixels around a text box included in its digest (box edges are inclusive or rounded)
+
+def reader_key(reader):
+    """Identity of a reader's output: recognition model, allowed characters and inference backend"""
+    return (getattr(reader, "model_lang", ""), zlib.crc32(getattr(reader, "lang_char", "").encode("utf8")),
+            getattr(reader, "backend", ""))
+
+def ink_bits(grey, width, height=None):
+    """Binary ink map of a greyscale image on a grid of ``width`` cells (height keeps the aspect ratio)"""
+    rows, columns = grey.shape[:2]
+    height = height or max(1, round(rows * width / columns))
+    small = np.asarray(Image.fromarray(grey).resize((width, height), Image.BOX), dtype=np.float32)
+    threshold = (float(small.min()) + float(small.max())) / 2
+    return small < threshold
+
+def _distance(first, second):
+    """Share of differing bits of two equally shaped bit maps"""
+    return np.count_nonzero(first != second) / first.size
+
+def _digest(array):
+    return hashlib.blake2b(np.ascontiguousarray(array).data, digest_size=16).digest()
+
+def _rect(box):
+    """(x_min, x_max, y_min, y_max) of a 4-point box"""
+    xs = [point[0] for point in box]
+    ys = [point[1] for point in box]
+    return min(xs), max(xs), min(ys), max(ys)
+
+def region_key(rect):
+    """Integer pixel rect of a text region, the unit regions are matched by"""
+    return tuple(int(round(value)) for value in rect)
+
+def region_digest(grey, key):
+    """Digest of the exact pixels of one text region, or None for degenerate boxes
+
+    The crop covers everything the recognizer reads for the box plus
+    REGION_DIGEST_MARGIN pixels around it, so equal digests mean equal
+    recognizer input; any changed pixel forces recognition.
+    """
+    x_min, x_max, y_min, y_max = key
+    margin = REGION_DIGEST_MARGIN
+    crop = grey[max(0, y_min - margin):y_max + margin + 1, max(0, x_min - margin):x_max + margin + 1]
+    if crop.shape[0] < 2 or crop.shape[1] < 2:
+        return None
+    return crop.shape, _digest(crop)
+
+class PageCache:
+    """Bounded LRU of recognized pages keyed by a digest of their pixels
+
+    By default only pixel-identical pages (repeated PDF pages, resubmitted
+    images) reuse the stored EasyOCR results. With ``max_distance`` above 0,
+    pages of the same size whose perceptual hashes differ in at most that many
+    bits match too (rescans of one page); a coarse hash can miss a single
+    changed character, so this is opt-in.
+    """
+
+    def __init__(self, max_entries=PAGE_DEDUPE_ENTRIES, max_distance=PAGE_DEDUPE_MAX_DISTANCE):
+        self.max_entries = max_entries
+        self.max_distance = max_distance
+        self._entries = OrderedDict()  # (reader key, shape, packed hash) -> (hash bits, results)
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "near_hits": 0, "misses": 0, "evictions": 0}
+
+    def fingerprint(self, reader, page_array):
+        """Lookup key and hash bits of a page (RGB or greyscale array)"""
+        grey = page_array if page_array.ndim == 2 else np.asarray(Image.fromarray(page_array).convert('L'))
+        bits = ink_bits(grey, PAGE_HASH_WIDTH) if self.max_distance > 0 else None
+        digest = _digest(grey)
+        return (reader_key(reader), grey.shape[:2], digest), bits
+
+    def get(self, fingerprint):
+        """Stored results of the same or a near-identical page, or None"""
+        key, bits = fingerprint
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self._stats["hits"] += 1
+                return entry[1]
+            if self.max_distance > 0:
+                for other_key, (other_bits, results) in reversed(self._entries.items()):
+                    if other_key[:2] == key[:2] and other_bits.shape == bits.shape and \
+                            np.count_nonzero(other_bits != bits) <= self.max_distance:
+                        self._entries.move_to_end(other_key)
+                        self._stats["near_hits"] += 1
+                        return results
+            self._stats["misses"] += 1
+            return None
+
+    def put(self, fingerprint, results):
+        key, bits = fingerprint
+        with self._lock:
+            self._entries[key] = (bits, results)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+        lookups = stats["hits"] + stats["near_hits"] + stats["misses"]
+        stats["hit_rate"] = round((stats["hits"] + stats["near_hits"]) / lookups, 4) if lookups else 0.0
+        return stats
+
+class FormTemplate:
+    """Text regions of one page layout: pixel digest and recognized text per rect"""
+
+    def __init__(self, template_id, key, layout):
+        self.id = template_id
+        self.key = key
+        self.layout = layout
+        self.regions = {}  # region key -> (digest, text, confidence)
+
+    def reuse(self, grey, boxes):
+        """``{box index: (text, confidence)}`` for detected boxes whose rect and pixels are unchanged"""
+        reused = {}
+        for index, (_, _, rect) in enumerate(boxes):
+            key = region_key(rect)
+            region = self.regions.get(key)
+            if region is not None and region[0] == region_digest(grey, key):
+                reused[index] = region[1:]
+        return reused
+
+class TemplatePlan:
+    """Detected boxes of one page split into regions reused from a template and boxes to recognize"""
+
+    def __init__(self, cache, reader, grey, horizontal_list, free_list):
+        self.cache = cache
+        self.grey = grey
+        self.key = (reader_key(reader), grey.shape[:2])
+        self.layout = ink_bits(grey, TEMPLATE_HASH_WIDTH)
+        self.template = cache.match(self.key, self.layout)
+        # (free, box, rect) in the order EasyOCR returns results: horizontal boxes, then free boxes
+        self.boxes = [(False, box, (box[0], box[1], box[2], box[3])) for box in horizontal_list]
+        self.boxes += [(True, box, _rect(box)) for box in free_list]
+        self.reused = self.template.reuse(grey, self.boxes) if self.template else {}
+        self.horizontal_list = [box for index, (free, box, _) in enumerate(self.boxes)
+                                if not free and index not in self.reused]
+        self.free_list = [box for index, (free, box, _) in enumerate(self.boxes) if free and index not in self.reused]
+
+    def merge(self, recognized):
+        """Full page results in detection order; remembers this page as the layout's template"""
+        recognized = iter(recognized)
+        results = []
+        for index, (free, box, rect) in enumerate(self.boxes):
+            if index in self.reused:
+                text, confidence = self.reused[index]
+                corners = box if free else [[rect[0], rect[2]], [rect[1], rect[2]], [rect[1], rect[3]], [rect[0], rect[3]]]
+                results.append((corners, text, confidence))
+            else:
+                results.append(next(recognized))
+        self.cache.record(len(self.reused), len(self.boxes) - len(self.reused))
+        count("template_regions_reused", len(self.reused))
+        self.cache.store(self, results)
+        return results
+
+class TemplateCache:
+    """Bounded LRU of form layouts whose unchanged text regions are reused
+
+    A page matches a template when its coarse layout hash is within
+    ``max_distance``; a detected box is then taken from the template only when
+    the template has a region with the same rect and the same pixel digest, so
+    every field whose pixels changed at all is recognized again.
+    """
+
+    def __init__(self, max_entries=FORM_TEMPLATE_ENTRIES, max_distance=TEMPLATE_MAX_DISTANCE):
+        self.max_entries = max_entries
+        self.max_distance = max_distance
+        self._templates = OrderedDict()  # id -> FormTemplate
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self._stats = {"page_hits": 0, "page_misses": 0, "regions_reused": 0, "regions_recognized": 0,
+                       "evictions": 0}
+
+    def plan(self, reader, grey, horizontal_list, free_list):
+        return TemplatePlan(self, reader, grey, horizontal_list, free_list)
+
+    def match(self, key, layout):
+        """Closest template of the same reader and page size within max_distance, or None"""
+        with self._lock:
+            best, best_distance = None, self.max_distance
+            for template in self._templates.values():
+                if template.key != key or template.layout.shape != layout.shape:
+                    continue
+                distance = _distance(template.layout, layout)
+                if distance <= best_distance:
+                    best, best_distance = template, distance
+            self._stats["page_hits" if best else "page_misses"] += 1
+            return best
+
+    def store(self, plan, results):
+        """Replace the matched template's regions with this page's, or add a new template"""
+        regions = {}
+        for (_, _, rect), (_, text, confidence) in zip(plan.boxes, results):
+            key = region_key(rect)
+            digest = region_digest(plan.grey, key)
+            if digest is not None:
+                regions[key] = (digest, text, confidence)
+        with self._lock:
+            template = plan.template
+            if template is None or template.id not in self._templates:
+                self._next_id += 1
+                template = FormTemplate(self._next_id, plan.key, plan.layout)
+            template.regions = regions
+            self._templates[template.id] = template
+            self._templates.move_to_end(template.id)
+            while len(self._templates) > self.max_entries:
+                self._templates.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def record(self, reused, recognized):
+        with self._lock:
+            self._stats["regions_reused"] += reused
+            self._stats["regions_recognized"] += recognized
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["templates"] = len(self._templates)
+        pages = stats["page_hits"] + stats["page_misses"]
+        regions = stats["regions_reused"] + stats["regions_recognized"]
+        stats["page_hit_rate"] = round(stats["page_hits"] / pages, 4) if pages else 0.0
+        stats["region_hit_rate"] = round(stats["regions_reused"] / regions, 4) if regions else 0.0
+        return stats
+
+page_cache = PageCache() if PAGE_DEDUPE else None
+template_cache = TemplateCache() if FORM_TEMPLATES else None
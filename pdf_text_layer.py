@@ -0,0 +1,92 @@
+import os
+import logging
+import xml.etree.ElementTree as ET
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Text layer settings
+TEXT_LAYER = os.environ.get("OCR_TEXT_LAYER", "1") == "1"  # Use embedded PDF text instead of OCR where usable
+TEXT_LAYER_MIN_CHARS = int(os.environ.get("OCR_TEXT_LAYER_MIN_CHARS", "20"))  # Fewer characters: OCR the page
+TEXT_LAYER_MIN_ALNUM_RATIO = 0.5  # Below this share of letters/digits the layer is likely garbled (missing ToUnicode)
+TEXT_LAYER_MIN_IMAGE_PIXELS = 64 * 64  # Smaller images (bullets, rules, icons) cannot hold readable text
+
+def _local_name(element):
+    return element.tag.rsplit('}', 1)[-1]
+
+def _line_block(line, scale):
+    """Response block for one text layer line, coordinates scaled from points to pixels"""
+    words = [word.text for word in line.iter() if _local_name(word) == 'word' and word.text]
+    x_min, y_min, x_max, y_max = (round(float(line.get(name)) * scale, 2)
+                                  for name in ('xMin', 'yMin', 'xMax', 'yMax'))
+    return {
+        "text": " ".join(words).strip(),
+        "confidence": 1.0,
+        "position": {
+            "top_left": [x_min, y_min],
+            "top_right": [x_max, y_min],
+            "bottom_right": [x_max, y_max],
+            "bottom_left": [x_min, y_max]
+        }
+    }
+
+def is_usable(blocks, min_chars=TEXT_LAYER_MIN_CHARS):
+    """Whether a page's text layer has enough readable text to replace OCR"""
+    text = "".join(block["text"] for block in blocks).replace(" ", "")
+    if len(text) < min_chars:
+        return False
+    alnum = sum(1 for char in text if char.isalnum())
+    return alnum / len(text) >= TEXT_LAYER_MIN_ALNUM_RATIO
+
+def parse_bbox_layout(xhtml, first_page, dpi, max_size):
+    """Turn ``pdftotext -bbox-layout`` output into page results for pages with a usable text layer
+
+    Returns ``{page_number: page result}``. Lines become blocks with confidence
+    1.0, in the pixel space the page would have been OCRed in (``dpi``, shrunk
+    to fit ``max_size``), so both paths report comparable coordinates.
+    """
+    try:
+        root = ET.fromstring(xhtml)
+    except ET.ParseError as e:
+        logger.warning(f"Unreadable PDF text layer, falling back to OCR: {e}")
+        return {}
+
+    pages = {}
+    page_elements = [element for element in root.iter() if _local_name(element) == 'page']
+    for offset, page in enumerate(page_elements):
+        width, height = float(page.get('width')), float(page.get('height'))
+        scale = min(dpi / 72, max_size[0] / width, max_size[1] / height)
+        blocks = [_line_block(line, scale) for line in page.iter() if _local_name(line) == 'line']
+        blocks = [block for block in blocks if block["text"]]
+        if not is_usable(blocks):
+            continue
+        page_number = first_page + offset
+        pages[page_number] = {
+            "page_number": page_number,
+            "page_size": {"width": int(width * scale), "height": int(height * scale)},
+            "path": "text_layer",
+            "blocks": blocks
+        }
+    return pages
+
+def parse_image_list(output, min_pixels=TEXT_LAYER_MIN_IMAGE_PIXELS):
+    """Page numbers that draw an image, from ``pdfimages -list`` output
+
+    Soft masks only shape the image they belong to and are not counted; images
+    smaller than ``min_pixels`` are ignored. Text inside images is not in the
+    text layer, so these pages still need OCR.
+    """
+    if isinstance(output, bytes):
+        output = output.decode('utf8', 'ignore')
+    pages = set()
+    for line in output.splitlines()[2:]:
+        fields = line.split()
+        if len(fields) < 5 or fields[2] == 'smask':
+            continue
+        try:
+            page, width, height = int(fields[0]), int(fields[3]), int(fields[4])
+        except ValueError:
+            continue
+        if width * height >= min_pixels:
+            pages.add(page)
+    return pages
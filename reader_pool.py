@@ -0,0 +1,173 @@
+import gc
+import os
+import threading
+import time
+import logging
+from collections import OrderedDict
+from metrics import stage, count
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+def parse_language_sets(value):
+    """Parse "en;en,hi" into [['en'], ['en', 'hi']]"""
+    language_sets = []
+    for group in value.split(";"):
+        languages = [lang.strip() for lang in group.split(",") if lang.strip()]
+        if languages:
+            language_sets.append(languages)
+    return language_sets
+
+# Reader pool settings
+MAX_READERS = int(os.environ.get("OCR_MAX_READERS", "3"))  # Limit number of cached readers
+READER_MEMORY_MB = int(os.environ.get("OCR_READER_MEMORY_MB", "1536"))  # Budget for loaded model weights
+SUPERSET_REUSE = os.environ.get("OCR_READER_SUPERSET_REUSE", "1") == "1"
+# Language sets that are preloaded and never evicted ("en;en,hi" pins two readers)
+PINNED_LANGUAGES = parse_language_sets(os.environ.get("OCR_LANGUAGES", "en"))
+
+def _tensor_bytes(value):
+    """Bytes held by a tensor, or by the tensors nested in a tuple/list (packed quantized params)"""
+    if isinstance(value, (tuple, list)):
+        return sum(_tensor_bytes(item) for item in value)
+    try:
+        return value.element_size() * value.nelement()
+    except Exception:
+        return 0
+
+def model_memory_bytes(reader):
+    """Resident size of a reader's detector and recognizer weights"""
+    total = 0
+    for name in ("detector", "recognizer"):
+        model = getattr(reader, name, None)
+        if hasattr(model, "model_bytes"):
+            # ONNX Runtime session (onnx_backend.OnnxModel): size of the exported model
+            total += model.model_bytes
+            continue
+        if model is None or not hasattr(model, "state_dict"):
+            continue
+        total += sum(_tensor_bytes(value) for value in model.state_dict().values())
+    return total
+
+class ReaderPool:
+    """Thread-safe LRU pool of OCR readers keyed by language set
+
+    Readers are evicted least-recently-used first when either the reader count
+    or the model memory budget is exceeded; pinned language sets are never
+    evicted. A loaded reader whose languages are a superset of the request
+    (e.g. ['en', 'hi'] for ['en']) is reused instead of loading a new model.
+    Concurrent requests for the same languages share a single load.
+    """
+
+    def __init__(self, factory, max_readers=MAX_READERS, memory_bytes=READER_MEMORY_MB * 1024 * 1024,
+                 pinned=None, superset_reuse=SUPERSET_REUSE):
+        self.factory = factory
+        self.max_readers = max_readers
+        self.memory_bytes = memory_bytes
+        self.pinned = {tuple(sorted(languages)) for languages in (pinned or [])}
+        self.superset_reuse = superset_reuse
+        self._readers = OrderedDict()  # key -> (reader, model bytes)
+        self._loading = {}  # key -> threading.Event for loads in progress
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "superset_hits": 0, "loads": 0, "load_failures": 0,
+                       "evictions": 0, "load_seconds": 0.0}
+
+    def _lookup(self, key):
+        """Find a loaded reader for key (exact or superset); caller holds the lock"""
+        entry = self._readers.get(key)
+        if entry is not None:
+            self._readers.move_to_end(key)
+            self._stats["hits"] += 1
+            count("reader_hits")
+            return entry[0]
+        if self.superset_reuse:
+            supersets = [loaded for loaded in self._readers if set(key) < set(loaded)]
+            if supersets:
+                loaded = min(supersets, key=len)
+                self._readers.move_to_end(loaded)
+                self._stats["superset_hits"] += 1
+                count("reader_superset_hits")
+                logger.debug(f"Serving {list(key)} with loaded reader for {list(loaded)}")
+                return self._readers[loaded][0]
+        return None
+
+    def get(self, languages):
+        """Return a reader for the languages, loading it if needed"""
+        key = tuple(sorted(languages))
+        while True:
+            with self._lock:
+                reader = self._lookup(key)
+                if reader is not None:
+                    return reader
+                event = self._loading.get(key)
+                if event is None:
+                    # This thread loads the reader; others wait for it
+                    event = self._loading[key] = threading.Event()
+                    break
+            event.wait()
+
+        try:
+            logger.info(f"Creating new EasyOCR reader for languages: {list(languages)}")
+            start = time.time()
+            try:
+                with stage("reader_load"):
+                    reader = self.factory(list(languages))
+                count("reader_loads")
+            except Exception:
+                with self._lock:
+                    self._stats["load_failures"] += 1
+                raise
+            elapsed = time.time() - start
+            size = model_memory_bytes(reader)
+            logger.info(f"Successfully created reader for {list(languages)} in {elapsed:.2f}s "
+                        f"({size / (1024*1024):.1f} MB)")
+            self.add(languages, reader, size=size, load_seconds=elapsed)
+            return reader
+        finally:
+            with self._lock:
+                self._loading.pop(key).set()
+
+    def add(self, languages, reader, size=None, load_seconds=0.0):
+        """Register an already constructed reader"""
+        key = tuple(sorted(languages))
+        if size is None:
+            size = model_memory_bytes(reader)
+        with self._lock:
+            self._readers[key] = (reader, size)
+            self._readers.move_to_end(key)
+            self._stats["loads"] += 1
+            self._stats["load_seconds"] += load_seconds
+            evicted = self._evict(keep=key)
+        if evicted:
+            gc.collect()
+
+    def _evict(self, keep):
+        """Drop LRU unpinned readers until count and memory fit; caller holds the lock"""
+        evicted = 0
+        for key in list(self._readers):
+            total = sum(size for _, size in self._readers.values())
+            if len(self._readers) <= self.max_readers and total <= self.memory_bytes:
+                break
+            if key == keep or key in self.pinned:
+                continue
+            _, size = self._readers.pop(key)
+            self._stats["evictions"] += 1
+            evicted += 1
+            logger.info(f"Evicted reader for {list(key)} ({size / (1024*1024):.1f} MB)")
+        return evicted
+
+    def loaded(self):
+        with self._lock:
+            return [list(key) for key in self._readers]
+
+    def clear(self):
+        with self._lock:
+            self._readers.clear()
+        gc.collect()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["readers"] = len(self._readers)
+            stats["model_bytes"] = sum(size for _, size in self._readers.values())
+        stats["load_seconds"] = round(stats["load_seconds"], 2)
+        return stats
@@ -0,0 +1,194 @@
+import json
+
+# Region-of-interest settings
+MAX_REGIONS = 32  # Regions accepted per request
+UNITS = ("relative", "absolute")  # Page fractions (0-1), or image pixels / PDF points
+
+# Detection / recognition mode settings
+MODES = ("read", "detect", "recognize")  # Full OCR, text boxes only, text of caller-supplied boxes
+MAX_BOXES = 4096  # Boxes accepted per recognize request
+CORNERS = ("top_left", "top_right", "bottom_right", "bottom_left")
+
+class RegionError(Exception):
+    """Raised for malformed region specifications"""
+
+def parse_regions(spec):
+    """Validate regions given as JSON text or a list of dicts
+
+    Each region has ``x``, ``y``, ``width`` and ``height``, an optional
+    ``page`` (1-based; every page when omitted) and optional ``units``:
+    ``relative`` (fractions of the page, the default) or ``absolute`` (pixels
+    of the uploaded image, points of a PDF page). Returns None for no regions.
+    """
+    if spec is None or spec == "":
+        return None
+    if isinstance(spec, (str, bytes)):
+        try:
+            spec = json.loads(spec)
+        except json.JSONDecodeError as e:
+            raise RegionError(f"regions is not valid JSON: {e}")
+    if isinstance(spec, dict):
+        spec = [spec]
+    if not isinstance(spec, list) or not spec:
+        raise RegionError("regions must be a non-empty list of {x, y, width, height} objects")
+    if len(spec) > MAX_REGIONS:
+        raise RegionError(f"At most {MAX_REGIONS} regions are allowed, got {len(spec)}")
+
+    regions = []
+    for index, region in enumerate(spec):
+        if not isinstance(region, dict):
+            raise RegionError(f"Region {index} is not an object")
+        try:
+            parsed = {key: float(region[key]) for key in ("x", "y", "width", "height")}
+        except KeyError as e:
+            raise RegionError(f"Region {index} is missing {e.args[0]}")
+        except (TypeError, ValueError):
+            raise RegionError(f"Region {index} has a non-numeric coordinate")
+        parsed["units"] = region.get("units", "relative")
+        if parsed["units"] not in UNITS:
+            raise RegionError(f"Region {index} has unknown units {parsed['units']!r} (use {' or '.join(UNITS)})")
+        if parsed["width"] <= 0 or parsed["height"] <= 0:
+            raise RegionError(f"Region {index} has no area")
+        page = region.get("page")
+        if page is not None and (not isinstance(page, int) or isinstance(page, bool) or page < 1):
+            raise RegionError(f"Region {index} has an invalid page {page!r}")
+        parsed["page"] = page
+        regions.append(parsed)
+    return regions
+
+def parse_boxes(spec):
+    """Validate text boxes for ``mode=recognize``, given as JSON text or a list of dicts
+
+    Each box has the ``position`` of a response block (``top_left``,
+    ``top_right``, ``bottom_right`` and ``bottom_left`` points in the pixels of
+    the page's ``page_size``) and an optional ``page`` (1-based, default 1). A
+    ``mode=detect`` response (an object with ``pages``) is accepted as is.
+    Returns ``[{"page", "corners"}]``, or None for no boxes.
+    """
+    if spec is None or spec == "":
+        return None
+    if isinstance(spec, (str, bytes)):
+        try:
+            spec = json.loads(spec)
+        except json.JSONDecodeError as e:
+            raise RegionError(f"boxes is not valid JSON: {e}")
+    if isinstance(spec, dict) and isinstance(spec.get("pages"), list):
+        spec = [{**block, "page": page.get("page_number", 1)} for page in spec["pages"]
+                for block in page.get("blocks", [])]
+    if not isinstance(spec, list) or not spec:
+        raise RegionError("boxes must be a non-empty list of {page, position} objects")
+    if len(spec) > MAX_BOXES:
+        raise RegionError(f"At most {MAX_BOXES} boxes are allowed, got {len(spec)}")
+
+    boxes = []
+    for index, box in enumerate(spec):
+        position = box.get("position") if isinstance(box, dict) else None
+        if not isinstance(position, dict):
+            raise RegionError(f"Box {index} has no position object")
+        try:
+            corners = [[float(position[corner][0]), float(position[corner][1])] for corner in CORNERS]
+        except KeyError as e:
+            raise RegionError(f"Box {index} is missing {e.args[0]}")
+        except (TypeError, ValueError, IndexError):
+            raise RegionError(f"Box {index} has a corner that is not an [x, y] pair")
+        page = box.get("page", 1)
+        if not isinstance(page, int) or isinstance(page, bool) or page < 1:
+            raise RegionError(f"Box {index} has an invalid page {page!r}")
+        boxes.append({"page": page, "corners": corners})
+    return boxes
+
+def parse_mode(mode, regions=None, boxes=None):
+    """Validated processing mode (``read`` when not given) for the regions and boxes of a request"""
+    mode = mode or "read"
+    if mode not in MODES:
+        raise RegionError(f"Unknown mode {mode!r} (use {', '.join(MODES)})")
+    if mode != "read" and regions:
+        raise RegionError(f"regions cannot be combined with mode={mode}")
+    if (mode == "recognize") != bool(boxes):
+        raise RegionError("boxes are required with mode=recognize, and only allowed with it")
+    return mode
+
+def boxes_for_page(boxes, page_number):
+    return [box["corners"] for box in boxes if box["page"] == page_number]
+
+def regions_for_page(regions, page_number):
+    return [region for region in regions if region["page"] in (None, page_number)]
+
+def fitted_size(width, height, max_size):
+    """Pixel size of a width x height page after the downscale to max_size that OCR applies"""
+    scale = min(1.0, max_size[0] / width, max_size[1] / height)
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+class PageFrame:
+    """Coordinate systems of one page for region OCR
+
+    Regions are given in native units (image pixels or PDF points) or as page
+    fractions. Crops are rendered at ``render_scale`` pixels per native unit,
+    and blocks are reported in the page space full-page OCR uses: the page
+    rendered at the same scale, then fitted to ``max_size``.
+    """
+
+    def __init__(self, native_width, native_height, render_scale, max_size):
+        self.native_width = native_width
+        self.native_height = native_height
+        self.render_scale = render_scale
+        self.page_width, self.page_height = fitted_size(native_width * render_scale,
+                                                        native_height * render_scale, max_size)
+        # Page pixels per rendered pixel
+        self.scale_x = self.page_width / (native_width * render_scale)
+        self.scale_y = self.page_height / (native_height * render_scale)
+
+    def native_rect(self, region):
+        """``(x0, y0, x1, y1)`` of a region in native units, clipped to the page, or None when outside it"""
+        x, y, width, height = region["x"], region["y"], region["width"], region["height"]
+        if region["units"] == "relative":
+            x, width = x * self.native_width, width * self.native_width
+            y, height = y * self.native_height, height * self.native_height
+        x0, y0 = max(0.0, x), max(0.0, y)
+        x1, y1 = min(self.native_width, x + width), min(self.native_height, y + height)
+        if x1 - x0 < 1 or y1 - y0 < 1:
+            return None
+        return x0, y0, x1, y1
+
+    def render_box(self, rect):
+        """Integer pixel box ``(left, top, right, bottom)`` of a native rect at the render scale"""
+        x0, y0, x1, y1 = (value * self.render_scale for value in rect)
+        return int(x0), int(y0), max(int(x0) + 1, round(x1)), max(int(y0) + 1, round(y1))
+
+    def page_rect(self, box):
+        """A rendered pixel box in page space, as a response dict"""
+        left, top, right, bottom = box
+        return {
+            "x": round(left * self.scale_x, 2),
+            "y": round(top * self.scale_y, 2),
+            "width": round((right - left) * self.scale_x, 2),
+            "height": round((bottom - top) * self.scale_y, 2)
+        }
+
+    def map_results(self, results, box, crop_array):
+        """EasyOCR results on a crop (possibly downscaled to ``crop_array``) moved into page space"""
+        left, top, right, bottom = box
+        crop_height, crop_width = crop_array.shape[:2]
+        # Rendered pixels per crop array pixel
+        step_x = (right - left) / crop_width
+        step_y = (bottom - top) / crop_height
+        return [([[(left + point[0] * step_x) * self.scale_x, (top + point[1] * step_y) * self.scale_y]
+                  for point in corners], text, confidence)
+                for corners, text, confidence in results]
+
+def contains_block(rect, block):
+    """Whether a block's centre lies inside a page space rect (as returned by ``PageFrame.page_rect``)"""
+    corners = list(block["position"].values())
+    x = sum(corner[0] for corner in corners) / len(corners)
+    y = sum(corner[1] for corner in corners) / len(corners)
+    return rect["x"] <= x <= rect["x"] + rect["width"] and rect["y"] <= y <= rect["y"] + rect["height"]
+
+def area_share(regions, page_number, native_width, native_height):
+    """Share of a page's area the regions on it cover (capped at 1), for cost estimates"""
+    frame = PageFrame(native_width, native_height, 1.0, (native_width, native_height))
+    area = 0.0
+    for region in regions_for_page(regions, page_number):
+        rect = frame.native_rect(region)
+        if rect:
+            area += (rect[2] - rect[0]) * (rect[3] - rect[1])
+    return min(1.0, area / (native_width * native_height))
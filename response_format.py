@@ -0,0 +1,50 @@
+import json
+import logging
+from ocr_to_pii_request import ocr_to_pii_request, file_type_for
+
+try:
+    import orjson  # Optional, several times faster than the standard library encoder
+except ImportError:
+    orjson = None
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+OUTPUT_FORMATS = ("blocks", "columnar", "pii")
+CORNERS = ("top_left", "top_right", "bottom_right", "bottom_left")
+
+def dumps(payload):
+    """Serialize a response payload to compact JSON bytes, with orjson when installed"""
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, separators=(",", ":")).encode()
+
+def columnar_page(page):
+    """Turn a page's list of block dicts into parallel arrays
+
+    ``boxes`` holds one ``[x1, y1, x2, y2, x3, y3, x4, y4]`` row per block, with
+    corners in the order top_left, top_right, bottom_right, bottom_left.
+    """
+    blocks = page.get("blocks", [])
+    columnar = {key: value for key, value in page.items() if key != "blocks"}
+    if page.get("path") != "detect":
+        # Detect mode blocks only have a position
+        columnar["texts"] = [block["text"] for block in blocks]
+        columnar["confidences"] = [block["confidence"] for block in blocks]
+    columnar["boxes"] = [[coordinate for corner in CORNERS for coordinate in block["position"][corner]]
+                         for block in blocks]
+    return columnar
+
+def format_result(result, output_format, document_id=None, filename=None, languages=None):
+    """Return the result with its pages in the requested output format
+
+    The ``pii`` format converts the whole result into a PII service request;
+    ``languages`` default to the result's ``processing_info.languages_used``.
+    """
+    if "pages" not in result:
+        return result
+    if output_format == "columnar":
+        return {**result, "pages": [columnar_page(page) for page in result["pages"]]}
+    if output_format == "pii":
+        return ocr_to_pii_request(result, document_id or filename or "document", file_type_for(filename), languages)
+    return result
@@ -0,0 +1,158 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import logging
+from collections import OrderedDict
+
+import numpy as np
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Cache settings
+CACHE_ENABLED = os.environ.get("OCR_CACHE_ENABLED", "1") == "1"
+CACHE_TTL_SECONDS = int(os.environ.get("OCR_CACHE_TTL_SECONDS", "3600"))
+CACHE_MEMORY_MB = int(os.environ.get("OCR_CACHE_MEMORY_MB", "64"))  # In-memory LRU tier budget
+CACHE_DB_PATH = os.environ.get("OCR_CACHE_DB", "")  # SQLite file for the disk tier (empty disables it)
+CACHE_DISK_MB = int(os.environ.get("OCR_CACHE_DISK_MB", "512"))  # Disk tier budget
+
+def cache_key(source, languages, **settings):
+    """Content hash of the document plus every setting that changes the result
+
+    Returns None for sources that cannot be hashed cheaply (e.g. PIL images).
+    """
+    digest = hashlib.sha256()
+    if isinstance(source, (bytes, bytearray)):
+        digest.update(source)
+    elif isinstance(source, np.ndarray):
+        digest.update(f"{source.shape}{source.dtype}".encode())
+        digest.update(np.ascontiguousarray(source).tobytes())
+    else:
+        return None
+    digest.update(json.dumps({"languages": sorted(languages), **settings}, sort_keys=True).encode())
+    return digest.hexdigest()
+
+class ResultCache:
+    """Two-tier OCR result cache: a bounded in-memory LRU and an optional SQLite file
+
+    Values are stored as serialized JSON, so every hit returns a fresh copy and
+    entry sizes are known for size-based eviction.
+    """
+
+    def __init__(self, memory_bytes, ttl_seconds, db_path=None, disk_bytes=0):
+        self.memory_bytes = memory_bytes
+        self.ttl_seconds = ttl_seconds
+        self.db_path = db_path
+        self.disk_bytes = disk_bytes
+        self._memory = OrderedDict()  # key -> (created, payload)
+        self._memory_size = 0
+        self._lock = threading.Lock()
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0}
+        self._db = None
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute("CREATE TABLE IF NOT EXISTS results ("
+                             "key TEXT PRIMARY KEY, payload BLOB, size INTEGER, "
+                             "created REAL, accessed REAL)")
+            self._db.execute("CREATE INDEX IF NOT EXISTS results_accessed ON results (accessed)")
+            self._db.commit()
+
+    def _expired(self, created, now):
+        return self.ttl_seconds > 0 and now - created > self.ttl_seconds
+
+    def _put_memory(self, key, created, payload):
+        if len(payload) > self.memory_bytes:
+            return
+        if key in self._memory:
+            self._memory_size -= len(self._memory.pop(key)[1])
+        self._memory[key] = (created, payload)
+        self._memory_size += len(payload)
+        while self._memory_size > self.memory_bytes:
+            _, (_, evicted) = self._memory.popitem(last=False)
+            self._memory_size -= len(evicted)
+            self._stats["evictions"] += 1
+
+    def get(self, key):
+        """Return ``(result, tier)`` for a cached key, or ``(None, None)``"""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                created, payload = entry
+                if not self._expired(created, now):
+                    self._memory.move_to_end(key)
+                    self._stats["memory_hits"] += 1
+                    return json.loads(payload), "memory"
+                self._memory_size -= len(self._memory.pop(key)[1])
+
+            if self._db is not None:
+                row = self._db.execute("SELECT payload, created FROM results WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    payload, created = row
+                    if not self._expired(created, now):
+                        self._db.execute("UPDATE results SET accessed = ? WHERE key = ?", (now, key))
+                        self._db.commit()
+                        self._put_memory(key, created, payload)
+                        self._stats["disk_hits"] += 1
+                        return json.loads(payload), "disk"
+                    self._db.execute("DELETE FROM results WHERE key = ?", (key,))
+                    self._db.commit()
+
+            self._stats["misses"] += 1
+            return None, None
+
+    def put(self, key, result):
+        payload = json.dumps(result).encode()
+        now = time.time()
+        with self._lock:
+            self._put_memory(key, now, payload)
+            if self._db is not None and len(payload) <= self.disk_bytes:
+                self._db.execute("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?)",
+                                 (key, payload, len(payload), now, now))
+                self._evict_disk(now)
+                self._db.commit()
+
+    def _evict_disk(self, now):
+        if self.ttl_seconds > 0:
+            self._db.execute("DELETE FROM results WHERE created < ?", (now - self.ttl_seconds,))
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+        while total > self.disk_bytes:
+            key, size = self._db.execute("SELECT key, size FROM results ORDER BY accessed LIMIT 1").fetchone()
+            self._db.execute("DELETE FROM results WHERE key = ?", (key,))
+            total -= size
+            self._stats["evictions"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._memory_size = 0
+            if self._db is not None:
+                self._db.execute("DELETE FROM results")
+                self._db.commit()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["memory_entries"] = len(self._memory)
+            stats["memory_bytes"] = self._memory_size
+        stats["hits"] = stats["memory_hits"] + stats["disk_hits"]
+        return stats
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_cache():
+    """Return the process-wide result cache, or None when caching is disabled"""
+    global _cache
+    if not CACHE_ENABLED:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResultCache(CACHE_MEMORY_MB * 1024 * 1024, CACHE_TTL_SECONDS,
+                                 db_path=CACHE_DB_PATH or None, disk_bytes=CACHE_DISK_MB * 1024 * 1024)
+            logger.info(f"Result cache enabled: {CACHE_MEMORY_MB} MB memory, "
+                        f"disk tier {CACHE_DB_PATH or 'disabled'}, TTL {CACHE_TTL_SECONDS}s")
+        return _cache
@@ -9,11 +9,10 @@ echo "Port: ${PORT:-5000}"
 
 # Start the application with Gunicorn
 exec gunicorn \
+    --config gunicorn.conf.py \
     --bind 0.0.0.0:${PORT:-5000} \
     --workers 1 \
     --timeout 120 \
-    --max-requests 1000 \
-    --max-requests-jitter 100 \
     --preload \
     --log-level info \
     --access-logfile - \
@@ -0,0 +1,150 @@
+import os
+import threading
+import time
+import logging
+
+import numpy as np
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Startup settings
+PRELOAD = os.environ.get("OCR_PRELOAD", "1") == "1"  # Load the OCR_LANGUAGES readers at startup
+WARMUP = os.environ.get("OCR_WARMUP", "1") == "1"  # Run a dummy image through each preloaded reader
+STARTED_AT = time.time()  # Import of this module, the first thing app.py does
+
+class StartupState:
+    """Startup progress of this process: phase durations and readiness
+
+    The gunicorn master loads the readers and warms them up before forking
+    (``preload``), so workers share the weights copy-on-write; each worker then
+    runs its own warm-up in the background (``start``) and reports ready once
+    it is done.
+    """
+
+    def __init__(self):
+        self.status = "starting"
+        self.preloaded = False  # Readers were loaded (and warmed up) before this worker was forked
+        self.phases = {}
+        self.error = None
+        self.ready_at = None
+        self.first_request_at = None
+        self.process_started_at = STARTED_AT  # Fork time in gunicorn workers
+        self._origin_pid = os.getpid()
+        self._started_pid = None
+        self._lock = threading.Lock()
+
+    def record(self, phase, seconds):
+        self.phases[phase] = round(self.phases.get(phase, 0.0) + seconds, 3)
+        logger.info(f"Startup phase {phase}: {seconds:.2f}s")
+
+    def _load_readers(self):
+        """Readers of the configured language sets (already loaded when inherited from the master)"""
+        from ocr_processor import get_or_create_reader
+        from reader_pool import PINNED_LANGUAGES
+
+        start = time.time()
+        readers = [get_or_create_reader(languages) for languages in PINNED_LANGUAGES]
+        if not self.preloaded:
+            self.record("model_load", time.time() - start)
+        return readers
+
+    def _warm_up(self, readers, phase="warmup"):
+        """Run a small synthetic page through every reader to allocate buffers and page in the weights"""
+        from ocr_engine import readtext_page
+
+        image = np.full((96, 480, 3), 255, dtype=np.uint8)
+        for row in (20, 56):
+            # Dark bars of glyph height, so detection yields boxes and recognition runs
+            for column in range(24, 440, 36):
+                image[row:row + 20, column:column + 24] = 0
+        start = time.time()
+        for reader in readers:
+            readtext_page(reader, image)
+        self.record(phase, time.time() - start)
+
+    def _freeze(self):
+        """Keep the loaded models out of later garbage collections (see ``memory_governor``)"""
+        from memory_governor import memory_governor
+
+        start = time.time()
+        memory_governor.freeze()
+        self.record("gc_freeze", time.time() - start)
+
+    def preload(self):
+        """Load and warm up readers in the current (master) process before workers are forked
+
+        Warm-up runs with one torch thread so the master never starts an OpenMP
+        thread pool, which forked children could not use.
+        """
+        if not PRELOAD:
+            return
+        try:
+            readers = self._load_readers()
+            if WARMUP:
+                import torch
+                threads = torch.get_num_threads()
+                torch.set_num_threads(1)
+                try:
+                    self._warm_up(readers, phase="preload_warmup")
+                finally:
+                    torch.set_num_threads(threads)
+            self._freeze()
+            self.preloaded = True
+        except Exception as e:
+            logger.error(f"Reader preload failed: {e}", exc_info=True)
+            self.error = str(e)
+
+    def _run(self):
+        try:
+            if PRELOAD:
+                readers = self._load_readers()
+                if WARMUP:
+                    self._warm_up(readers)
+            self._freeze()
+            self.status = "ready"
+            self.ready_at = time.time()
+            logger.info(f"Ready {self.ready_at - self.process_started_at:.2f}s after process start")
+        except Exception as e:
+            logger.error(f"Startup failed: {e}", exc_info=True)
+            self.error = str(e)
+            self.status = "failed"
+
+    def start(self, background=True):
+        """Load (if not inherited) and warm up the readers of this process, once per pid"""
+        with self._lock:
+            if self._started_pid == os.getpid():
+                return
+            self._started_pid = os.getpid()
+            if self._started_pid != self._origin_pid:
+                self.process_started_at = time.time()
+            self.status = "warming_up"
+        if background:
+            threading.Thread(target=self._run, name="ocr-startup", daemon=True).start()
+        else:
+            self._run()
+
+    def is_ready(self):
+        return self.status == "ready"
+
+    def request_served(self):
+        if self.first_request_at is None:
+            self.first_request_at = time.time()
+            logger.info(f"First request served {self.first_request_at - self.process_started_at:.2f}s "
+                        f"after process start")
+
+    def to_dict(self):
+        state = {
+            "status": self.status,
+            "phases_seconds": dict(self.phases),
+            "uptime_seconds": round(time.time() - self.process_started_at, 2)
+        }
+        if self.ready_at:
+            state["start_to_ready_seconds"] = round(self.ready_at - self.process_started_at, 2)
+        if self.first_request_at:
+            state["start_to_first_request_seconds"] = round(self.first_request_at - self.process_started_at, 2)
+        if self.error:
+            state["error"] = self.error
+        return state
+
+startup_state = StartupState()
@@ -0,0 +1,142 @@
+"""Admission control: lanes, deadlines, Retry-After, and the endpoints that go through it"""
+import io
+import threading
+import time
+import pytest
+from PIL import Image, ImageDraw
+from admission import AdmissionController, AdmissionRejected
+from benchmark import StubReader, load_font
+
+def controller(**settings):
+    return AdmissionController(**{"max_concurrent": 2, "budget": 8, "queue_size": 4, "interactive_cost": 2.5,
+                                  "bulk_share": 0.5, "seconds_per_cost": 1.0, **settings})
+
+def test_lanes_keep_a_slot_for_interactive_requests():
+    admission = controller()
+    bulk = admission.acquire(6)
+    assert bulk.lane == "bulk"
+    # Bulk may hold one of the two slots; an interactive request still starts right away
+    interactive = admission.acquire(1, deadline_seconds=0.1)
+    assert interactive.lane == "interactive"
+    admission.release(interactive)
+    admission.release(bulk)
+    assert admission.stats()["admitted"] == 2
+
+def test_waiting_interactive_requests_start_before_bulk():
+    admission = controller(max_concurrent=1, bulk_share=1.0)
+    running = admission.acquire(1)
+    started = []
+
+    def wait_for_slot(cost, name):
+        ticket = admission.acquire(cost, deadline_seconds=30)
+        started.append(name)
+        admission.release(ticket)
+
+    bulk = threading.Thread(target=wait_for_slot, args=(6, "bulk"))
+    bulk.start()
+    time.sleep(0.05)
+    interactive = threading.Thread(target=wait_for_slot, args=(1, "interactive"))
+    interactive.start()
+    time.sleep(0.05)
+    admission.release(running)
+    bulk.join(5)
+    interactive.join(5)
+    assert started == ["interactive", "bulk"]
+
+def test_requests_that_would_miss_their_deadline_are_rejected_with_retry_after():
+    admission = controller()
+    bulk = admission.acquire(10)
+    with pytest.raises(AdmissionRejected) as rejected:
+        admission.acquire(4, deadline_seconds=5)
+    assert rejected.value.reason == "deadline"
+    # Drain time of the running work: 10 megapixels at 1 s/megapixel over 2 slots
+    assert rejected.value.retry_after == 5
+    admission.release(bulk)
+
+def test_waiting_requests_expire_at_their_deadline():
+    admission = controller(max_concurrent=1, seconds_per_cost=0.001)
+    running = admission.acquire(1)
+    with pytest.raises(AdmissionRejected) as rejected:
+        admission.acquire(1, deadline_seconds=0.1)
+    assert rejected.value.reason == "expired"
+    assert admission.stats()["interactive_waiting"] == 0
+    admission.release(running)
+
+def test_background_work_waits_instead_of_being_rejected():
+    admission = controller()
+    bulk = admission.acquire(10)
+    # A request with a deadline would be turned away here (see above)
+    with pytest.raises(AdmissionRejected):
+        admission.acquire(10, deadline_seconds=5, lane="bulk")
+    tickets = []
+    worker = threading.Thread(target=lambda: tickets.append(admission.acquire(10, None, lane="bulk")))
+    worker.start()
+    time.sleep(0.1)
+    assert not tickets and admission.stats()["bulk_waiting"] == 1
+    admission.release(bulk)
+    worker.join(5)
+    assert tickets and tickets[0].lane == "bulk"
+    admission.release(tickets[0])
+
+def png(text="Invoice 1001"):
+    image = Image.new("RGB", (400, 80), color="white")
+    ImageDraw.Draw(image).text((10, 20), text, fill="black", font=load_font(24))
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+@pytest.fixture
+def busy_bulk_lane(monkeypatch):
+    """App and job worker share a controller whose only bulk slot is taken"""
+    import app
+    import jobs
+    from ocr_processor import reader_pool
+    reader_pool.add(['en'], StubReader(), size=0)
+    admission = controller()
+    monkeypatch.setattr(app, "admission_controller", admission)
+    monkeypatch.setattr(jobs, "admission_controller", admission)
+    monkeypatch.setattr(app, "ADMISSION", True)
+    monkeypatch.setattr(jobs, "ADMISSION", True)
+    ticket = admission.acquire(10)
+    yield admission, ticket
+    if admission.stats()["bulk_running"]:
+        admission.release(ticket)
+
+def test_batch_and_stream_use_the_bulk_lane(busy_bulk_lane):
+    from app import app
+    admission, ticket = busy_bulk_lane
+    client = app.test_client()
+    headers = {"X-Request-Deadline": "1"}
+    for url, field in (("/ocr/batch", "files"), ("/ocr/stream", "file")):
+        response = client.post(url, data={field: (io.BytesIO(png()), "a.png")}, headers=headers,
+                               content_type="multipart/form-data")
+        assert response.status_code == 503, url
+        assert int(response.headers["Retry-After"]) >= 1
+    # Small enough for the interactive lane, so /ocr itself still runs
+    assert client.post("/ocr", data={"file": (io.BytesIO(png()), "a.png")}, headers=headers,
+                       content_type="multipart/form-data").status_code == 200
+
+    admission.release(ticket)
+    response = client.post("/ocr/stream", data={"file": (io.BytesIO(png()), "a.png")},
+                           content_type="multipart/form-data")
+    assert response.status_code == 200
+    response.get_data()
+    response.close()
+    assert admission.stats()["bulk_running"] == 0
+
+def test_jobs_wait_for_a_bulk_slot(busy_bulk_lane):
+    from app import app
+    admission, ticket = busy_bulk_lane
+    client = app.test_client()
+    status_url = client.post("/jobs", data={"file": (io.BytesIO(png("Job 7")), "a.png")},
+                             content_type="multipart/form-data").get_json()["status_url"]
+    time.sleep(0.2)
+    assert client.get(status_url).get_json()["status"] == "queued"
+    assert admission.stats()["bulk_waiting"] == 1
+
+    admission.release(ticket)
+    deadline = time.time() + 30
+    while client.get(status_url).get_json()["status"] not in ("completed", "failed") and time.time() < deadline:
+        time.sleep(0.05)
+    assert client.get(status_url).get_json()["status"] == "completed"
+    assert admission.stats()["bulk_running"] == 0
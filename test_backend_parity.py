@@ -0,0 +1,44 @@
+"""torch and ONNX Runtime backends must produce the same text and boxes
+
+Needs the EasyOCR models on disk (nothing is downloaded) and onnxruntime;
+skipped otherwise.
+"""
+import pytest
+import ocr_processor
+from backend_parity import compare_results, run_backend, BOX_TOLERANCE, MAX_TEXT_MISMATCH
+from benchmark import ModelsUnavailable, build_corpus
+
+def block(text, x, confidence=0.9):
+    return {"text": text, "confidence": confidence,
+            "position": {"top_left": [x, 0], "top_right": [x + 50, 0],
+                         "bottom_right": [x + 50, 10], "bottom_left": [x, 10]}}
+
+def result(*blocks):
+    return {"pages": [{"page_number": 1, "blocks": list(blocks)}]}
+
+def test_compare_results_counts_mismatches():
+    report = compare_results(result(block("a", 0), block("b", 100), block("c", 200)),
+                             result(block("a", 1), block("x", 100), block("c", 200 + BOX_TOLERANCE + 1, 0.5)))
+    assert report["blocks"] == 3
+    assert (report["text_mismatches"], report["box_mismatches"], report["confidence_mismatches"]) == (1, 1, 1)
+    # A missing block counts as a text mismatch
+    assert compare_results(result(block("a", 0), block("b", 100)), result(block("a", 0)))["text_mismatches"] == 1
+
+def test_backends_agree(monkeypatch):
+    pytest.importorskip("onnxruntime")
+    # run_backend turns off the reuse caches; restore them for the other tests
+    monkeypatch.setattr(ocr_processor, "page_cache", ocr_processor.page_cache)
+    monkeypatch.setattr(ocr_processor, "template_cache", ocr_processor.template_cache)
+    corpus = build_corpus()
+    try:
+        torch_results = run_backend("torch", corpus)
+        onnx_results = run_backend("onnx", corpus)
+    except ModelsUnavailable as e:
+        pytest.skip(str(e))
+    finally:
+        ocr_processor.reader_pool.clear()
+
+    for name, _, _, _ in corpus:
+        report = compare_results(torch_results[name], onnx_results[name])
+        mismatches = report["text_mismatches"] + report["box_mismatches"]
+        assert mismatches <= MAX_TEXT_MISMATCH * report["blocks"], (name, report["messages"][:5])
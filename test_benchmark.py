@@ -0,0 +1,13 @@
+"""Benchmark runs with the stub reader"""
+import ocr_processor
+from benchmark import run_benchmark
+
+def test_benchmark_runs_detect_and_recognize_on_every_repeat(monkeypatch):
+    # run_benchmark turns off the reuse caches; restore them for the other tests
+    monkeypatch.setattr(ocr_processor, "page_cache", ocr_processor.page_cache)
+    monkeypatch.setattr(ocr_processor, "template_cache", ocr_processor.template_cache)
+    result = run_benchmark("stub", repeat=3, warmup=1, scenarios=["image_a4_sparse"])
+    stages = result["scenarios"]["image_a4_sparse"]["stage_seconds_per_page"]
+    assert "detection" in stages and "recognition" in stages
+    assert "page_dedupe" not in stages
+    assert ocr_processor.page_cache is None and ocr_processor.template_cache is None
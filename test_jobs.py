@@ -0,0 +1,50 @@
+"""Background jobs take the same document options as /ocr"""
+import io
+import time
+from PIL import Image, ImageDraw
+from benchmark import StubReader, load_font
+
+def png(lines):
+    image = Image.new("RGB", (400, 60 + 40 * len(lines)), color="white")
+    draw = ImageDraw.Draw(image)
+    for index, text in enumerate(lines):
+        draw.text((10, 20 + 40 * index), text, fill="black", font=load_font(24))
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+def run_job(client, **fields):
+    response = client.post("/jobs", data={"file": (io.BytesIO(png(["Invoice 1001", "Total 250"])), "scan.png"),
+                                          **fields}, content_type="multipart/form-data")
+    assert response.status_code == 202, response.get_data(as_text=True)
+    status_url = response.get_json()["status_url"]
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        job = client.get(status_url).get_json()
+        if job["status"] in ("completed", "failed"):
+            return job
+        time.sleep(0.05)
+    raise AssertionError("job did not finish")
+
+def test_jobs_pass_document_options_through():
+    from app import app
+    from ocr_processor import reader_pool
+    reader_pool.add(['en'], StubReader(), size=0)
+    client = app.test_client()
+
+    job = run_job(client, mode="detect")
+    assert job["status"] == "completed", job
+    page = job["result"]["pages"][0]
+    assert page["path"] == "detect" and len(page["blocks"]) == 2
+    assert all("text" not in block for block in page["blocks"])
+
+    # Only the top half of the page: the second line is left out
+    job = run_job(client, regions='[{"x": 0, "y": 0, "width": 1, "height": 0.4}]')
+    assert job["status"] == "completed", job
+    assert len(job["result"]["pages"][0]["blocks"]) == 1
+
+def test_jobs_reject_invalid_options():
+    from app import app
+    response = app.test_client().post("/jobs", data={"file": (io.BytesIO(png(["x"])), "scan.png"), "mode": "guess"},
+                                      content_type="multipart/form-data")
+    assert response.status_code == 400
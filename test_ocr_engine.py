@@ -0,0 +1,32 @@
+"""Accuracy re-read of low-confidence lines"""
+import numpy as np
+from benchmark import StubReader
+from metrics import track_request
+from ocr_engine import refine_low_confidence
+
+class RereadReader(StubReader):
+    """Records re-read calls and reads every re-read box with confidence 0.8"""
+
+    def __init__(self):
+        self.calls = []
+
+    def recognize(self, grey, horizontal_list, free_list, reformat=False, **kwargs):
+        self.calls.append((free_list, kwargs))
+        return [(box, "reread", 0.8) for box in reversed(free_list)]
+
+def test_only_lines_below_the_threshold_are_reread():
+    reader, grey = RereadReader(), np.full((40, 40), 255, dtype=np.uint8)
+    first = [("a", "kept", 0.95), ("b", "doubtful", 0.05), ("c", "better", 0.9)]
+    with track_request() as timings:
+        results = refine_low_confidence(reader, grey, first, threshold=0.1, rotate=False)
+    assert results == [("a", "kept", 0.95), ("b", "reread", 0.8), ("c", "better", 0.9)]
+    (boxes, kwargs), = reader.calls
+    assert boxes == ["b"] and kwargs["decoder"] == "beamsearch" and kwargs["rotation_info"] is None
+    assert timings.to_dict()["counts"] == {"recognition_accepted": 2, "recognition_reread": 1,
+                                           "recognition_reread_improved": 1}
+
+def test_confident_pages_are_not_reread():
+    reader = RereadReader()
+    results = [("a", "kept", 0.95)]
+    assert refine_low_confidence(reader, np.zeros((4, 4), dtype=np.uint8), results, threshold=0.1) == results
+    assert reader.calls == []
@@ -0,0 +1,115 @@
+"""PII request conversion: span ids and span languages"""
+import io
+from PIL import Image, ImageDraw
+from benchmark import StubReader, load_font
+from ocr_to_pii_request import ocr_to_pii_request, span_language, record_to_pii_request
+
+def page_result(*texts):
+    blocks = [{"text": text, "confidence": 0.9,
+               "position": {"top_left": [0, 20 * index], "bottom_right": [100, 20 * index + 15]}}
+              for index, text in enumerate(texts)]
+    return {"pages": [{"page_number": 1, "page_size": {"width": 100, "height": 100}, "blocks": blocks}]}
+
+def test_span_language_follows_the_script():
+    result = page_result("Name: Asha Verma", "नाम: आशा वर्मा", "1234")
+    spans = ocr_to_pii_request(result, "doc", languages=["en", "hi"])["pages"][0]["spans"]
+    assert [span["language"] for span in spans] == ["en", "hi", "en"]
+    assert span_language("東京タワー", ["ch_sim", "ja"]) == "ja"
+    assert span_language("Привет", ["en", "ru"]) == "ru"
+    assert span_language("Bonjour", ["fr", "en"]) == "fr"
+
+def test_saved_records_fall_back_to_the_content_hash():
+    first = record_to_pii_request({**page_result("a"), "filename": "scan.png", "hash": "h1"})
+    second = record_to_pii_request({**page_result("a"), "filename": "scan.png", "hash": "h2"})
+    assert first["pages"][0]["spans"][0]["span_id"] != second["pages"][0]["spans"][0]["span_id"]
+
+def png(text):
+    image = Image.new("RGB", (400, 80), color="white")
+    ImageDraw.Draw(image).text((10, 20), text, fill="black", font=load_font(24))
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+def test_uploads_with_the_same_name_get_distinct_span_ids():
+    from app import app
+    from ocr_processor import reader_pool
+    reader_pool.add(['en'], StubReader(), size=0)
+    client = app.test_client()
+    requests = []
+    for text in ("Invoice 1001", "Receipt 2002"):
+        response = client.post("/ocr?format=pii", data={"file": (io.BytesIO(png(text)), "scan.png")},
+                               content_type="multipart/form-data")
+        assert response.status_code == 200, response.get_data(as_text=True)
+        requests.append(response.get_json())
+    assert requests[0]["document_id"] != requests[1]["document_id"]
+    first, second = ({span["span_id"] for page in request["pages"] for span in page["spans"]} for request in requests)
+    assert first and second and not first & second
+    # An explicit document_id still wins
+    response = client.post("/ocr?format=pii", data={"file": (io.BytesIO(png("x")), "scan.png"), "document_id": "A-1"},
+                           content_type="multipart/form-data")
+    assert response.get_json()["document_id"] == "A-1"
+
+class HindiReader(StubReader):
+    """Stub reader that reads every line as Devanagari text"""
+
+    def recognize(self, grey, horizontal_list, free_list, reformat=False, **kwargs):
+        return [(box, "नाम आशा", confidence)
+                for box, _, confidence in super().recognize(grey, horizontal_list, free_list, reformat, **kwargs)]
+
+def assert_hindi_request(request):
+    assert request["options"]["languages"] == ["hi", "en"]
+    spans = [span for page in request["pages"] for span in page["spans"]]
+    assert spans and all(span["language"] == "hi" for span in spans)
+
+def test_batch_and_job_pii_requests_keep_the_request_languages():
+    import time
+    from app import app
+    from ocr_processor import reader_pool
+    reader_pool.add(['hi', 'en'], HindiReader(), size=0)
+    client = app.test_client()
+
+    response = client.post("/ocr/batch?format=pii", data={"files": [(io.BytesIO(png("Naam")), "a.png")],
+                                                           "lang": "hi,en"},
+                           content_type="multipart/form-data")
+    assert response.status_code == 200, response.get_data(as_text=True)
+    assert_hindi_request(response.get_json()["documents"][0])
+
+    response = client.post("/jobs", data={"file": (io.BytesIO(png("Naam")), "a.png"), "lang": "hi,en"},
+                           content_type="multipart/form-data")
+    status_url = response.get_json()["status_url"]
+    deadline = time.time() + 30
+    while client.get(status_url).get_json()["status"] not in ("completed", "failed") and time.time() < deadline:
+        time.sleep(0.05)
+    job = client.get(status_url + "?format=pii").get_json()
+    assert job["status"] == "completed", job
+    assert_hindi_request(job["result"])
+
+def test_uploads_are_hashed_once(monkeypatch):
+    import time
+    import ocr_processor
+    from app import app
+    ocr_processor.reader_pool.add(['en'], StubReader(), size=0)
+    hashed = []
+    real_cache_key = ocr_processor.cache_key
+    monkeypatch.setattr(ocr_processor, "cache_key", lambda *args, **kwargs: hashed.append(1) or
+                        real_cache_key(*args, **kwargs))
+    client = app.test_client()
+    for url, text in (("/ocr", "Blocks 1"), ("/ocr?format=pii", "Pii 2")):
+        hashed.clear()
+        response = client.post(url, data={"file": (io.BytesIO(png(text)), "scan.png")},
+                               content_type="multipart/form-data")
+        assert response.status_code == 200
+        assert len(hashed) <= 1, url
+
+    # Jobs pick their format on fetch; the worker's result cache key is the document id
+    job_ids = []
+    for text in ("Job 3", "Job 4"):
+        hashed.clear()
+        status_url = client.post("/jobs", data={"file": (io.BytesIO(png(text)), "scan.png")},
+                                 content_type="multipart/form-data").get_json()["status_url"]
+        deadline = time.time() + 30
+        while client.get(status_url).get_json()["status"] not in ("completed", "failed") and time.time() < deadline:
+            time.sleep(0.05)
+        assert len(hashed) == 1
+        job_ids.append(client.get(status_url + "?format=pii").get_json()["result"]["document_id"])
+    assert job_ids[0] != job_ids[1]
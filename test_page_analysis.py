@@ -0,0 +1,52 @@
+"""Blank page pre-pass on thumbnails of sparse pages"""
+import numpy as np
+from PIL import Image, ImageDraw
+from benchmark import load_font
+from page_analysis import analyze_thumbnail
+
+THUMBNAIL_DPI = 50
+RENDER_DPI = 200
+A4_INCHES = (8.27, 11.69)
+
+def thumbnail(lines=(), specks=()):
+    """A4 page rendered at RENDER_DPI and box-filtered down to THUMBNAIL_DPI, like a pdftoppm thumbnail
+
+    ``lines`` are ``(text, point size, vertical position as page fraction)``,
+    ``specks`` are ``(x, y)`` page fractions of single dark pixels.
+    """
+    size = tuple(round(inches * RENDER_DPI) for inches in A4_INCHES)
+    page = Image.new("L", size, color=255)
+    draw = ImageDraw.Draw(page)
+    for text, points, y in lines:
+        draw.text((size[0] * 0.1, size[1] * y), text, fill=0, font=load_font(round(points * RENDER_DPI / 72)))
+    for x, y in specks:
+        draw.point((size[0] * x, size[1] * y), fill=0)
+    small = tuple(round(inches * THUMBNAIL_DPI) for inches in A4_INCHES)
+    return page.resize(small, Image.BOX)
+
+def analyze(image):
+    return analyze_thumbnail(image, THUMBNAIL_DPI, 200, (4096, 4096))
+
+def test_single_line_pages_are_not_blank():
+    for line in [("Page 2 of 2 - Account 4412 9981 0034", 10, 0.9),
+                 ("Signature ________________    Date __________", 11, 0.8),
+                 ("CONFIDENTIAL", 14, 0.5),
+                 ("Total 12.00", 8, 0.3)]:
+        report = analyze(thumbnail([line]))
+        assert not report["blank"], (line, report)
+        assert report["dpi"]
+
+def test_empty_page_is_blank():
+    report = analyze(thumbnail())
+    assert report["blank"]
+    assert report["dpi"] is None
+
+def test_page_with_dust_specks_is_blank():
+    report = analyze(thumbnail(specks=[(0.3, 0.4), (0.7, 0.2), (0.5, 0.8)]))
+    assert report["blank"], report
+
+def test_dense_page_is_rendered_for_its_text_height():
+    lines = [(f"Line {index} of a dense page of 10pt text", 10, 0.08 + index * 0.02) for index in range(40)]
+    report = analyze(thumbnail(lines))
+    assert not report["blank"]
+    assert report["text_height_px"] >= 20
@@ -0,0 +1,69 @@
+"""Form template and page dedupe caches, with a stub reader whose text depends on the pixels"""
+import zlib
+import numpy as np
+from PIL import Image, ImageDraw
+from benchmark import StubReader, load_font
+from ocr_engine import readtext_page
+from page_cache import PageCache, TemplateCache, reader_key
+
+FORM_LINES = ["Name: Asha Verma", "PAN ABCDE1234F", "Total: 1234.56", "Rs 5000 paid"]
+
+class PixelReader(StubReader):
+    """Stub reader "recognizing" each box as a checksum of its pixels, recording what it was asked to read"""
+
+    def __init__(self):
+        self.recognized = []
+
+    def recognize(self, grey, horizontal_list, free_list, reformat=False, **kwargs):
+        results = []
+        for x_min, x_max, y_min, y_max in horizontal_list:
+            self.recognized.append((x_min, x_max, y_min, y_max))
+            crop = np.ascontiguousarray(grey[y_min:y_max, x_min:x_max])
+            box = [[x_min, y_min], [x_max, y_min], [x_max, y_max], [x_min, y_max]]
+            results.append((box, f"text {zlib.crc32(crop.tobytes())}", 0.9))
+        return results
+
+def form_page(lines, font_size=18):
+    image = Image.new("L", (600, 300), color=255)
+    draw = ImageDraw.Draw(image)
+    for index, line in enumerate(lines):
+        draw.text((20, 20 + index * 60), line, fill=0, font=load_font(font_size))
+    return np.asarray(image.convert("RGB"))
+
+def texts(results):
+    return [text for _, text, _ in results]
+
+def test_identical_form_reuses_every_region():
+    reader, cache = PixelReader(), TemplateCache()
+    first = readtext_page(reader, form_page(FORM_LINES), templates=cache)
+    reader.recognized.clear()
+    again = readtext_page(reader, form_page(FORM_LINES), templates=cache)
+    assert reader.recognized == []
+    assert texts(again) == texts(first)
+
+def test_one_character_change_is_recognized_again():
+    for line, changed in [(2, "Total: 1234.66"), (3, "Rs 6000 paid"), (1, "PAN ABCDE1234E")]:
+        for font_size in (12, 18, 24):
+            reader, cache = PixelReader(), TemplateCache()
+            readtext_page(reader, form_page(FORM_LINES, font_size), templates=cache)
+            edited = list(FORM_LINES)
+            edited[line] = changed
+            reader.recognized.clear()
+            reused = readtext_page(reader, form_page(edited, font_size), templates=cache)
+            fresh = readtext_page(PixelReader(), form_page(edited, font_size))
+            assert texts(reused) == texts(fresh), (changed, font_size)
+            # Only the edited line went back to the recognizer
+            assert len(reader.recognized) == 1, (changed, font_size)
+
+def test_page_cache_matches_exact_pixels_only():
+    reader, cache = PixelReader(), PageCache(max_entries=4, max_distance=0)
+    page = form_page(FORM_LINES)
+    cache.put(cache.fingerprint(reader, page), [("box", "cached", 0.9)])
+    assert cache.get(cache.fingerprint(reader, form_page(FORM_LINES))) == [("box", "cached", 0.9)]
+    edited = form_page(FORM_LINES[:2] + ["Total: 1234.66"] + FORM_LINES[3:])
+    assert cache.get(cache.fingerprint(reader, edited)) is None
+
+def test_reader_key_includes_backend():
+    torch_reader, onnx_reader = StubReader(), StubReader()
+    torch_reader.backend, onnx_reader.backend = "torch", "onnx"
+    assert reader_key(torch_reader) != reader_key(onnx_reader)
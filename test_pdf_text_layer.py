@@ -0,0 +1,44 @@
+"""PDF text layer is only used for pages without images"""
+import ocr_processor
+from pdf_text_layer import parse_image_list
+
+BBOX_LAYOUT = """<html xmlns="http://www.w3.org/1999/xhtml"><body><doc>
+{pages}
+</doc></body></html>"""
+TEXT_PAGE = """<page width="612" height="792"><flow><block><line xMin="72" yMin="72" xMax="300" yMax="84">
+<word xMin="72" yMin="72" xMax="300" yMax="84">Invoice number 12345 total due</word>
+</line></block></flow></page>"""
+
+IMAGE_LIST = """page   num  type   width height color comp bpc  enc interp  object ID x-ppi y-ppi size ratio
+--------------------------------------------------------------------------------------------
+   1     0 image      16    16  rgb     3   8  image  no         9  0    72    72  120B  16%
+   2     1 image     800   300  rgb     3   8  jpeg   no        12  0   150   150 40.2K 5.7%
+   2     2 smask     800   300  gray    1   8  image  no        12  0   150   150  2.1K 0.9%
+   3     3 smask     800   300  gray    1   8  image  no        14  0   150   150  2.1K 0.9%
+"""
+
+def test_image_list_pages():
+    # Page 1 only has an icon and page 3 only a soft mask
+    assert parse_image_list(IMAGE_LIST) == {2}
+    assert parse_image_list(IMAGE_LIST.encode()) == {2}
+    assert parse_image_list(IMAGE_LIST, min_pixels=1) == {1, 2}
+    assert parse_image_list("") == set()
+
+def fake_poppler(image_list):
+    def run(command, data, output=()):
+        if command[0] == 'pdftotext':
+            return BBOX_LAYOUT.format(pages=TEXT_PAGE * 3).encode()
+        if image_list is None:
+            raise Exception("pdfimages failed: not installed")
+        return image_list.encode()
+    return run
+
+def test_pages_with_images_are_ocred(monkeypatch):
+    monkeypatch.setattr(ocr_processor, "_run_poppler", fake_poppler(IMAGE_LIST))
+    pages = ocr_processor.extract_text_layer(b"%PDF", 1, 3)
+    assert sorted(pages) == [1, 3]
+    assert pages[1]["path"] == "text_layer"
+
+def test_failed_image_check_falls_back_to_ocr(monkeypatch):
+    monkeypatch.setattr(ocr_processor, "_run_poppler", fake_poppler(None))
+    assert ocr_processor.extract_text_layer(b"%PDF", 1, 3) == {}
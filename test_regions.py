@@ -0,0 +1,105 @@
+"""Processing modes and region OCR with the stub reader"""
+import io
+import numpy as np
+import pytest
+from PIL import Image, ImageDraw
+from benchmark import StubReader, load_font
+from ocr_engine import has_recognizer_internals
+from ocr_processor import process_document, reader_pool
+from regions import RegionError, parse_boxes, parse_mode, parse_regions
+
+LINES = ["Invoice 1001", "Name: Asha Verma", "Total: 1234.56"]
+
+@pytest.fixture(autouse=True)
+def stub_reader():
+    reader_pool.add(['en'], StubReader(), size=0)
+
+def page_image(lines=LINES):
+    image = Image.new("RGB", (600, 80 + 60 * len(lines)), color="white")
+    draw = ImageDraw.Draw(image)
+    for index, text in enumerate(lines):
+        draw.text((30 + 20 * index, 30 + 60 * index), text, fill="black", font=load_font(24))
+    return np.asarray(image)
+
+def positions(page):
+    return [block["position"] for block in page["blocks"]]
+
+def test_detect_then_recognize_matches_read():
+    image = page_image()
+    read = process_document(image, use_cache=False)["pages"][0]
+    detected = process_document(image, use_cache=False, mode="detect")
+    page = detected["pages"][0]
+    assert page["path"] == "detect"
+    assert positions(page) == positions(read)
+    assert all(set(block) == {"position"} for block in page["blocks"])
+
+    # A detect response is accepted as the boxes of a recognize request
+    recognized = process_document(image, use_cache=False, mode="recognize", boxes=parse_boxes(detected))
+    assert [block["text"] for block in recognized["pages"][0]["blocks"]] == \
+        [block["text"] for block in read["blocks"]]
+
+def test_recognize_keeps_box_order_and_empty_boxes():
+    image = page_image()
+    read = process_document(image, use_cache=False)["pages"][0]
+    outside = {"top_left": [900, 900], "top_right": [950, 900], "bottom_right": [950, 950], "bottom_left": [900, 950]}
+    boxes = parse_boxes([{"position": position} for position in reversed(positions(read))] + [{"position": outside}])
+    blocks = process_document(image, use_cache=False, mode="recognize", boxes=boxes)["pages"][0]["blocks"]
+    assert [block["text"] for block in blocks[:3]] == [block["text"] for block in reversed(read["blocks"])]
+    assert blocks[3]["text"] == "" and blocks[3]["confidence"] == 0
+
+def test_stub_reader_is_recognized_box_by_box():
+    assert not has_recognizer_internals(StubReader())
+
+def test_invalid_mode_combinations():
+    boxes = parse_boxes([{"position": {"top_left": [0, 0], "top_right": [10, 0],
+                                       "bottom_right": [10, 10], "bottom_left": [0, 10]}}])
+    assert parse_mode(None) == "read"
+    with pytest.raises(RegionError):
+        parse_mode("guess")
+    with pytest.raises(RegionError):
+        parse_mode("recognize")
+    with pytest.raises(RegionError):
+        parse_mode("read", boxes=boxes)
+    with pytest.raises(RegionError):
+        parse_mode("detect", regions=[{"x": 0, "y": 0, "width": 1, "height": 1, "page": None}])
+
+def test_app_rejects_detect_as_pii():
+    from app import app
+    buffer = io.BytesIO()
+    Image.fromarray(page_image()).save(buffer, format="PNG")
+    response = app.test_client().post("/ocr?format=pii", data={"file": (io.BytesIO(buffer.getvalue()), "scan.png"),
+                                                                 "mode": "detect"},
+                                      content_type="multipart/form-data")
+    assert response.status_code == 400
+
+def close(position, expected, tolerance):
+    return all(abs(a - b) <= tolerance for corner in position for a, b in zip(position[corner], expected[corner]))
+
+def test_region_blocks_are_in_full_page_coordinates():
+    image = page_image()
+    full = process_document(image, use_cache=False)["pages"][0]
+    second = full["blocks"][1]["position"]
+    x, y = second["top_left"]
+    width, height = second["bottom_right"][0] - x, second["bottom_right"][1] - y
+    for region in ({"x": x - 10, "y": y - 10, "width": width + 20, "height": height + 20, "units": "absolute"},
+                   {"x": 0, "y": (y - 10) / image.shape[0], "width": 1, "height": (height + 20) / image.shape[0]}):
+        page = process_document(image, use_cache=False, regions=parse_regions([region]))["pages"][0]
+        assert page["path"] == "regions" and page["page_size"] == full["page_size"]
+        # Stub texts derive from crop coordinates, so only the geometry is compared
+        assert len(page["blocks"]) == 1
+        assert close(page["blocks"][0]["position"], second, 1)
+
+def test_regions_of_downscaled_pages_map_back_to_page_size():
+    # Wider than the page size limit: full-page OCR downscales, regions are cut at full resolution
+    image = np.asarray(Image.fromarray(page_image()).resize((2400, 580), Image.LANCZOS))
+    full = process_document(image, use_cache=False)["pages"][0]
+    page = process_document(image, use_cache=False,
+                            regions=parse_regions([{"x": 0, "y": 0, "width": 1, "height": 0.5}]))["pages"][0]
+    assert page["page_size"] == full["page_size"]
+    assert page["blocks"]
+    assert close(page["blocks"][0]["position"], full["blocks"][0]["position"], 3)
+
+def test_pages_without_regions_are_left_out():
+    result = process_document(page_image(), use_cache=False,
+                              regions=parse_regions([{"page": 2, "x": 0, "y": 0, "width": 1, "height": 1}]))
+    assert result["pages"] == []
@@ -0,0 +1,85 @@
+"""Result cache tiers, TTL expiry and keys"""
+import numpy as np
+import onnx_backend
+import ocr_processor
+import result_cache
+from result_cache import ResultCache, cache_key
+
+RESULT = {"pages": [{"page_number": 1, "blocks": [{"text": "Invoice 1001", "confidence": 0.9}]}]}
+
+class Clock:
+    """Stands in for the time module inside result_cache"""
+
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+def test_memory_tier_returns_fresh_copies():
+    cache = ResultCache(1024 * 1024, ttl_seconds=60)
+    assert cache.get("a") == (None, None)
+    cache.put("a", RESULT)
+    first, tier = cache.get("a")
+    assert (first, tier) == (RESULT, "memory")
+    first["pages"].clear()
+    assert cache.get("a")[0] == RESULT
+    assert cache.stats()["memory_hits"] == 2 and cache.stats()["misses"] == 1
+
+def test_memory_tier_evicts_least_recently_used():
+    size = len(result_cache.json.dumps(RESULT).encode())
+    cache = ResultCache(size * 2, ttl_seconds=0)
+    cache.put("a", RESULT)
+    cache.put("b", RESULT)
+    cache.get("a")
+    cache.put("c", RESULT)
+    assert cache.get("b") == (None, None)
+    assert cache.get("a")[1] == "memory" and cache.get("c")[1] == "memory"
+    assert cache.stats()["evictions"] == 1
+
+def test_disk_tier_survives_a_restart(tmp_path):
+    db_path = str(tmp_path / "results.db")
+    ResultCache(1024 * 1024, ttl_seconds=60, db_path=db_path, disk_bytes=1024 * 1024).put("a", RESULT)
+    cache = ResultCache(1024 * 1024, ttl_seconds=60, db_path=db_path, disk_bytes=1024 * 1024)
+    assert cache.get("a") == (RESULT, "disk")
+    # Promoted into memory on the disk hit
+    assert cache.get("a") == (RESULT, "memory")
+
+def test_disk_tier_evicts_least_recently_accessed(tmp_path, monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(result_cache, "time", clock)
+    size = len(result_cache.json.dumps(RESULT).encode())
+    cache = ResultCache(0, ttl_seconds=0, db_path=str(tmp_path / "results.db"), disk_bytes=size * 2)
+    for key in ("a", "b", "c"):
+        clock.now += 1
+        cache.put(key, RESULT)
+    assert cache.get("a") == (None, None)
+    assert cache.get("b")[1] == "disk" and cache.get("c")[1] == "disk"
+
+def test_entries_expire_after_the_ttl(tmp_path, monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(result_cache, "time", clock)
+    cache = ResultCache(1024 * 1024, ttl_seconds=60, db_path=str(tmp_path / "results.db"), disk_bytes=1024 * 1024)
+    cache.put("a", RESULT)
+    clock.now += 59
+    assert cache.get("a")[1] == "memory"
+    clock.now += 2
+    assert cache.get("a") == (None, None)
+    # Expired disk rows are deleted as well
+    assert cache._db.execute("SELECT COUNT(*) FROM results").fetchone()[0] == 0
+
+def test_cache_key_covers_content_languages_and_settings():
+    page = np.zeros((4, 4, 3), dtype=np.uint8)
+    assert cache_key(b"pdf", ["en", "hi"]) == cache_key(b"pdf", ["hi", "en"])
+    assert cache_key(b"pdf", ["en"]) != cache_key(b"pdf2", ["en"])
+    assert cache_key(b"pdf", ["en"], dpi=200) != cache_key(b"pdf", ["en"], dpi=150)
+    assert cache_key(page, ["en"]) != cache_key(page[:2], ["en"])
+    assert cache_key(object(), ["en"]) is None
+
+def test_result_cache_key_includes_the_backend(monkeypatch):
+    keys = set()
+    for backend, quantize in (("torch", False), ("onnx", False), ("onnx", True)):
+        monkeypatch.setattr(ocr_processor, "BACKEND", backend)
+        monkeypatch.setattr(onnx_backend, "ONNX_QUANTIZE", quantize)
+        keys.add(ocr_processor.result_cache_key(b"pdf", ["en"]))
+    assert len(keys) == 3